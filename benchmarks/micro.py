@@ -0,0 +1,210 @@
+# Micro-benchmarks of the per-message hot paths. Each case is a setup function
+# returning (callable, operations per call); results are nanoseconds per
+# operation, best of several timing runs.
+import math
+import random
+import timeit
+
+import numpy as np
+
+import wire_codec
+from fusion.fusion_app import fuse_positions
+from fusion.kalman import KalmanBank
+from fusion.tracks import TrackTable
+from metrics import Histogram
+from sensors.noise import SensorNoise
+from sensors.tacan_sensor import BearingIndex, angle_between
+from vehicles.trajectory import Trajectories, build_track
+from vehicles.vehicle_sim import interpolate
+
+def _vehicles(n, seed=0):
+    rng = random.Random(seed)
+    return [{'type': 'vehicle', 'name': f"vehicle{i+1}", 'x': rng.uniform(-10, 10), 'y': rng.uniform(-10, 10), 't': 0.5, 'seq': i, 'origin': None}
+            for i in range(n)]
+
+def _readings(n, sensors=3, seed=0):
+    rng = random.Random(seed)
+    return [{'type': 'sensor', 'name': f"sensor{i % sensors + 1}", 'x': rng.uniform(-10, 10), 'y': rng.uniform(-10, 10),
+             't': i / n, 'sensor_type': 'noisy', 'noise_var': 0.25, 'vehicle': f"vehicle{i // sensors + 1}", 'seq': i, 'origin': i / n}
+            for i in range(n)]
+
+def case_interpolate():
+    return (lambda: interpolate((0.0, 0.0), (10.0, 5.0), 0.37)), 1
+
+def case_trajectory_state():
+    # 1000 vehicles on 20-waypoint spline routes
+    rng = np.random.default_rng(0)
+    tracks = [build_track(rng.uniform(-50, 50, (20, 2)), 'spline')[0] for _ in range(1000)]
+    starts = np.concatenate(([0], np.cumsum([len(t) for t in tracks])))
+    times = np.concatenate([np.linspace(0.0, 60.0, len(t)) for t in tracks])
+    traj = Trajectories(starts, np.concatenate(tracks), times, rng.uniform(0, 10, 1000))
+    return (lambda: traj.state(25.0)), 1000
+
+def _decode_case(fmt, kind):
+    if kind == 'vehicle':
+        data = wire_codec.encode_vehicle('vehicle1', 1.234, -5.678, 0.5, fmt)
+    else:
+        data = wire_codec.encode_sensor('sensor1', 1.234, -5.678, 0.5, 'noisy', 0.25, 'vehicle1', fmt, origin=1.0)
+    def case():
+        return (lambda: wire_codec.decode(data)), 1
+    return case
+
+def _decode_batch_case(fmt):
+    def case():
+        frame = wire_codec.frame_batches([wire_codec.encode_vehicle('vehicle1', 1.234, -5.678, 0.5, fmt)] * 100, fmt)[0]
+        return (lambda: wire_codec.decode_all(frame)), len(wire_codec.decode_all(frame))
+    return case
+
+def _encode_case(fmt, kind):
+    def case():
+        if kind == 'vehicle':
+            return (lambda: wire_codec.encode_vehicle('vehicle1', 1.234, -5.678, 0.5, fmt, origin=1.0)), 1
+        return (lambda: wire_codec.encode_sensor('sensor1', 1.234, -5.678, 0.5, 'noisy', 0.25, 'vehicle1', fmt, origin=1.0)), 1
+    return case
+
+def case_fuse_positions():
+    readings = _readings(3)
+    return (lambda: fuse_positions(readings)), 1
+
+def case_track_table():
+    tracks = TrackTable()
+    readings = _readings(300)
+    return (lambda: tracks.update_batch(readings)), len(readings)
+
+def case_kalman_bank():
+    bank = KalmanBank()
+    readings = _readings(300)
+    def run():
+        # Move time forward so every batch is applied, not dropped as late
+        for m in readings:
+            m['origin'] += 1.0
+        bank.update_batch(readings)
+        bank.pop_updated()
+    return run, len(readings)
+
+def case_angle_between():
+    return (lambda: angle_between(0.0, 0.0, 3.0, 4.0)), 1
+
+def case_bearing_update():
+    index = BearingIndex(0.0, 0.0)
+    vs = _vehicles(1000)
+    for v in vs:
+        index.update(v)
+    def run():
+        # One tick: every vehicle moves, then the keys are merged once
+        for v in vs:
+            v['x'] += 0.001
+            index.update(v)
+        index.reindex()
+    return run, len(vs)
+
+def case_bearing_sweep():
+    index = BearingIndex(0.0, 0.0)
+    for v in _vehicles(1000):
+        index.update(v)
+    angle = [0.0]
+    def run():
+        # One 0.05s dish step of a 60s rotation
+        index.sweep(angle[0], angle[0] + 0.3, 1.0)
+        angle[0] += 0.3
+    return run, 1
+
+def _noise_case(model):
+    def case():
+        noise = SensorNoise(0.5, model, rng=np.random.default_rng(0))
+        vs = _vehicles(100)
+        names = [v['name'] for v in vs]
+        xs = [v['x'] for v in vs]
+        ys = [v['y'] for v in vs]
+        return (lambda: noise.apply(names, xs, ys)), len(vs)
+    return case
+
+def case_loss_tracker():
+    loss = wire_codec.LossTracker()
+    msgs = _readings(300)
+    def run():
+        for m in msgs:
+            m['seq'] += 300
+        loss.observe(msgs)
+    return run, len(msgs)
+
+def case_histogram():
+    hist = Histogram()
+    values = [random.Random(0).expovariate(1000.0) for _ in range(1000)]
+    return (lambda: hist.record_many(values)), len(values)
+
+def case_visualizer_frame():
+    # One frame of the live plot: 10 sensors each gain a point, fused markers move
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from visualization.history import PointHistory
+    from visualization.visualizer import LivePlot
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 6))
+    for ax in (ax1, ax2):
+        ax.set_xlim(-12, 12)
+        ax.set_ylim(-12, 12)
+    plot = LivePlot(fig, ax1, ax2)
+    histories = {f"sensor{i+1}": PointHistory(2000) for i in range(10)}
+    fused = PointHistory(2000)
+    rng = np.random.default_rng(0)
+    def run():
+        for name, hist in histories.items():
+            x, y = rng.uniform(-10, 10, 2)
+            hist.append(x, y)
+            plot.sensor_line(name, 'C0').set_data(*hist.view())
+        fused.append(*rng.uniform(-10, 10, 2))
+        plot.fused_marker.set_data([0.0], [0.0])
+        plot.fused_trail.set_data(*fused.view())
+        plot.render()
+    run()  # first frame does the full draw and caches the background
+    return run, 1
+
+CASES = [
+    ('interpolate', case_interpolate),
+    ('trajectory_state', case_trajectory_state),
+    ('decode_text_vehicle', _decode_case('text', 'vehicle')),
+    ('decode_text_sensor', _decode_case('text', 'sensor')),
+    ('decode_binary_vehicle', _decode_case('binary', 'vehicle')),
+    ('decode_binary_sensor', _decode_case('binary', 'sensor')),
+    ('decode_text_batch', _decode_batch_case('text')),
+    ('decode_binary_batch', _decode_batch_case('binary')),
+    ('encode_text_vehicle', _encode_case('text', 'vehicle')),
+    ('encode_text_sensor', _encode_case('text', 'sensor')),
+    ('encode_binary_vehicle', _encode_case('binary', 'vehicle')),
+    ('encode_binary_sensor', _encode_case('binary', 'sensor')),
+    ('fuse_positions', case_fuse_positions),
+    ('track_table_update', case_track_table),
+    ('kalman_update', case_kalman_bank),
+    ('angle_between', case_angle_between),
+    ('bearing_index_update', case_bearing_update),
+    ('bearing_index_sweep', case_bearing_sweep),
+    ('noise_white', _noise_case('white')),
+    ('noise_ar1', _noise_case('ar1')),
+    ('loss_tracker', case_loss_tracker),
+    ('histogram_record', case_histogram),
+    ('visualizer_frame', case_visualizer_frame),
+]
+
+def time_case(setup, min_time=0.2, repeat=5):
+    fn, per_call = setup()
+    timer = timeit.Timer(fn)
+    number, secs = timer.autorange()
+    number = max(1, math.ceil(number * min_time / max(secs, 1e-9)))
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return best / (number * per_call) * 1e9
+
+def run_micro(select=None, min_time=0.2, repeat=5):
+    # Returns {case: ns per operation}
+    results = {}
+    for name, setup in CASES:
+        if select and not any(s in name for s in select):
+            continue
+        results[name] = time_case(setup, min_time, repeat)
+        print(f"{name:<24} {results[name]:>12.1f} ns/op  ({1e9 / results[name]:>12,.0f} ops/s)")
+    # Binary against text codec, for every case measured in both formats
+    for name in results:
+        binary = name.replace('_text_', '_binary_')
+        if binary != name and binary in results:
+            print(f"{binary} speedup over text: {results[name] / results[binary]:.2f}x")
+    return results
@@ -0,0 +1,161 @@
+# End-to-end scenarios: run a headless simulation_manager, wait for fused
+# output, then measure one window between two metrics snapshots. Throughput
+# and loss come from the aggregated stats port, CPU and RSS per component
+# from /proc (Linux only).
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import metrics
+
+CLK_TCK = os.sysconf('SC_CLK_TCK')
+
+# (role, counter) pairs reported as msgs/s
+RATES = (
+    ('vehicle', 'msgs_out'),
+    ('sensor', 'msgs_in'),
+    ('sensor', 'msgs_out'),
+    ('fusion', 'msgs_in'),
+    ('fusion', 'outputs'),
+)
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return None  # exited
+
+def _stat(pid):
+    # (ppid, cpu seconds) from /proc/<pid>/stat; the comm field may contain spaces
+    data = _read(f'/proc/{pid}/stat')
+    if data is None:
+        return None
+    fields = data[data.rindex(')') + 2:].split()
+    return int(fields[1]), (int(fields[11]) + int(fields[12])) / CLK_TCK
+
+def _rss_mib(pid):
+    data = _read(f'/proc/{pid}/status')
+    for line in (data or '').splitlines():
+        if line.startswith('VmRSS:'):
+            return int(line.split()[1]) / 1024  # kB
+    return 0.0
+
+def _label(pid):
+    # Component name from the command line: the -m module, else 'worker'
+    # for multiprocessing children and the script name otherwise
+    args = (_read(f'/proc/{pid}/cmdline') or '').split('\0')
+    if '-m' in args:
+        return args[args.index('-m') + 1].rsplit('.', 1)[-1]
+    if any('multiprocessing' in a for a in args):
+        return 'worker'
+    script = next((a for a in args[1:] if a.endswith('.py')), args[0])
+    return os.path.splitext(os.path.basename(script))[0]
+
+def process_tree(root):
+    # {pid: (label, cpu seconds, rss MiB)} for root and all its descendants
+    parents = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            st = _stat(int(entry))
+            if st:
+                parents[int(entry)] = st
+    tree = {root}
+    grew = True
+    while grew:
+        grew = False
+        for pid, (ppid, _) in parents.items():
+            if ppid in tree and pid not in tree:
+                tree.add(pid)
+                grew = True
+    return {pid: (_label(pid), parents[pid][1], _rss_mib(pid)) for pid in tree if pid in parents}
+
+def component_usage(before, after, wall):
+    # {label: {'procs', 'cpu' (cores), 'rss_mib'}} over the window
+    out = {}
+    for pid, (label, cpu, rss) in after.items():
+        c = out.setdefault(label, {'procs': 0, 'cpu': 0.0, 'rss_mib': 0.0})
+        c['procs'] += 1
+        c['cpu'] += (cpu - before.get(pid, (label, 0.0, 0.0))[1]) / wall
+        c['rss_mib'] += rss
+    return out
+
+def _counter(agg, role, name, kind='counters'):
+    m = agg['roles'].get(role)
+    return m[kind].get(name, 0) if m else 0
+
+def hist_delta(a, b):
+    # Histogram snapshot of what was recorded between a and b
+    if not b:
+        return {'count': 0, 'sum': 0.0, 'max': 0.0, 'buckets': []}
+    old = dict(a['buckets']) if a else {}
+    buckets = [(idx, n - old.get(idx, 0)) for idx, n in b['buckets'] if n > old.get(idx, 0)]
+    return {'count': sum(n for _, n in buckets), 'sum': b['sum'] - (a['sum'] if a else 0.0), 'max': b['max'], 'buckets': buckets}
+
+def _loss(a, b, role):
+    lost = _counter(b, role, 'loss.lost', 'gauges') - _counter(a, role, 'loss.lost', 'gauges')
+    received = _counter(b, role, 'loss.received', 'gauges') - _counter(a, role, 'loss.received', 'gauges')
+    return lost / (lost + received) if lost + received > 0 else 0.0
+
+def summarize_window(a, b, before, after, wall):
+    rates = {f"{role}.{name}": (_counter(b, role, name) - _counter(a, role, name)) / wall for role, name in RATES}
+    hists = lambda agg: agg['roles'].get('fusion', {}).get('histograms', {})
+    e2e = hist_delta(hists(a).get('e2e_seconds'), hists(b).get('e2e_seconds'))
+    p50, p99 = metrics.percentiles(e2e, (50, 99))
+    return {
+        'wall': wall,
+        'rates': rates,
+        'loss': {'vehicle->sensor': _loss(a, b, 'sensor'), 'sensor->fusion': _loss(a, b, 'fusion')},
+        'ring_dropped': _counter(b, 'sensor', 'ring_dropped', 'gauges') - _counter(a, 'sensor', 'ring_dropped', 'gauges'),
+        'e2e_ms': {'p50': p50 * 1000 if p50 is not None else None, 'p99': p99 * 1000 if p99 is not None else None},
+        'components': component_usage(before, after, wall),
+    }
+
+def _fetch(port):
+    try:
+        return metrics.fetch(port, timeout=2.0)
+    except OSError:
+        return None
+
+def run_scenario(vehicles, sensors, duration=5.0, wire_format='text', stats_port=9300, extra=(), warmup_timeout=30.0):
+    # Runs one headless simulation and returns its measured window
+    cmd = [sys.executable, 'simulation_manager.py', '-v', str(vehicles), '-s', str(sensors), '--headless',
+           '--wire-format', wire_format, '--stats-port', str(stats_port), '--stats-interval', '0',
+           '--vehicle-duration', str(warmup_timeout + duration + 10)] + list(extra)
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + warmup_timeout
+        while True:
+            agg = _fetch(stats_port)
+            if agg and _counter(agg, 'fusion', 'outputs') > 0:
+                break
+            if proc.poll() is not None or time.time() > deadline:
+                raise RuntimeError(f"Scenario {vehicles}v/{sensors}s produced no fused output within {warmup_timeout:.0f}s")
+            time.sleep(0.5)
+        time.sleep(1.0)  # let every process get past its first ticks
+        a, before, t0 = _fetch(stats_port), process_tree(proc.pid), time.monotonic()
+        time.sleep(duration)
+        b, after, t1 = _fetch(stats_port), process_tree(proc.pid), time.monotonic()
+        if a is None or b is None:
+            raise RuntimeError(f"Scenario {vehicles}v/{sensors}s stopped serving metrics")
+        return summarize_window(a, b, before, after, t1 - t0)
+    finally:
+        # The manager stops its children on SIGINT
+        proc.send_signal(signal.SIGINT)
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+def format_scenario(key, r):
+    rates = ', '.join(f"{name}={rate:,.0f}/s" for name, rate in r['rates'].items())
+    p99 = r['e2e_ms']['p99']
+    lines = [f"{key}: {rates}",
+             f"  loss v->s={r['loss']['vehicle->sensor']:.2%} s->f={r['loss']['sensor->fusion']:.2%} ring_dropped={r['ring_dropped']}"
+             f" e2e p99={'n/a' if p99 is None else f'{p99:.2f}ms'}"]
+    for label, c in sorted(r['components'].items()):
+        lines.append(f"  {label:<20} {c['procs']:>3} proc  cpu={c['cpu']:.2f} cores  rss={c['rss_mib']:.1f} MiB")
+    return '\n'.join(lines)
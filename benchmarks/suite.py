@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+from benchmarks.micro import run_micro
+from benchmarks.pipeline import format_scenario, run_scenario
+
+DEFAULT_BASELINE = os.path.join('benchmarks', 'baseline.json')
+CPU_FLOOR = 0.05  # cores; smaller CPU changes are noise
+LOSS_SLACK = 0.01  # absolute loss rate increase tolerated
+
+def scenario_key(vehicles, sensors, wire_format):
+    return f"{vehicles}v-{sensors}s-{wire_format}"
+
+def _worse(name, old, new, tolerance, higher_is_better=False, floor=0.0):
+    # Returns a regression line, or None
+    if old is None or new is None:
+        return None
+    limit = old * (1 - tolerance) if higher_is_better else old * (1 + tolerance) + floor
+    if (new < limit) if higher_is_better else (new > limit):
+        return f"{name}: {old:,.2f} -> {new:,.2f}"
+    return None
+
+def compare(baseline, results, tolerance):
+    # Regressions of results against baseline, as printable lines
+    out = []
+    for name, ns in results.get('micro', {}).items():
+        out.append(_worse(f"micro {name} ns/op", baseline.get('micro', {}).get(name), ns, tolerance))
+    for key, r in results.get('pipeline', {}).items():
+        old = baseline.get('pipeline', {}).get(key)
+        if not old:
+            continue
+        for name, rate in r['rates'].items():
+            out.append(_worse(f"{key} {name} msgs/s", old['rates'].get(name), rate, tolerance, higher_is_better=True))
+        for label, c in r['components'].items():
+            if label in old['components']:
+                out.append(_worse(f"{key} {label} cpu cores", old['components'][label]['cpu'], c['cpu'], tolerance, floor=CPU_FLOOR))
+        for hop, rate in r['loss'].items():
+            out.append(_worse(f"{key} loss {hop}", old['loss'].get(hop), rate, 0.0, floor=LOSS_SLACK))
+        out.append(_worse(f"{key} e2e p99 ms", old['e2e_ms']['p99'], r['e2e_ms']['p99'], tolerance))
+    return [line for line in out if line]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite: hot-path micro-benchmarks and end-to-end pipeline scenarios, compared against a JSON baseline")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--micro-only', action='store_true', help='Only run the micro-benchmarks')
+    group.add_argument('--pipeline-only', action='store_true', help='Only run the pipeline scenarios')
+    parser.add_argument('--select', type=str, nargs='+', help='Only run micro-benchmarks whose name contains one of these')
+    parser.add_argument('--vehicles', type=int, nargs='+', default=[1, 5, 20], help='Vehicle counts to sweep (default: 1 5 20)')
+    parser.add_argument('--sensors', type=int, nargs='+', default=[3, 10], help='Sensor counts to sweep (default: 3 10)')
+    parser.add_argument('--duration', type=float, default=5.0, help='Measured seconds per pipeline scenario (default: 5)')
+    parser.add_argument('--wire-format', choices=['text', 'binary'], default='text', help='Wire format for the pipeline scenarios (default: text)')
+    parser.add_argument('--stats-port', type=int, default=9300, help='Manager stats port for the scenarios; processes use the ports above it (default: 9300)')
+    parser.add_argument('--out', type=str, default='benchmark_results.json', help='Write results to this JSON file (default: benchmark_results.json)')
+    parser.add_argument('--baseline', type=str, default=DEFAULT_BASELINE, help=f'Baseline JSON to compare against (default: {DEFAULT_BASELINE})')
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results as the new baseline instead of comparing')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Relative change counted as a regression (default: 0.2)')
+    args = parser.parse_args()
+
+    results = {'meta': {'time': time.time(), 'python': platform.python_version(), 'machine': platform.machine(),
+                        'cpus': os.cpu_count(), 'wire_format': args.wire_format, 'duration': args.duration},
+               'micro': {}, 'pipeline': {}}
+    if not args.pipeline_only:
+        print("== micro ==")
+        results['micro'] = run_micro(args.select)
+    if not args.micro_only:
+        print("== pipeline ==")
+        for vehicles in args.vehicles:
+            for sensors in args.sensors:
+                key = scenario_key(vehicles, sensors, args.wire_format)
+                try:
+                    r = run_scenario(vehicles, sensors, args.duration, args.wire_format, args.stats_port)
+                except RuntimeError as e:
+                    print(f"[WARN] {e}")
+                    continue
+                results['pipeline'][key] = r
+                print(format_scenario(key, r))
+
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.out}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(baseline, results, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+# Tests sit next to the modules they cover and, like the modules themselves,
+# import packages from the project root (sensors.shm_ring, fusion.kalman, ...).
+# pytest puts the directory of this rootdir conftest on sys.path for them.
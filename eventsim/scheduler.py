@@ -0,0 +1,32 @@
+import heapq
+import itertools
+
+class EventScheduler:
+    # Priority-queue scheduler driving a shared virtual clock. Events run in time
+    # order, and events at the same time run in the order they were scheduled, so
+    # a run is fully determined by its inputs and random seeds.
+    def __init__(self, start=0.0):
+        self.now = start
+        self._queue = []
+        self._seq = itertools.count()
+
+    def time(self):
+        # Drop-in for time.time() in code driven by this scheduler
+        return self.now
+
+    def at(self, when, callback, *args):
+        heapq.heappush(self._queue, (when, next(self._seq), callback, args))
+
+    def after(self, delay, callback, *args):
+        self.at(self.now + delay, callback, *args)
+
+    def run(self, until=None):
+        queue = self._queue
+        while queue:
+            if until is not None and queue[0][0] > until:
+                break
+            when, _, callback, args = heapq.heappop(queue)
+            self.now = when
+            callback(*args)
+        if until is not None:
+            self.now = max(self.now, until)
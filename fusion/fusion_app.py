@@ -1,61 +1,154 @@
-import socket
-import struct
 import argparse
-import threading
-import queue
+import asyncio
+import collections
 import time
-from multicast_config import SENSOR_MCAST_GRP, SENSOR_MCAST_PORT
 
-def parse_sensor_msg(msg):
-    # Format: name,x,y,t,noise_std
-    parts = msg.decode().strip().split(',')
-    if len(parts) != 5:
-        return None
-    return {
-        'name': parts[0],
-        'x': float(parts[1]),
-        'y': float(parts[2]),
-        't': float(parts[3]),
-        'noise_std': float(parts[4]),
-    }
-
-def sensor_multicast_listener(q, stop_event):
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    sock.bind(('', SENSOR_MCAST_PORT))
-    mreq = struct.pack('4sl', socket.inet_aton(SENSOR_MCAST_GRP), socket.INADDR_ANY)
-    sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
-    sock.settimeout(0.2)
-    while not stop_event.is_set():
-        try:
-            data, _ = sock.recvfrom(1024)
-            try:
-                text = data.decode()
-                parts = text.strip().split(',')
-                if len(parts) < 6 or parts[0] != 'sensor':
-                    continue
-                # Parse sensor message: sensor,name,x,y,t,noise_std
-                msg = {
-                    'name': parts[1],
-                    'x': float(parts[2]),
-                    'y': float(parts[3]),
-                    't': float(parts[4]),
-                    'noise_std': float(parts[5])
-                }
-                q.put((parts[1], msg))
-            except Exception:
-                continue
-        except socket.timeout:
-            continue
-    sock.close()
+import numpy as np
+
+from multicast_config import SENSOR_MCAST_GRP, SENSOR_MCAST_PORT, DEFAULT_RCVBUF, open_listener
+import wire_codec
+from wire_codec import LossTracker, decode_all
+from fusion.tracks import TrackTable
+from fusion.kalman import PROCESS_NOISE, MAX_LAG, KalmanBank
+from metrics import Registry, Sampler, percentiles, serve
+from recording.tracefile import TraceWriter
+from launcher import notify_ready
+
+def open_sensor_socket(rcvbuf=DEFAULT_RCVBUF):
+    return open_listener(SENSOR_MCAST_GRP, SENSOR_MCAST_PORT, rcvbuf, timeout=0.0)
+
+class SensorProtocol(asyncio.DatagramProtocol):
+    def __init__(self, node):
+        self.node = node
+
+    def datagram_received(self, data, addr):
+        t0 = time.perf_counter()
+        msgs = [msg for msg in decode_all(data) if msg['type'] == 'sensor']
+        self.node.parse_seconds.record(time.perf_counter() - t0)
+        self.node.packets_in.inc()
+        if msgs:
+            self.node.receive(msgs, time.monotonic())
+
+class FusionNode:
+    # Fuses as soon as data arrives, but emits at most one output per interval:
+    # an idle node answers a new measurement immediately, a busy one coalesces
+    # everything that arrived until the next deadline.
+    def __init__(self, tracks, interval, source, latency_window=100000, registry=None, debug_every=1, trace=None):
+        self.tracks = tracks
+        self.interval = interval
+        self.source = source
+        self.batch = []
+        self.arrivals = []  # monotonic receive time of each message in batch
+        self.latencies = collections.deque(maxlen=latency_window)  # seconds, measurement to output
+        self.data_ready = asyncio.Event()
+        self.loss = LossTracker()  # per-sensor sequence gaps
+        self.registry = registry if registry is not None else Registry('fusion', 'fusion')
+        self.packets_in = self.registry.counter('packets_in')
+        self.msgs_in = self.registry.counter('msgs_in')
+        self.outputs = self.registry.counter('outputs')
+        self.parse_seconds = self.registry.histogram('parse_seconds')
+        self.fusion_seconds = self.registry.histogram('fusion_seconds')
+        self.latency_seconds = self.registry.histogram('latency_seconds')
+        # Vehicle emission to fused output, from the messages' origin stamps
+        self.e2e_seconds = self.registry.histogram('e2e_seconds')
+        self.e2e_by_type = {}  # sensor type -> histogram
+        self.registry.gauge('queue_depth', lambda: len(self.batch))
+        self.registry.gauge('tracks', lambda: len(self.tracks))
+        self.registry.gauge('late_dropped', lambda: getattr(self.tracks, 'late_dropped', 0))
+        self.registry.gauge('decode', wire_codec.counters.copy)
+        self.registry.gauge('loss', self.loss.totals)
+        self.debug = Sampler(debug_every)
+        self.trace = trace  # TraceWriter or None
+
+    def receive(self, msgs, now):
+        self.msgs_in.inc(len(msgs))
+        self.loss.observe(msgs)
+        self.batch.extend(msgs)
+        self.arrivals.extend([now] * len(msgs))
+        self.data_ready.set()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        next_output = loop.time()
+        while True:
+            if not self.batch:
+                self.data_ready.clear()
+                await self.data_ready.wait()
+            delay = next_output - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.flush()
+            next_output = loop.time() + self.interval
+
+    def flush(self):
+        batch, arrivals = self.batch, self.arrivals
+        self.batch, self.arrivals = [], []
+        t0 = time.perf_counter()
+        self.tracks.update_batch(batch, arrivals)
+        updated = self.tracks.pop_updated()
+        self.fusion_seconds.record(time.perf_counter() - t0)
+        self.outputs.inc(len(updated))
+        for vehicle, fused, count in sorted(updated, key=lambda u: str(u[0])):
+            if self.debug.hit():
+                print(f"FUSED POSITION: x={fused[0]:.3f}, y={fused[1]:.3f} from {count} {self.source}")
+        now = time.monotonic()
+        lat = [now - a for a in arrivals]
+        self.latencies.extend(lat)
+        self.latency_seconds.record_many(lat)
+        for msg in batch:
+            origin = msg.get('origin')
+            if origin is not None:
+                hist = self.e2e_by_type.get(msg['sensor_type'])
+                if hist is None:
+                    hist = self.e2e_by_type[msg['sensor_type']] = self.registry.histogram(f"e2e_seconds.{msg['sensor_type']}")
+                hist.record(now - origin)
+                self.e2e_seconds.record(now - origin)
+        if self.trace is not None:
+            self.trace.append(batch, arrivals, now)
+
+    def latency_report(self):
+        if not self.latencies:
+            return "LATENCY: no measurements yet"
+        lat = np.fromiter(self.latencies, dtype=np.float64) * 1000.0
+        p50, p90, p99 = np.percentile(lat, [50, 90, 99])
+        line = f"LATENCY (ms, last {len(lat)} measurements): p50={p50:.2f} p90={p90:.2f} p99={p99:.2f} max={lat.max():.2f}"
+        if self.e2e_seconds.count:
+            e50, e99 = percentiles(self.e2e_seconds.snapshot(), (50, 99))
+            line += f"; end-to-end p50={e50 * 1000:.2f} p99={e99 * 1000:.2f}"
+        return line
+
+    async def report_latency(self, period):
+        while True:
+            await asyncio.sleep(period)
+            print(self.latency_report())
+            print(decode_report())
+            print(self.loss.report())
+            if self.trace is not None:
+                self.trace.flush()
+
+def decode_report():
+    c = wire_codec.counters
+    return f"DECODE: {c['decoded']} records decoded, {c['malformed']} malformed, {c['dropped']} dropped"
+
+async def run_node(node, latency_report, rcvbuf=DEFAULT_RCVBUF):
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(lambda: SensorProtocol(node), sock=open_sensor_socket(rcvbuf))
+    notify_ready()
+    tasks = [asyncio.create_task(node.run())]
+    if latency_report > 0:
+        tasks.append(asyncio.create_task(node.report_latency(latency_report)))
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        transport.close()
 
 def fuse_positions(sensor_data):
-    # Weighted average by 1/(noise_std^2)
+    # Weighted average by 1/noise_var
     weighted_sum_x = 0.0
     weighted_sum_y = 0.0
     weight_total = 0.0
     for d in sensor_data:
-        w = 1.0 / (d['noise_std'] ** 2) if d['noise_std'] > 0 else 1.0
+        w = 1.0 / d['noise_var'] if d['noise_var'] > 0 else 1.0
         weighted_sum_x += d['x'] * w
         weighted_sum_y += d['y'] * w
         weight_total += w
@@ -63,38 +156,43 @@ def fuse_positions(sensor_data):
         return None
     return (weighted_sum_x / weight_total, weighted_sum_y / weight_total)
 
+ESTIMATORS = ('kalman', 'mean')
+
+def make_tracks(estimator, process_noise=PROCESS_NOISE, max_lag=MAX_LAG):
+    # Returns (track estimator, what its update counts mean)
+    if estimator == 'kalman':
+        return KalmanBank(process_noise=process_noise, max_lag=max_lag), 'measurements'
+    return TrackTable(), 'sensors'
+
 def main():
     parser = argparse.ArgumentParser(description="Sensor Fusion App: Fuses positions from multiple sensors (UDP multicast).")
     parser.add_argument('--interval', type=float, default=0.1, help='Fusion interval (default: 0.1s)')
+    parser.add_argument('--estimator', choices=ESTIMATORS, default='kalman', help='Per-vehicle estimator: constant-velocity Kalman filter or inverse-variance weighted mean (default: kalman)')
+    parser.add_argument('--process-noise', type=float, default=PROCESS_NOISE, help=f'Kalman process noise, white acceleration intensity in m^2/s^3 (default: {PROCESS_NOISE})')
+    parser.add_argument('--max-lag', type=float, default=MAX_LAG, help=f'Drop measurements taken more than this many seconds before the state of their track (default: {MAX_LAG})')
+    parser.add_argument('--latency-report', type=float, default=10.0, help='Print measurement-to-output latency percentiles, decode counters and sensor stream loss every N seconds, 0 to disable (default: 10)')
+    parser.add_argument('--rcvbuf', type=int, default=DEFAULT_RCVBUF, help=f'SO_RCVBUF of the sensor socket in bytes (default: {DEFAULT_RCVBUF})')
+    parser.add_argument('--stats-port', type=int, default=0, help='Serve metrics as JSON on this local HTTP port (default: 0, off)')
+    parser.add_argument('--debug-every', type=int, default=1, help='Print every N-th fused position, 0 for none (default: 1, all)')
+    parser.add_argument('--trace', type=str, default=None, metavar='DIR', help='Write per-measurement hop timestamps to this trace directory, for recording.trace_report')
     args = parser.parse_args()
 
-    q = queue.Queue()
-    stop_event = threading.Event()
-    t = threading.Thread(target=sensor_multicast_listener, args=(q, stop_event), daemon=True)
-    t.start()
-    threads = [t]
-
     print(f"Listening for sensor messages on multicast group {SENSOR_MCAST_GRP}:{SENSOR_MCAST_PORT}")
-    last_data = {}  # sensor name -> latest msg
+    tracks, source = make_tracks(args.estimator, args.process_noise, args.max_lag)
+    trace = TraceWriter(args.trace) if args.trace else None
+    node = FusionNode(tracks, args.interval, source, debug_every=args.debug_every, trace=trace)
+    serve(args.stats_port, node.registry.snapshot)
     try:
-        while True:
-            start = time.time()
-            # Gather all new data
-            while not q.empty():
-                port, msg = q.get()
-                last_data[port] = msg
-            if last_data:
-                fused = fuse_positions(list(last_data.values()))
-                if fused:
-                    print(f"FUSED POSITION: x={fused[0]:.3f}, y={fused[1]:.3f} from {len(last_data)} sensors")
-            elapsed = time.time() - start
-            time.sleep(max(0, args.interval - elapsed))
+        asyncio.run(run_node(node, args.latency_report, args.rcvbuf))
     except KeyboardInterrupt:
+        print(node.latency_report())
+        print(decode_report())
+        print(node.loss.report())
         print("Fusion app stopped.")
     finally:
-        stop_event.set()
-        for t in threads:
-            t.join()
+        if trace is not None:
+            trace.close()
+            print(f"Trace: {trace.total} measurements written to {args.trace}")
 
 if __name__ == "__main__":
     main()
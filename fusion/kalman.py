@@ -0,0 +1,145 @@
+# Batched constant-velocity Kalman filter bank, one filter per vehicle track.
+#
+# All tracks live in stacked arrays (state [x, y, vx, vy] and 4x4 covariance), and
+# predict/update run as NumPy operations over every track touched by a batch of
+# measurements. Time is in seconds: a measurement is taken at its message's
+# origin stamp, when the vehicle emitted the position, or at its receive time
+# when it has none. Velocities are in m/s and process_noise is the white
+# acceleration intensity in m^2/s^3. Measurements are applied in time order; a
+# measurement older than its track (out of order or late) is folded in by
+# retrodicting the track to the measurement time, and dropped if it is more than
+# max_lag seconds behind.
+import time
+
+import numpy as np
+
+from fusion.tracks import reading_weight
+
+PROCESS_NOISE = 1.0  # m^2/s^3
+MAX_LAG = 1.0  # seconds
+
+class KalmanBank:
+    def __init__(self, process_noise=PROCESS_NOISE, init_velocity_var=1000.0, max_lag=MAX_LAG, capacity=64):
+        self.q = process_noise
+        self.init_velocity_var = init_velocity_var
+        self.max_lag = max_lag
+        self.index = {}  # vehicle -> row
+        self.vehicles = []  # row -> vehicle
+        self.x = np.zeros((capacity, 4))
+        self.P = np.zeros((capacity, 4, 4))
+        self.t = np.full(capacity, np.nan)  # time of each track's state, NaN until first measurement
+        self.pending = np.zeros(capacity, dtype=np.int64)  # measurements applied since pop_updated()
+        self.late_dropped = 0
+
+    def __len__(self):
+        return len(self.vehicles)
+
+    def _rows(self, vehicles):
+        rows = np.empty(len(vehicles), dtype=np.int64)
+        for i, vehicle in enumerate(vehicles):
+            row = self.index.get(vehicle)
+            if row is None:
+                row = self.index[vehicle] = len(self.vehicles)
+                self.vehicles.append(vehicle)
+            rows[i] = row
+        if len(self.vehicles) > len(self.t):
+            self._grow(len(self.vehicles))
+        return rows
+
+    def _grow(self, needed):
+        cap = len(self.t)
+        while cap < needed:
+            cap *= 2
+        extra = cap - len(self.t)
+        self.x = np.concatenate([self.x, np.zeros((extra, 4))])
+        self.P = np.concatenate([self.P, np.zeros((extra, 4, 4))])
+        self.t = np.concatenate([self.t, np.full(extra, np.nan)])
+        self.pending = np.concatenate([self.pending, np.zeros(extra, dtype=np.int64)])
+
+    def update_batch(self, msgs, received=None):
+        # received: receive time of each message, on the origin stamps' clock
+        # (default: now, time.monotonic()); used for messages without an origin
+        if not msgs:
+            return
+        rows = self._rows([m.get('vehicle') for m in msgs])
+        z = np.array([(m['x'], m['y']) for m in msgs], dtype=np.float64)
+        r = np.array([1.0 / reading_weight(m['noise_var']) for m in msgs], dtype=np.float64)
+        if received is None:
+            received = [time.monotonic()] * len(msgs)
+        t = np.array([r if m.get('origin') is None else m['origin'] for m, r in zip(msgs, received)], dtype=np.float64)
+        order = np.argsort(t, kind='stable')
+        rows, z, r, t = rows[order], z[order], r[order], t[order]
+        # Each round applies the earliest remaining measurement of every track,
+        # so a track with several measurements in this batch sees them in order
+        remaining = np.arange(len(rows))
+        while remaining.size:
+            _, first = np.unique(rows[remaining], return_index=True)
+            sel = remaining[first]
+            self._apply(rows[sel], z[sel], r[sel], t[sel])
+            remaining = np.delete(remaining, first)
+
+    def _apply(self, rows, z, r, t):
+        new = np.isnan(self.t[rows])
+        if new.any():
+            nr = rows[new]
+            self.x[nr] = 0.0
+            self.x[nr, :2] = z[new]
+            self.P[nr] = 0.0
+            self.P[nr, 0, 0] = r[new]
+            self.P[nr, 1, 1] = r[new]
+            self.P[nr, 2, 2] = self.init_velocity_var
+            self.P[nr, 3, 3] = self.init_velocity_var
+            self.t[nr] = t[new]
+            self.pending[nr] += 1
+        dt = t - self.t[rows]
+        keep = ~new & (dt >= -self.max_lag)
+        self.late_dropped += int(np.count_nonzero(~new & ~keep))
+        if not keep.any():
+            return
+        rows, z, r, t, dt = rows[keep], z[keep], r[keep], t[keep], dt[keep]
+        k = len(rows)
+        x = self.x[rows]
+        P = self.P[rows]
+
+        F = np.broadcast_to(np.eye(4), (k, 4, 4)).copy()
+        F[:, 0, 2] = dt
+        F[:, 1, 3] = dt
+        adt = np.abs(dt)
+        q3 = self.q * adt ** 3 / 3.0
+        q2 = self.q * adt ** 2 / 2.0
+        q1 = self.q * adt
+        Q = np.zeros((k, 4, 4))
+        Q[:, 0, 0] = Q[:, 1, 1] = q3
+        Q[:, 0, 2] = Q[:, 2, 0] = Q[:, 1, 3] = Q[:, 3, 1] = q2
+        Q[:, 2, 2] = Q[:, 3, 3] = q1
+
+        Fx = np.einsum('kij,kj->ki', F, x)
+        Ft = F.transpose(0, 2, 1)
+        PFt = P @ Ft
+        FPFt = F @ PFt + Q
+        # In-order measurements predict the track forward to t. Late ones leave the
+        # state where it is and use the retrodicted cross-covariance instead.
+        fwd = dt >= 0
+        x_prior = np.where(fwd[:, None], Fx, x)
+        P_prior = np.where(fwd[:, None, None], FPFt, P)
+        C = np.where(fwd[:, None, None], FPFt, PFt)[:, :, :2]
+        S = FPFt[:, :2, :2].copy()
+        S[:, 0, 0] += r
+        S[:, 1, 1] += r
+        K = C @ np.linalg.inv(S)
+        innov = z - Fx[:, :2]
+        x_post = x_prior + np.einsum('kij,kj->ki', K, innov)
+        P_post = P_prior - K @ S @ K.transpose(0, 2, 1)
+        self.x[rows] = x_post
+        self.P[rows] = 0.5 * (P_post + P_post.transpose(0, 2, 1))
+        self.t[rows] = np.where(fwd, t, self.t[rows])
+        self.pending[rows] += 1
+
+    def pop_updated(self):
+        # Returns [(vehicle, (x, y), num_measurements)] for tracks that changed
+        rows = np.flatnonzero(self.pending[:len(self.vehicles)])
+        counts = self.pending[rows].tolist()
+        xs = self.x[rows, 0].tolist()
+        ys = self.x[rows, 1].tolist()
+        self.pending[rows] = 0
+        return [(self.vehicles[row], (x, y), n) for row, x, y, n in zip(rows.tolist(), xs, ys, counts)]
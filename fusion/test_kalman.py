@@ -0,0 +1,83 @@
+import random
+
+import numpy as np
+import pytest
+
+from fusion.kalman import KalmanBank
+
+def _reading(vehicle, x, y, t, noise_var=0.25):
+    # Taken at origin t seconds; the path fraction is not the filter's clock
+    return {'type': 'sensor', 'name': 'sensor1', 'x': x, 'y': y, 't': 0.5, 'sensor_type': 'noisy', 'noise_var': noise_var, 'vehicle': vehicle,
+            'origin': t}
+
+def _track(bank, vehicle):
+    row = bank.index[vehicle]
+    return bank.x[row], bank.t[row]
+
+def test_tracks_constant_velocity():
+    rng = random.Random(0)
+    bank = KalmanBank(process_noise=0.1)
+    for k in range(200):
+        t = k * 0.05
+        bank.update_batch([_reading('v1', 2.0 * t + rng.gauss(0, 0.1), -1.0 * t + rng.gauss(0, 0.1), t, 0.01)])
+    x, t = _track(bank, 'v1')
+    assert t == pytest.approx(199 * 0.05)
+    assert x[:2] == pytest.approx([2.0 * t, -1.0 * t], abs=0.2)
+    assert x[2:] == pytest.approx([2.0, -1.0], abs=0.3)
+
+def test_batch_order_does_not_matter():
+    readings = [_reading(f"v{k % 3}", k * 0.1, k * 0.2, k * 0.01) for k in range(30)]
+    shuffled = readings[:]
+    random.Random(1).shuffle(shuffled)
+    a, b = KalmanBank(), KalmanBank()
+    a.update_batch(readings)
+    b.update_batch(shuffled)
+    for vehicle in ('v0', 'v1', 'v2'):
+        assert _track(a, vehicle)[0] == pytest.approx(_track(b, vehicle)[0])
+
+def test_out_of_sequence_measurement_is_folded_in():
+    bank = KalmanBank(max_lag=0.1)
+    bank.update_batch([_reading('v1', 1.0 * k / 10, 0.0, k / 10) for k in range(11)])
+    bank.pop_updated()
+    before, t_before = _track(bank, 'v1')
+    before = before.copy()
+    # Late by 0.05 s and off the track: applied without moving the track's time
+    bank.update_batch([_reading('v1', 0.95, 1.0, 0.95)])
+    after, t_after = _track(bank, 'v1')
+    assert t_after == t_before == pytest.approx(1.0)
+    assert after[1] > before[1]
+    assert bank.late_dropped == 0
+    assert bank.pop_updated() == [('v1', (after[0], after[1]), 1)]
+
+def test_out_of_sequence_matches_in_order_closely():
+    truth = [(k / 10, 0.5 * k / 10, k / 10) for k in range(20)]
+    in_order = KalmanBank()
+    in_order.update_batch([_reading('v1', x, y, t) for x, y, t in truth])
+    late = KalmanBank()
+    late.update_batch([_reading('v1', x, y, t) for x, y, t in truth if t != 1.85])
+    late.update_batch([_reading('v1', 1.85, 0.925, 1.85)])
+    assert _track(late, 'v1')[0][:2] == pytest.approx(_track(in_order, 'v1')[0][:2], abs=0.05)
+
+def test_too_late_measurement_is_dropped():
+    bank = KalmanBank(max_lag=0.1)
+    bank.update_batch([_reading('v1', 0.0, 0.0, 0.0), _reading('v1', 1.0, 0.0, 1.0)])
+    before = _track(bank, 'v1')[0].copy()
+    bank.update_batch([_reading('v1', 5.0, 5.0, 0.5)])
+    assert bank.late_dropped == 1
+    assert np.array_equal(_track(bank, 'v1')[0], before)
+
+def test_receive_time_stands_in_for_a_missing_origin():
+    bank = KalmanBank()
+    msgs = [_reading('v1', 2.0 * k, 0.0, None, 0.01) for k in range(20)]
+    bank.update_batch(msgs, received=[100.0 + k for k in range(20)])
+    x, t = _track(bank, 'v1')
+    assert t == 119.0
+    assert x[2] == pytest.approx(2.0, abs=0.1)
+
+def test_pop_updated_counts_and_resets():
+    bank = KalmanBank(capacity=2)
+    bank.update_batch([_reading(f"v{i}", i, i, 0.0) for i in range(5)] + [_reading('v0', 0.1, 0.1, 0.1)])
+    updated = {vehicle: n for vehicle, _, n in bank.pop_updated()}
+    assert updated == {'v0': 2, 'v1': 1, 'v2': 1, 'v3': 1, 'v4': 1}
+    assert bank.pop_updated() == []
+    assert len(bank) == 5
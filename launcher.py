@@ -0,0 +1,181 @@
+# Component launcher for simulation_manager. In forkserver mode the component
+# modules are imported once, in a multiprocessing forkserver, and every
+# component is forked from that warm process instead of paying interpreter
+# start-up and imports again; exec mode runs each as `python -m <module>`.
+#
+# Readiness works like sd_notify: the manager binds a Unix datagram socket and
+# names it in SIM_NOTIFY_SOCKET; a component calls notify_ready() once its
+# sockets are set up, which sends "READY <pid>". While they produce data they
+# send a rate-limited "ACTIVE <pid>" heartbeat, which the supervisor uses to
+# detect an idle simulation. Outside the manager the variable is unset and
+# notify() does nothing.
+import importlib
+import multiprocessing
+import os
+import select
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+NOTIFY_ENV = 'SIM_NOTIFY_SOCKET'
+LAUNCH_MODES = ['forkserver', 'exec']
+HEARTBEAT_INTERVAL = 5.0  # seconds between ACTIVE notifications
+
+# Imported once by the forkserver. The visualizer is always exec'd: GUI
+# backends do not survive a fork.
+PRELOAD = [
+    'vehicles.vehicle_sim',
+    'vehicles.fleet_sim',
+    'sensors.noisy_sensor',
+    'sensors.adas_sensor',
+    'sensors.tacan_sensor',
+    'sensors.sensor_host',
+    'fusion.fusion_app',
+]
+
+_notify_sock = None
+
+def notify(state, block=True):
+    # block=False drops the notification instead of waiting for a full queue
+    global _notify_sock
+    path = os.environ.get(NOTIFY_ENV)
+    if not path:
+        return
+    if _notify_sock is None:
+        _notify_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        _notify_sock.settimeout(5.0)  # blocks only while the manager's queue is full
+    try:
+        _notify_sock.sendto(f"{state} {os.getpid()}".encode(), 0 if block else socket.MSG_DONTWAIT, path)
+    except OSError:
+        pass  # manager gone or queue full; nothing to tell
+
+def notify_ready():
+    notify('READY')
+
+class Heartbeat:
+    # Call beat() whenever the component sends data; at most one ACTIVE per interval goes out
+    def __init__(self, interval=HEARTBEAT_INTERVAL):
+        self.interval = interval
+        self.next = 0.0
+
+    def beat(self):
+        now = time.monotonic()
+        if now >= self.next:
+            self.next = now + self.interval
+            notify('ACTIVE', block=False)
+
+class NotifyListener:
+    def __init__(self):
+        self.dir = tempfile.mkdtemp(prefix='sim-notify-')
+        self.path = os.path.join(self.dir, 'notify.sock')
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.path)
+        self.sock.setblocking(False)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def drain(self):
+        # Returns [(state, pid)] for every queued notification
+        out = []
+        while True:
+            try:
+                data = self.sock.recv(256)
+            except BlockingIOError:
+                return out
+            try:
+                state, pid = data.decode().split()
+                out.append((state, int(pid)))
+            except ValueError:
+                continue
+
+    def close(self):
+        self.sock.close()
+        try:
+            os.unlink(self.path)
+            os.rmdir(self.dir)
+        except OSError:
+            pass
+
+def run_module(module, argv):
+    # Entry point of a forked component: what `python -m module argv...` would run
+    sys.argv = [module] + list(argv)
+    importlib.import_module(module).main()
+
+class Child:
+    # Popen-like handle (pid, poll, returncode, terminate, kill, wait) of a forked component
+    def __init__(self, process):
+        self.process = process
+        self.pid = process.pid
+
+    @property
+    def returncode(self):
+        return self.process.exitcode
+
+    def poll(self):
+        return self.process.exitcode
+
+    def terminate(self):
+        self.process.terminate()
+
+    def kill(self):
+        self.process.kill()
+
+    def wait(self, timeout=None):
+        self.process.join(timeout)
+        return self.process.exitcode
+
+class Launcher:
+    def __init__(self, mode='forkserver', preload=PRELOAD):
+        self.mode = mode
+        self.notify = NotifyListener()
+        # Inherited by exec'd children and by the forkserver, hence all forked ones
+        os.environ[NOTIFY_ENV] = self.notify.path
+        self.ready = set()  # pids that reported READY
+        self.last_active = time.monotonic()  # latest ACTIVE heartbeat from any child
+        if mode == 'forkserver':
+            self.ctx = multiprocessing.get_context('forkserver')
+            self.ctx.set_forkserver_preload(list(preload))
+
+    def start(self, module, argv, fork=True):
+        # fork=False always execs, for components that must not be forked
+        if self.mode == 'exec' or not fork:
+            proc = subprocess.Popen([sys.executable, '-m', module] + list(argv))
+        else:
+            process = self.ctx.Process(target=run_module, args=(module, argv), name=module)
+            process.start()
+            proc = Child(process)
+        # Keep the notify queue short while launching; a full one blocks the children
+        self.poll_ready()
+        return proc
+
+    def poll_ready(self):
+        for state, pid in self.notify.drain():
+            if state == 'READY':
+                self.ready.add(pid)
+            elif state == 'ACTIVE':
+                self.last_active = time.monotonic()
+
+    def wait_ready(self, procs, timeout=30.0):
+        # Blocks until every process reported READY or exited; returns the ones
+        # that are not ready (exited first, or still silent at the timeout)
+        pending = {p.pid: p for p in procs}
+        failed = []
+        deadline = time.monotonic() + timeout
+        while True:
+            self.poll_ready()
+            for pid, p in list(pending.items()):
+                if pid in self.ready:
+                    del pending[pid]
+                elif p.poll() is not None:
+                    failed.append(pending.pop(pid))
+            left = deadline - time.monotonic()
+            if not pending or left <= 0:
+                return failed + list(pending.values())
+            select.select([self.notify], [], [], min(left, 0.1))
+
+    def close(self):
+        self.notify.close()
+        os.environ.pop(NOTIFY_ENV, None)
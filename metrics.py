@@ -0,0 +1,214 @@
+# Lightweight per-process metrics: counters, gauges and latency histograms in
+# one Registry, served as JSON on a local HTTP stats port (GET /metrics).
+# Recording is a few integer and dict operations, cheap enough for per-message
+# hot paths; the server runs in a daemon thread and only copies values.
+#
+# Histograms bucket microseconds HDR-style: exact below 2*SUB, then SUB
+# buckets per power of two (about 3% relative error). Buckets are shared by
+# every process, so snapshots merge by adding bucket counts.
+import json
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STATS_HOST = '127.0.0.1'
+SUB_BITS = 5
+SUB = 1 << SUB_BITS
+# Gauges that are ratios of other gauges: merge() recomputes them from the
+# merged counts instead of summing them. name -> (numerator, denominator terms)
+RATIO_GAUGES = {'loss.loss_rate': ('loss.lost', ('loss.received', 'loss.lost'))}
+
+def bucket_index(us):
+    if us < 2 * SUB:
+        return us
+    e = us.bit_length() - SUB_BITS - 1
+    return e * SUB + (us >> e)
+
+def bucket_value(idx):
+    # Midpoint of a bucket, in microseconds
+    if idx < 2 * SUB:
+        return float(idx)
+    e = idx // SUB - 1
+    return ((idx - e * SUB) << e) + (1 << e) / 2
+
+class Counter:
+    __slots__ = ('value', 'fn')
+
+    def __init__(self, fn=None):
+        self.value = 0
+        self.fn = fn  # read the count from elsewhere instead
+
+    def inc(self, n=1):
+        self.value += n
+
+    def read(self):
+        return self.fn() if self.fn else self.value
+
+class Gauge(Counter):
+    __slots__ = ()
+
+    def set(self, value):
+        self.value = value
+
+class Histogram:
+    def __init__(self):
+        self.counts = {}  # bucket index -> count
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        us = int(seconds * 1e6)
+        i = bucket_index(us) if us > 0 else 0
+        self.counts[i] = self.counts.get(i, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def record_many(self, values):
+        counts = self.counts
+        for seconds in values:
+            us = int(seconds * 1e6)
+            i = bucket_index(us) if us > 0 else 0
+            counts[i] = counts.get(i, 0) + 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+        self.count += len(values)
+
+    def snapshot(self):
+        return {'count': self.count, 'sum': self.total, 'max': self.max, 'buckets': sorted(self.counts.copy().items())}
+
+def percentiles(hist, qs=(50, 90, 99)):
+    # Percentiles in seconds of a histogram snapshot, None when it is empty
+    if not hist['count']:
+        return [None for _ in qs]
+    out = []
+    for q in qs:
+        rank = q / 100.0 * hist['count']
+        seen = 0
+        for idx, n in hist['buckets']:
+            seen += n
+            if seen >= rank:
+                break
+        out.append(min(bucket_value(idx) / 1e6, hist['max']))
+    return out
+
+class Registry:
+    def __init__(self, role, name):
+        self.role = role  # vehicle, sensor, fusion, ...
+        self.name = name
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def counter(self, name, fn=None):
+        c = self.counters.get(name)
+        if c is None:
+            c = self.counters[name] = Counter(fn)
+        return c
+
+    def gauge(self, name, fn=None):
+        # fn may return a number or a dict, exported as name.key
+        g = self.gauges.get(name)
+        if g is None:
+            g = self.gauges[name] = Gauge(fn)
+        return g
+
+    def histogram(self, name):
+        h = self.histograms.get(name)
+        if h is None:
+            h = self.histograms[name] = Histogram()
+        return h
+
+    def snapshot(self):
+        gauges = {}
+        for name, g in list(self.gauges.items()):
+            value = g.read()
+            if isinstance(value, dict):
+                for k, v in value.items():
+                    gauges[f"{name}.{k}"] = v
+            else:
+                gauges[name] = value
+        return {'role': self.role, 'name': self.name, 'time': time.time(),
+                'counters': {name: c.read() for name, c in list(self.counters.items())},
+                'gauges': gauges,
+                'histograms': {name: h.snapshot() for name, h in list(self.histograms.items())}}
+
+def merge(snapshots):
+    # Sums counters and gauges and adds histogram buckets across snapshots;
+    # ratio gauges are recomputed from the sums
+    out = {'counters': {}, 'gauges': {}, 'histograms': {}, 'processes': len(snapshots)}
+    ratios = set()
+    for snap in snapshots:
+        for kind in ('counters', 'gauges'):
+            for name, v in snap[kind].items():
+                if kind == 'gauges' and name in RATIO_GAUGES:
+                    ratios.add(name)
+                    continue
+                out[kind][name] = out[kind].get(name, 0) + v
+        for name, h in snap['histograms'].items():
+            m = out['histograms'].setdefault(name, {'count': 0, 'sum': 0.0, 'max': 0.0, 'buckets': {}})
+            m['count'] += h['count']
+            m['sum'] += h['sum']
+            m['max'] = max(m['max'], h['max'])
+            for idx, n in h['buckets']:
+                m['buckets'][idx] = m['buckets'].get(idx, 0) + n
+    for m in out['histograms'].values():
+        m['buckets'] = sorted(m['buckets'].items())
+    gauges = out['gauges']
+    for name in ratios:
+        num, den = RATIO_GAUGES[name]
+        total = sum(gauges.get(d, 0) for d in den)
+        gauges[name] = gauges.get(num, 0) / total if total else 0.0
+    return out
+
+def serve(port, snapshot, host=STATS_HOST):
+    # Serves snapshot() as JSON on http://host:port/metrics; port 0 disables
+    if not port:
+        return None
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            body = json.dumps(snapshot()).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as e:
+        print(f"[WARN] Stats port {port} unavailable: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def fetch(port, host=STATS_HOST, timeout=0.5):
+    with urllib.request.urlopen(f"http://{host}:{port}/metrics", timeout=timeout) as resp:
+        return json.loads(resp.read())
+
+class Sampler:
+    # Sampled debug logging: hit() is true on every n-th call, never for n=0
+    def __init__(self, every=0):
+        self.every = every
+        self.n = 0
+
+    def hit(self):
+        if not self.every:
+            return False
+        self.n += 1
+        if self.n < self.every:
+            return False
+        self.n = 0
+        return True
@@ -1,4 +1,7 @@
 # Shared multicast configuration for all simulator components
+import socket
+import struct
+
 # Vehicle → Sensor
 VEHICLE_MCAST_GRP = '224.1.1.1'
 VEHICLE_MCAST_PORT = 5004
@@ -6,3 +9,26 @@ VEHICLE_MCAST_PORT = 5004
 # Sensor → Fusion/Display
 SENSOR_MCAST_GRP = '224.1.1.2'
 SENSOR_MCAST_PORT = 5005
+
+DEFAULT_RCVBUF = 4 * 1024 * 1024  # bytes; the kernel caps this at net.core.rmem_max
+
+def open_listener(group, port, rcvbuf=DEFAULT_RCVBUF, timeout=None):
+    # Joins group on port. timeout=None blocks, 0 makes the socket non-blocking.
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if rcvbuf:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        # Linux reports double the usable size it granted
+        granted = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) // 2
+        if granted < rcvbuf:
+            print(f"[WARN] SO_RCVBUF for {group}:{port}: requested {rcvbuf} bytes, got {granted} (raise net.core.rmem_max)")
+    sock.bind(('', port))
+    mreq = struct.pack('4sl', socket.inet_aton(group), socket.INADDR_ANY)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+    sock.settimeout(timeout)
+    return sock
+
+def open_sender():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+    return sock
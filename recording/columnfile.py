@@ -0,0 +1,86 @@
+# Append-only column files, the storage shared by the traffic log
+# (recording.logfile) and the latency trace (recording.tracefile). One
+# directory per file:
+#
+#   meta.json   format version and column dtypes
+#   names.txt   interned name table, one name per line (row index = line number);
+#               a missing name (None) is stored as the reserved index NO_NAME
+#   <col>.bin   one append-only file per column, fixed-width little-endian values
+#
+# Every column file is a flat array that loads into NumPy with np.memmap
+# without copying. A crash can leave the last write partially done;
+# load_columns() trims every column to the shortest one.
+import json
+import os
+
+import numpy as np
+
+NO_NAME = 0xFFFFFFFF  # name index of a missing name, never in the name table
+
+class ColumnWriter:
+    # columns: ((name, dtype), ...); appending to an existing file needs the same version
+    def __init__(self, path, columns, version, kind='file'):
+        self.path = path
+        self.columns = columns
+        os.makedirs(path, exist_ok=True)
+        if not os.path.exists(os.path.join(path, 'meta.json')):
+            with open(os.path.join(path, 'meta.json'), 'w') as f:
+                json.dump({'version': version, 'columns': dict(columns)}, f, indent=2)
+        else:
+            existing = read_meta(path)['version']
+            if existing != version:
+                raise ValueError(f"Cannot append to version {existing} {kind} {path}")
+        self.names = {}  # name -> index
+        names_path = os.path.join(path, 'names.txt')
+        if os.path.exists(names_path):
+            with open(names_path) as f:
+                for line in f:
+                    self.names[line.rstrip('\n')] = len(self.names)
+        self.names_file = open(names_path, 'a')
+        self.files = {col: open(os.path.join(path, f'{col}.bin'), 'ab') for col, _ in columns}
+        self.total = 0  # rows written through this writer
+
+    def intern(self, name):
+        if name is None:
+            return NO_NAME
+        idx = self.names.get(name)
+        if idx is None:
+            idx = self.names[name] = len(self.names)
+            self.names_file.write(f"{name}\n")
+        return idx
+
+    def write_rows(self, cols, n):
+        # cols: column name -> array holding at least n values of the column dtype
+        # Names first, so every index in the written rows resolves
+        self.names_file.flush()
+        for col, _ in self.columns:
+            self.files[col].write(cols[col][:n].tobytes())
+        self.total += n
+
+    def flush(self):
+        self.names_file.flush()
+        for f in self.files.values():
+            f.flush()
+
+    def close(self):
+        self.flush()
+        self.names_file.close()
+        for f in self.files.values():
+            f.close()
+
+def read_meta(path):
+    with open(os.path.join(path, 'meta.json')) as f:
+        return json.load(f)
+
+def load_columns(path, columns):
+    # Returns (columns, names): columns maps column name -> read-only np.memmap
+    with open(os.path.join(path, 'names.txt')) as f:
+        names = [line.rstrip('\n') for line in f]
+    rows = min(os.path.getsize(os.path.join(path, f'{col}.bin')) // np.dtype(dtype).itemsize for col, dtype in columns)
+    loaded = {}
+    for col, dtype in columns:
+        if rows:
+            loaded[col] = np.memmap(os.path.join(path, f'{col}.bin'), dtype=dtype, mode='r', shape=(rows,))
+        else:
+            loaded[col] = np.empty(0, dtype=dtype)
+    return loaded, names
@@ -0,0 +1,66 @@
+# Columnar traffic log: one recording.columnfile directory per recording
+# (meta.json, names.txt and one append-only <col>.bin per column). Rows are
+# buffered and appended in chunks; load_log() memmaps the columns and trims a
+# partially written last chunk.
+#
+# Version 1 logs stored noise_std instead of sensor_type and noise_var;
+# load_log() converts them (every v1 sensor record is a noisy sensor).
+import numpy as np
+
+from recording.columnfile import NO_NAME, ColumnWriter, load_columns, read_meta
+
+LOG_VERSION = 2
+
+COLUMNS = (
+    ('recv_time', '<f8'),  # receive wall-clock time (time.time())
+    ('kind', 'u1'),        # wire_codec.KIND_VEHICLE or KIND_SENSOR
+    ('name', '<u4'),       # sender name index
+    ('vehicle', '<u4'),    # observed vehicle name index (sender itself for vehicles), NO_NAME if the record had none
+    ('x', '<f8'),
+    ('y', '<f8'),
+    ('t', '<f8'),
+    ('sensor_type', 'u1'), # 1-based index into wire_codec.SENSOR_TYPES, 0 for vehicle records
+    ('noise_var', '<f8'),  # NaN for vehicle records
+)
+V1_COLUMNS = COLUMNS[:-2] + (('noise_std', '<f8'),)
+
+class LogWriter(ColumnWriter):
+    def __init__(self, path, chunk_rows=65536):
+        super().__init__(path, COLUMNS, LOG_VERSION, 'log')
+        self.chunk = {col: np.empty(chunk_rows, dtype=dtype) for col, dtype in COLUMNS}
+        self.chunk_rows = chunk_rows
+        self.rows = 0  # rows buffered in the current chunk
+
+    def append(self, recv_time, kind, name, vehicle, x, y, t, sensor_type, noise_var):
+        i = self.rows
+        c = self.chunk
+        c['recv_time'][i] = recv_time
+        c['kind'][i] = kind
+        c['name'][i] = self.intern(name)
+        c['vehicle'][i] = self.intern(vehicle)
+        c['x'][i] = x
+        c['y'][i] = y
+        c['t'][i] = t
+        c['sensor_type'][i] = sensor_type
+        c['noise_var'][i] = noise_var
+        self.rows = i + 1
+        if self.rows == self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.write_rows(self.chunk, self.rows)
+            self.rows = 0
+        super().flush()
+
+def load_log(path):
+    # Returns (columns, names): columns maps column name -> read-only np.memmap
+    version = read_meta(path)['version']
+    if version not in (1, LOG_VERSION):
+        raise ValueError(f"Unsupported log version {version} in {path}")
+    columns, names = load_columns(path, V1_COLUMNS if version == 1 else COLUMNS)
+    if version == 1:
+        noise_std = columns.pop('noise_std')
+        columns['sensor_type'] = np.where(np.isnan(noise_std), 0, 1).astype('u1')
+        columns['noise_var'] = noise_std * noise_std
+    return columns, names
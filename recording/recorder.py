@@ -0,0 +1,88 @@
+import argparse
+import selectors
+import signal
+import time
+
+from multicast_config import VEHICLE_MCAST_GRP, VEHICLE_MCAST_PORT, SENSOR_MCAST_GRP, SENSOR_MCAST_PORT, open_listener
+import wire_codec
+from wire_codec import RECV_BUFSIZE, KIND_SENSOR, KIND_VEHICLE, SENSOR_TYPES, LossTracker, decode_all
+from recording.logfile import LogWriter
+from metrics import Registry, serve
+
+def record(writer, loss, data, now):
+    n = 0
+    msgs = decode_all(data)
+    loss.observe(msgs)
+    for msg in msgs:
+        if msg['type'] == 'vehicle':
+            writer.append(now, KIND_VEHICLE, msg['name'], msg['name'], msg['x'], msg['y'], msg['t'], 0, float('nan'))
+        else:
+            writer.append(now, KIND_SENSOR, msg['name'], msg['vehicle'], msg['x'], msg['y'], msg['t'],
+                          SENSOR_TYPES.index(msg['sensor_type']) + 1, msg['noise_var'])
+        n += 1
+    return n
+
+def main():
+    parser = argparse.ArgumentParser(description="Traffic Recorder: Writes all vehicle and sensor multicast messages to a columnar log.")
+    parser.add_argument('--out', type=str, required=True, help='Log directory (created, or appended to if it exists)')
+    parser.add_argument('--flush-interval', type=float, default=1.0, help='Flush buffered rows at least this often (seconds, default: 1)')
+    parser.add_argument('--chunk-rows', type=int, default=65536, help='Rows buffered per column before a flush (default: 65536)')
+    parser.add_argument('--rcvbuf', type=int, default=8 * 1024 * 1024, help='SO_RCVBUF per socket in bytes (default: 8 MiB)')
+    parser.add_argument('--duration', type=float, default=0.0, help='Stop after this many seconds (default: run until interrupted)')
+    parser.add_argument('--stats-port', type=int, default=0, help='Serve metrics as JSON on this local HTTP port (default: 0, off)')
+    args = parser.parse_args()
+
+    writer = LogWriter(args.out, chunk_rows=args.chunk_rows)
+    sel = selectors.DefaultSelector()
+    socks = [open_listener(VEHICLE_MCAST_GRP, VEHICLE_MCAST_PORT, args.rcvbuf, timeout=0.0),
+             open_listener(SENSOR_MCAST_GRP, SENSOR_MCAST_PORT, args.rcvbuf, timeout=0.0)]
+    loss = LossTracker()  # vehicle and sensor streams
+    registry = Registry('recorder', 'recorder')
+    packets_in = registry.counter('packets_in')
+    count = 0
+    registry.counter('msgs_in', lambda: count)
+    flush_seconds = registry.histogram('flush_seconds')
+    registry.gauge('decode', wire_codec.counters.copy)
+    registry.gauge('loss', loss.totals)
+    serve(args.stats_port, registry.snapshot)
+    for sock in socks:
+        sel.register(sock, selectors.EVENT_READ)
+
+    def signal_handler(sig, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    print(f"Recording {VEHICLE_MCAST_GRP}:{VEHICLE_MCAST_PORT} and {SENSOR_MCAST_GRP}:{SENSOR_MCAST_PORT} to {args.out}")
+    start = time.time()
+    next_flush = start + args.flush_interval
+    try:
+        while True:
+            for key, _ in sel.select(timeout=max(0.0, next_flush - time.time())):
+                sock = key.fileobj
+                # Drain everything queued on this socket before selecting again
+                while True:
+                    try:
+                        data = sock.recv(RECV_BUFSIZE)
+                    except BlockingIOError:
+                        break
+                    count += record(writer, loss, data, time.time())
+                    packets_in.inc()
+            now = time.time()
+            if now >= next_flush:
+                writer.flush()
+                flush_seconds.record(time.time() - now)
+                next_flush = now + args.flush_interval
+            if args.duration and now - start >= args.duration:
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+        for sock in socks:
+            sock.close()
+    elapsed = time.time() - start
+    print(f"Recorder stopped: {count} messages in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.0f} msgs/s) written to {args.out}")
+    print(loss.report())
+
+if __name__ == "__main__":
+    main()
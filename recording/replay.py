@@ -0,0 +1,160 @@
+import socket
+import argparse
+import time
+
+import numpy as np
+
+from multicast_config import VEHICLE_MCAST_GRP, VEHICLE_MCAST_PORT, SENSOR_MCAST_GRP, SENSOR_MCAST_PORT
+from wire_codec import WIRE_FORMATS, SENSOR_TYPES, KIND_VEHICLE, Announcer, encode_sensor, encode_vehicle, frame_batches
+from recording.logfile import NO_NAME, load_log
+from fusion.fusion_app import ESTIMATORS, make_tracks
+from fusion.kalman import PROCESS_NOISE, MAX_LAG
+
+AFAP_CHUNK = 1024  # records per send pass in as-fast-as-possible mode
+
+def iter_messages(columns, names, start=0, stop=None):
+    # Yields rows start..stop as message dicts, in the same form wire_codec.decode() returns
+    cols = [columns[c][start:stop].tolist() for c in ('kind', 'name', 'vehicle', 'x', 'y', 't', 'sensor_type', 'noise_var')]
+    for kind, name, vehicle, x, y, t, sensor_type, noise_var in zip(*cols):
+        if kind == KIND_VEHICLE:
+            yield {'type': 'vehicle', 'name': names[name], 'x': x, 'y': y, 't': t}
+        else:
+            yield {'type': 'sensor', 'name': names[name], 'x': x, 'y': y, 't': t, 'sensor_type': SENSOR_TYPES[sensor_type - 1],
+                   'noise_var': noise_var, 'vehicle': names[vehicle] if vehicle != NO_NAME else None}
+
+def replay_network(columns, names, speed=1.0, wire_format='text', batch=False):
+    # Re-emits the log onto the vehicle and sensor groups. speed=None means as fast as possible.
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+    vehicle_addr = (VEHICLE_MCAST_GRP, VEHICLE_MCAST_PORT)
+    sensor_addr = (SENSOR_MCAST_GRP, SENSOR_MCAST_PORT)
+    announcer = Announcer(names, wire_format)
+
+    recv_time = np.asarray(columns['recv_time'])
+    n = len(recv_time)
+    schedule = (recv_time - recv_time[0]) / speed if speed and n else None
+    start = time.time()
+    i = 0
+    while i < n:
+        now = time.time() - start
+        if schedule is None:
+            j = min(n, i + AFAP_CHUNK)
+        else:
+            j = int(np.searchsorted(schedule, now, side='right'))
+            if j <= i:
+                time.sleep(min(schedule[i] - now, 0.1))
+                continue
+        for pkt in announcer.due(time.time()):
+            sock.sendto(pkt, vehicle_addr)
+            sock.sendto(pkt, sensor_addr)
+        vehicle_recs = []
+        sensor_recs = []
+        for msg in iter_messages(columns, names, i, j):
+            if msg['type'] == 'vehicle':
+                vehicle_recs.append(encode_vehicle(msg['name'], msg['x'], msg['y'], msg['t'], wire_format))
+            else:
+                sensor_recs.append(encode_sensor(msg['name'], msg['x'], msg['y'], msg['t'], msg['sensor_type'], msg['noise_var'], msg['vehicle'], wire_format))
+        for recs, addr in ((vehicle_recs, vehicle_addr), (sensor_recs, sensor_addr)):
+            if batch:
+                recs = frame_batches(recs, wire_format)
+            for rec in recs:
+                sock.sendto(rec, addr)
+        i = j
+    sock.close()
+    return {'messages': n, 'elapsed': time.time() - start}
+
+def vehicle_truth(columns, names):
+    # vehicle name -> (t, x, y) arrays sorted by t, from the recorded vehicle messages
+    kind = np.asarray(columns['kind'])
+    rows = np.flatnonzero(kind == KIND_VEHICLE)
+    ids = np.asarray(columns['name'])[rows]
+    t = np.asarray(columns['t'])[rows]
+    x = np.asarray(columns['x'])[rows]
+    y = np.asarray(columns['y'])[rows]
+    truth = {}
+    for vid in np.unique(ids):
+        sel = ids == vid
+        tv, first = np.unique(t[sel], return_index=True)
+        truth[names[vid]] = (tv, x[sel][first], y[sel][first])
+    return truth
+
+def replay_in_process(columns, names, estimator='kalman', interval=0.1, process_noise=PROCESS_NOISE, max_lag=MAX_LAG):
+    # Feeds the recorded sensor messages straight into the fusion estimator, one
+    # --interval window of receive time at a time, and scores each fused output
+    # against the recorded vehicle position at the newest measurement time.
+    tracks, _ = make_tracks(estimator, process_noise, max_lag)
+    truth = vehicle_truth(columns, names)
+    recv_time = np.asarray(columns['recv_time'])
+    n = len(recv_time)
+    edges = np.arange(recv_time[0], recv_time[-1] + interval, interval) if n else np.empty(0)
+    bounds = np.searchsorted(recv_time, edges, side='right')
+    errors = []
+    fused_msgs = 0
+    start = time.perf_counter()
+    i = 0
+    for j in bounds.tolist() + [n]:
+        if j <= i:
+            continue
+        # The log has no origin stamps; the recorded receive time stands in
+        batch, received = [], []
+        for k, msg in enumerate(iter_messages(columns, names, i, j), i):
+            if msg['type'] == 'sensor':
+                batch.append(msg)
+                received.append(recv_time[k])
+        i = j
+        tracks.update_batch(batch, received)
+        fused_msgs += len(batch)
+        latest_t = {}
+        for msg in batch:
+            if msg['t'] > latest_t.get(msg['vehicle'], -np.inf):
+                latest_t[msg['vehicle']] = msg['t']
+        for vehicle, fused, _ in tracks.pop_updated():
+            if vehicle not in truth or vehicle not in latest_t:
+                continue
+            tv, xv, yv = truth[vehicle]
+            tt = latest_t[vehicle]
+            errors.append(np.hypot(fused[0] - np.interp(tt, tv, xv), fused[1] - np.interp(tt, tv, yv)))
+    elapsed = time.perf_counter() - start
+    err = np.asarray(errors)
+    result = {'messages': fused_msgs, 'elapsed': elapsed, 'outputs': len(err)}
+    if len(err):
+        result.update(mean_error=float(err.mean()), rmse=float(np.sqrt((err ** 2).mean())),
+                      p95_error=float(np.percentile(err, 95)), max_error=float(err.max()))
+    if hasattr(tracks, 'late_dropped'):
+        result['late_dropped'] = tracks.late_dropped
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay: Re-emits a recorded traffic log, or feeds it straight into fusion.")
+    parser.add_argument('log', type=str, help='Log directory written by recording.recorder')
+    parser.add_argument('--speed', type=float, default=1.0, help='Replay speed multiplier (default: 1.0)')
+    parser.add_argument('--afap', action='store_true', help='Replay as fast as possible, ignoring recorded timing')
+    parser.add_argument('--wire-format', choices=WIRE_FORMATS, default='text', help='Message encoding on the wire (default: text)')
+    parser.add_argument('--batch', action='store_true', help='Send records due together as batch datagrams')
+    parser.add_argument('--in-process', action='store_true', help='No sockets: feed sensor messages straight into the fusion estimator and report accuracy and throughput')
+    parser.add_argument('--estimator', choices=ESTIMATORS, default='kalman', help='Estimator for --in-process (default: kalman)')
+    parser.add_argument('--interval', type=float, default=0.1, help='Fusion window of recorded time for --in-process (default: 0.1s)')
+    parser.add_argument('--process-noise', type=float, default=PROCESS_NOISE, help=f'Kalman process noise for --in-process, in m^2/s^3 (default: {PROCESS_NOISE})')
+    parser.add_argument('--max-lag', type=float, default=MAX_LAG, help=f'Kalman late-measurement cutoff for --in-process, in seconds (default: {MAX_LAG})')
+    args = parser.parse_args()
+
+    columns, names = load_log(args.log)
+    if args.in_process:
+        result = replay_in_process(columns, names, args.estimator, args.interval, args.process_noise, args.max_lag)
+        print(f"Fused {result['messages']} sensor messages into {result['outputs']} outputs in {result['elapsed']:.3f}s ({result['messages'] / max(result['elapsed'], 1e-9):.0f} msgs/s)")
+        if result['outputs']:
+            print(f"Error vs recorded vehicle positions: mean={result['mean_error']:.3f} rmse={result['rmse']:.3f} p95={result['p95_error']:.3f} max={result['max_error']:.3f}")
+        if 'late_dropped' in result:
+            print(f"Late measurements dropped: {result['late_dropped']}")
+        return
+    speed = None if args.afap else args.speed
+    print(f"Replaying {len(columns['recv_time'])} messages from {args.log} ({'as fast as possible' if speed is None else f'{speed}x'})")
+    try:
+        result = replay_network(columns, names, speed, args.wire_format, args.batch)
+    except KeyboardInterrupt:
+        print("Replay stopped.")
+        return
+    print(f"Replayed {result['messages']} messages in {result['elapsed']:.2f}s")
+
+if __name__ == "__main__":
+    main()
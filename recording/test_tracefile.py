@@ -0,0 +1,29 @@
+import pytest
+
+from recording.columnfile import NO_NAME
+from recording.trace_report import summarize
+from recording.tracefile import TraceWriter, load_trace
+
+def _reading(vehicle, origin, sensed, sensor_type='noisy'):
+    return {'type': 'sensor', 'name': 'sensor1', 'x': 0.0, 'y': 0.0, 't': 0.5, 'sensor_type': sensor_type, 'noise_var': 0.25,
+            'vehicle': vehicle, 'origin': origin, 'sensed': sensed}
+
+def test_round_trip(tmp_path):
+    writer = TraceWriter(str(tmp_path / 'trace'))
+    writer.append([_reading('vehicle1', 1.0, 1.001), _reading('vehicle2', None, None, 'tacan')], [1.002, 1.003], 1.004)
+    writer.close()
+    columns, names = load_trace(str(tmp_path / 'trace'))
+    assert names == ['sensor1', 'vehicle1', 'vehicle2']
+    assert columns['received'].tolist() == [1.002, 1.003]
+    assert columns['origin'][0] == 1.0 and columns['origin'][1] != columns['origin'][1]
+
+def test_missing_vehicle_is_a_sentinel_and_skipped(tmp_path):
+    writer = TraceWriter(str(tmp_path / 'trace'))
+    writer.append([_reading('vehicle1', 1.0, 1.001), _reading(None, 1.0, 1.5)], [1.002, 1.6], 1.01)
+    writer.close()
+    columns, names = load_trace(str(tmp_path / 'trace'))
+    assert names == ['sensor1', 'vehicle1']
+    assert columns['vehicle'].tolist() == [1, NO_NAME]
+    e2e = next(r for r in summarize(columns, names) if r[0] == 'end-to-end' and r[1] == 'all')
+    assert e2e[2] == 1
+    assert e2e[5] == pytest.approx(0.01)
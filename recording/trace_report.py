@@ -0,0 +1,63 @@
+import argparse
+import sys
+
+import numpy as np
+
+from wire_codec import SENSOR_TYPES
+from recording.tracefile import NO_NAME, STAGES, load_trace
+
+def stage_latencies(columns, stage_from, stage_to, rows=None):
+    # Seconds from one stamp to the other for the selected rows, skipping unknown stamps
+    lat = np.asarray(columns[stage_to]) - np.asarray(columns[stage_from])
+    if rows is not None:
+        lat = lat[rows]
+    return lat[~np.isnan(lat)]
+
+def summarize(columns, names, by='sensor_type'):
+    # Returns [(stage, group, count, p50, p99, max)] in seconds; group 'all' first.
+    # Readings without a vehicle (old senders) are skipped.
+    known = np.asarray(columns['vehicle']) != NO_NAME
+    if by == 'sensor_type':
+        keys = np.asarray(columns['sensor_type'])
+        label = lambda k: SENSOR_TYPES[k - 1]
+    else:
+        keys = np.asarray(columns['sensor'])
+        label = lambda k: names[k]
+    groups = [('all', known)] + [(label(k), known & (keys == k)) for k in np.unique(keys[known]).tolist()]
+    out = []
+    for stage, stage_from, stage_to in STAGES:
+        for group, rows in groups:
+            lat = stage_latencies(columns, stage_from, stage_to, rows)
+            if len(lat):
+                p50, p99 = np.percentile(lat, [50, 99])
+                out.append((stage, group, len(lat), p50, p99, lat.max()))
+            else:
+                out.append((stage, group, 0, float('nan'), float('nan'), float('nan')))
+    return out
+
+def main():
+    parser = argparse.ArgumentParser(description="Trace Report: Latency per stage and sensor type from a fusion_app --trace log.")
+    parser.add_argument('trace', type=str, help='Trace directory written by fusion_app --trace')
+    parser.add_argument('--by', choices=['sensor_type', 'sensor'], default='sensor_type', help='Break stages down by sensor type or by sensor (default: sensor_type)')
+    parser.add_argument('--slo-ms', type=float, default=0.0, help='Fail (exit status 1) if end-to-end p99 exceeds this many milliseconds (default: 0, no check)')
+    args = parser.parse_args()
+
+    columns, names = load_trace(args.trace)
+    n = len(columns['fused'])
+    skipped = int(np.count_nonzero(np.asarray(columns['vehicle']) == NO_NAME))
+    print(f"{n} traced measurements in {args.trace}" + (f", {skipped} without a vehicle skipped" if skipped else ""))
+    if not n:
+        return
+    print(f"{'stage':<16} {args.by:<12} {'count':>8} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    rows = summarize(columns, names, args.by)
+    for stage, group, count, p50, p99, worst in rows:
+        print(f"{stage:<16} {group:<12} {count:>8} {p50 * 1000:>9.2f} {p99 * 1000:>9.2f} {worst * 1000:>9.2f}")
+    if args.slo_ms > 0:
+        p99 = next(r[4] for r in rows if r[0] == 'end-to-end' and r[1] == 'all')
+        if not p99 <= args.slo_ms / 1000:
+            print(f"SLO VIOLATED: end-to-end p99 {p99 * 1000:.2f} ms > {args.slo_ms:.2f} ms")
+            sys.exit(1)
+        print(f"SLO met: end-to-end p99 {p99 * 1000:.2f} ms <= {args.slo_ms:.2f} ms")
+
+if __name__ == "__main__":
+    main()
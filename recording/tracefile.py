@@ -0,0 +1,67 @@
+# Latency trace log written by fusion_app --trace: one row per fused sensor
+# measurement, with the time.monotonic() stamp of every hop it went through.
+# Stored as a recording.columnfile directory, like recording.logfile;
+# load_trace() trims a torn last write.
+#
+#   origin    the vehicle emitted the position (for an extrapolated TACAN
+#             reading, the instant it was carried forward to)
+#   sensed    the sensor emitted the reading
+#   received  fusion received the datagram
+#   fused     fusion output the estimate that included it
+#
+# Unknown stamps (old senders, replayed sensor traffic) are NaN.
+import math
+
+import numpy as np
+
+from recording.columnfile import NO_NAME, ColumnWriter, load_columns, read_meta
+from wire_codec import SENSOR_TYPES
+
+TRACE_VERSION = 1
+
+COLUMNS = (
+    ('sensor_type', 'u1'),  # 1-based index into wire_codec.SENSOR_TYPES
+    ('sensor', '<u4'),      # sensor name index
+    ('vehicle', '<u4'),     # vehicle name index, NO_NAME for readings without a vehicle field
+    ('origin', '<f8'),
+    ('sensed', '<f8'),
+    ('received', '<f8'),
+    ('fused', '<f8'),
+)
+
+# (stage, from stamp, to stamp)
+STAGES = (
+    ('vehicle->sensor', 'origin', 'sensed'),
+    ('sensor->fusion', 'sensed', 'received'),
+    ('fusion', 'received', 'fused'),
+    ('end-to-end', 'origin', 'fused'),
+)
+
+_type_codes = {stype: code for code, stype in enumerate(SENSOR_TYPES, 1)}
+
+class TraceWriter(ColumnWriter):
+    def __init__(self, path):
+        super().__init__(path, COLUMNS, TRACE_VERSION, 'trace')
+
+    def append(self, msgs, received, fused):
+        # msgs: fused sensor messages; received: receive stamp of each; fused: output stamp
+        if not msgs:
+            return
+        nan = math.nan
+        cols = {
+            'sensor_type': np.array([_type_codes[m['sensor_type']] for m in msgs], dtype='u1'),
+            'sensor': np.array([self.intern(m['name']) for m in msgs], dtype='<u4'),
+            'vehicle': np.array([self.intern(m['vehicle']) for m in msgs], dtype='<u4'),
+            'origin': np.array([nan if m.get('origin') is None else m['origin'] for m in msgs], dtype='<f8'),
+            'sensed': np.array([nan if m.get('sensed') is None else m['sensed'] for m in msgs], dtype='<f8'),
+            'received': np.asarray(received, dtype='<f8'),
+            'fused': np.full(len(msgs), fused, dtype='<f8'),
+        }
+        self.write_rows(cols, len(msgs))
+
+def load_trace(path):
+    # Returns (columns, names): columns maps column name -> read-only np.memmap
+    version = read_meta(path)['version']
+    if version != TRACE_VERSION:
+        raise ValueError(f"Unsupported trace version {version} in {path}")
+    return load_columns(path, COLUMNS)
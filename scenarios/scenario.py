@@ -0,0 +1,253 @@
+# Declarative scenarios: a JSON, TOML or YAML file describing vehicles as
+# waypoint routes and the sensors watching them, compiled into a flat-array
+# plan. The plan is cached on disk by content hash (.scenario_cache/ next to
+# the file), so a large scenario is parsed once and later loads are a single
+# np.load; the manager hands the cached plan path to the vehicle and sensor
+# processes, which all read the same arrays.
+#
+#   {"duration": 30,                                   optional run length, default: last arrival
+#    "vehicles": [
+#      {"name": "truck", "waypoints": [[-10, 0], [0, 5], [10, 0]], "speed": 2.0, "shape": "spline"},
+#      {"waypoints": [[0, -10], [0, 10]], "duration": 8, "start": 2},
+#      {"circle": {"count": 100, "radius": 10, "delta": 135, "duration": 10}}],
+#    "sensors": [
+#      {"type": "noisy", "noise_std": 0.5, "count": 4},
+#      {"name": "radar", "type": "tacan", "x": 0, "y": 0, "rotation_period": 30},
+#      {"type": "adas", "interval": 15}]}
+#
+# A vehicle's speed is one value or one per segment; "duration" instead spreads
+# the route over that many seconds at constant speed (default: 10 s). "start"
+# delays its departure. "shape" is polyline (default) or spline, a smooth curve
+# through the waypoints (see vehicles.trajectory). Unnamed entities are
+# numbered vehicleN / sensorN. The top-level "duration" is the length of the
+# run: vehicles stop broadcasting by then, and the manager stops the run.
+import argparse
+import hashlib
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from wire_codec import SENSOR_TYPES
+from vehicles.trajectory import Trajectories, arc_length, build_track, track_times
+
+PLAN_VERSION = 2
+CACHE_DIR = '.scenario_cache'
+DEFAULT_DURATION = 10.0
+
+# The one tunable of each sensor type, as in sensor_host specs
+SENSOR_PARAMS = {'noisy': 'noise_std', 'adas': 'interval', 'tacan': 'rotation_period'}
+
+def read_scenario(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.json':
+        return json.loads(data)
+    if ext == '.toml':
+        try:
+            import tomllib
+        except ImportError:
+            raise ValueError(f"{path}: TOML scenarios need Python 3.11+")
+        return tomllib.loads(data.decode())
+    if ext in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError(f"{path}: YAML scenarios need PyYAML (pip install pyyaml)")
+        return yaml.safe_load(data)
+    raise ValueError(f"{path}: unknown scenario format {ext!r} (use .json, .toml or .yaml)")
+
+def _point(value, where):
+    try:
+        x, y = value
+        return float(x), float(y)
+    except (TypeError, ValueError):
+        raise ValueError(f"{where}: expected [x, y], got {value!r}")
+
+def _circle_routes(spec, where):
+    from vehicles.vehicle_sim import circle_paths
+    count = int(spec.get('count', 1))
+    if count < 1:
+        raise ValueError(f"{where}: count must be at least 1")
+    paths = circle_paths(count, float(spec.get('delta', 135.0)), float(spec.get('radius', 10.0)),
+                         _point(spec.get('center', (0.0, 0.0)), f"{where}.center"))
+    return [{'waypoints': [p1, p2], 'duration': spec.get('duration', DEFAULT_DURATION), 'start': spec.get('start', 0.0)}
+            for p1, p2 in paths]
+
+def _leg_seconds(lengths, entry, where):
+    # Seconds spent on each waypoint-to-waypoint leg of the given lengths
+    if 'speed' in entry and 'duration' in entry:
+        raise ValueError(f"{where}: give speed or duration, not both")
+    if 'speed' in entry:
+        speed = np.asarray(entry['speed'], dtype=np.float64)
+        if speed.ndim == 1 and len(speed) != len(lengths):
+            raise ValueError(f"{where}: {len(speed)} speeds for {len(lengths)} segments")
+        if np.any(speed <= 0):
+            raise ValueError(f"{where}: speeds must be positive")
+        seconds = lengths / speed
+    else:
+        duration = float(entry.get('duration', DEFAULT_DURATION))
+        if duration <= 0:
+            raise ValueError(f"{where}: duration must be positive")
+        total = lengths.sum()
+        seconds = lengths / total * duration if total > 0 else np.full(len(lengths), duration / len(lengths))
+    return seconds
+
+def compile_scenario(scenario):
+    # Returns the plan arrays of a parsed scenario dict
+    if not isinstance(scenario, dict):
+        raise ValueError("scenario must be a mapping with 'vehicles' and 'sensors'")
+    routes = []
+    for i, entry in enumerate(scenario.get('vehicles', [])):
+        where = f"vehicles[{i}]"
+        if 'circle' in entry:
+            routes += [(None, r, f"{where}.circle") for r in _circle_routes(entry['circle'], where)]
+        else:
+            routes.append((entry.get('name'), entry, where))
+    names, waypoints, arrivals, offsets, depart = [], [], [], [0], []
+    for name, entry, where in routes:
+        wps = np.array([_point(p, f"{where}.waypoints") for p in entry.get('waypoints', [])], dtype=np.float64).reshape(-1, 2)
+        if len(wps) < 2:
+            raise ValueError(f"{where}: a route needs at least 2 waypoints")
+        try:
+            track, knots = build_track(wps, entry.get('shape', 'polyline'))
+        except ValueError as e:
+            raise ValueError(f"{where}: {e}")
+        arc = arc_length(track)
+        arrival = track_times(arc, knots, _leg_seconds(np.diff(arc[knots]), entry, where))
+        if not arrival[-1] > 0:
+            raise ValueError(f"{where}: the route takes no time; it needs distinct waypoints")
+        names.append(name or f"vehicle{len(names) + 1}")
+        waypoints.append(track)
+        arrivals.append(arrival)
+        offsets.append(offsets[-1] + len(track))
+        depart.append(float(entry.get('start', 0.0)))
+
+    sensor_names, types, pos, params = [], [], [], []
+    for i, entry in enumerate(scenario.get('sensors', [])):
+        where = f"sensors[{i}]"
+        stype = entry.get('type', 'noisy')
+        if stype not in SENSOR_TYPES:
+            raise ValueError(f"{where}: unknown sensor type {stype!r}, types: {', '.join(SENSOR_TYPES)}")
+        count = int(entry.get('count', 1))
+        if count > 1 and 'name' in entry:
+            raise ValueError(f"{where}: a named sensor cannot have a count")
+        xy = (entry.get('x', 0.0), entry.get('y', 0.0)) if stype == 'tacan' else (math.nan, math.nan)
+        for _ in range(count):
+            sensor_names.append(entry.get('name') or f"sensor{len(sensor_names) + 1}")
+            types.append(SENSOR_TYPES.index(stype) + 1)
+            pos.append(_point(xy, where))
+            params.append(float(entry.get(SENSOR_PARAMS[stype], math.nan)))
+    for label, seen in (('vehicle', names), ('sensor', sensor_names)):
+        if len(set(seen)) != len(seen):
+            raise ValueError(f"duplicate {label} names")
+
+    ends = [d + a[-1] for d, a in zip(depart, arrivals)]
+    duration = float(scenario.get('duration', max(ends, default=0.0)))
+    if 'duration' in scenario and not duration > 0:
+        raise ValueError("duration must be positive")
+    return {
+        'version': np.array(PLAN_VERSION),
+        'duration': np.array(duration),
+        'vehicle_names': np.array(names, dtype=str),
+        'route_start': np.array(offsets, dtype=np.int64),
+        'waypoints': np.concatenate(waypoints) if waypoints else np.empty((0, 2)),  # track points, see build_track
+        'arrival': np.concatenate(arrivals) if arrivals else np.empty(0),  # seconds from departure to each
+        'depart': np.array(depart, dtype=np.float64),
+        'sensor_names': np.array(sensor_names, dtype=str),
+        'sensor_type': np.array(types, dtype=np.uint8),  # 1-based index into SENSOR_TYPES
+        'sensor_pos': np.array(pos, dtype=np.float64).reshape(-1, 2),  # NaN unless tacan
+        'sensor_param': np.array(params, dtype=np.float64),  # NaN: the type's default
+    }
+
+class Plan:
+    def __init__(self, arrays, path=None):
+        if int(arrays['version']) != PLAN_VERSION:
+            raise ValueError(f"Unsupported plan version {int(arrays['version'])}")
+        self.path = path
+        self.duration = float(arrays['duration'])
+        self.vehicle_names = arrays['vehicle_names'].tolist()
+        self.route_start = arrays['route_start']
+        self.waypoints = arrays['waypoints']
+        self.arrival = arrays['arrival']
+        self.depart = arrays['depart']
+        self.sensor_names = arrays['sensor_names'].tolist()
+        self.sensor_type = arrays['sensor_type']
+        self.sensor_pos = arrays['sensor_pos']
+        self.sensor_param = arrays['sensor_param']
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as npz:
+            return cls({k: npz[k] for k in npz.files}, path)
+
+    def route(self, i):
+        # (track points, arrival times) of vehicle i
+        a, b = self.route_start[i], self.route_start[i + 1]
+        return self.waypoints[a:b], self.arrival[a:b]
+
+    def end_time(self, i):
+        # Seconds from the scenario start until vehicle i arrives
+        return self.depart[i] + self.arrival[self.route_start[i + 1] - 1]
+
+    def trajectories(self, rows=None):
+        # Trajectories of the selected vehicles, in rows order
+        if rows is None:
+            return Trajectories(self.route_start, self.waypoints, self.arrival, self.depart)
+        routes = [self.route(i) for i in rows]
+        starts = np.concatenate(([0], np.cumsum([len(wps) for wps, _ in routes])))
+        return Trajectories(starts, np.concatenate([wps for wps, _ in routes]), np.concatenate([arr for _, arr in routes]),
+                            self.depart[list(rows)])
+
+    def sensor_specs(self, rows=None):
+        # [(name, type, params)] in sensor_host's parse_sensor_spec form
+        rows = range(len(self.sensor_names)) if rows is None else rows
+        specs = []
+        for i in rows:
+            stype = SENSOR_TYPES[self.sensor_type[i] - 1]
+            params = self.sensor_pos[i].tolist() if stype == 'tacan' else []
+            if not math.isnan(self.sensor_param[i]):
+                params.append(float(self.sensor_param[i]))
+            specs.append((self.sensor_names[i], stype, params))
+        return specs
+
+def scenario_hash(path):
+    h = hashlib.sha256(f"plan v{PLAN_VERSION}\n".encode())
+    with open(path, 'rb') as f:
+        h.update(f.read())
+    return h.hexdigest()
+
+def load_scenario(path, cache_dir=None):
+    # Returns the compiled Plan of a scenario file, compiling it on a cache miss
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    plan_path = os.path.join(cache_dir, f"{stem}-{scenario_hash(path)[:16]}.npz")
+    if not os.path.exists(plan_path):
+        arrays = compile_scenario(read_scenario(path))
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{plan_path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, plan_path)  # concurrent compiles of the same file are harmless
+    return Plan.load(plan_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Scenario: Compile a scenario file into its cached plan and summarize it.")
+    parser.add_argument('scenario', type=str, help='Scenario file (.json, .toml or .yaml)')
+    parser.add_argument('--cache-dir', type=str, default=None, help=f'Plan cache directory (default: {CACHE_DIR}/ next to the scenario)')
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    plan = load_scenario(args.scenario, args.cache_dir)
+    elapsed = time.perf_counter() - t0
+    counts = ', '.join(f"{int((plan.sensor_type == i + 1).sum())} {t}" for i, t in enumerate(SENSOR_TYPES))
+    print(f"{args.scenario}: {len(plan.vehicle_names)} vehicles on {len(plan.waypoints)} waypoints, "
+          f"{len(plan.sensor_names)} sensors ({counts}), {plan.duration:.1f}s")
+    print(f"Plan {plan.path} loaded in {elapsed * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from scenarios import scenario
+from scenarios.scenario import Plan, compile_scenario, load_scenario, scenario_hash
+
+SCENARIO = {
+    'vehicles': [
+        {'name': 'truck', 'waypoints': [[0, 0], [3, 4], [3, 10]], 'speed': 1.0},
+        {'waypoints': [[0, -10], [0, 10]], 'duration': 8, 'start': 2},
+        {'circle': {'count': 3, 'radius': 10, 'duration': 5}},
+    ],
+    'sensors': [
+        {'type': 'noisy', 'noise_std': 0.5, 'count': 2},
+        {'name': 'radar', 'type': 'tacan', 'x': 1, 'y': 2, 'rotation_period': 30},
+        {'type': 'adas'},
+    ],
+}
+
+def _write(tmp_path, data, name='scene.json'):
+    path = tmp_path / name
+    path.write_text(json.dumps(data))
+    return str(path)
+
+def test_compile_names_and_routes():
+    plan = Plan(compile_scenario(SCENARIO))
+    assert plan.vehicle_names == ['truck', 'vehicle2', 'vehicle3', 'vehicle4', 'vehicle5']
+    assert plan.sensor_names == ['sensor1', 'sensor2', 'radar', 'sensor4']
+    wps, arrival = plan.route(0)
+    assert wps.tolist() == [[0, 0], [3, 4], [3, 10]]
+    assert arrival.tolist() == pytest.approx([0.0, 5.0, 11.0])
+    assert plan.route(1)[1].tolist() == pytest.approx([0.0, 8.0])
+    assert plan.depart.tolist() == [0.0, 2.0, 0.0, 0.0, 0.0]
+    assert plan.end_time(1) == pytest.approx(10.0)
+
+def test_duration_defaults_to_the_last_arrival():
+    assert Plan(compile_scenario(SCENARIO)).duration == pytest.approx(11.0)
+    assert Plan(compile_scenario(dict(SCENARIO, duration=4))).duration == 4.0
+
+@pytest.mark.parametrize('data, message', [
+    ({'vehicles': [{'waypoints': [[0, 0], [1, 0]], 'speed': 1, 'duration': 1}]}, 'not both'),
+    ({'vehicles': [{'waypoints': [[0, 0]]}]}, 'at least 2 waypoints'),
+    ({'vehicles': [{'waypoints': [[0, 0], [1, 0]], 'speed': [1, 2]}]}, '2 speeds for 1 segments'),
+    ({'vehicles': [{'waypoints': [[0, 0], [1, 0]], 'shape': 'bezier'}]}, 'unknown route shape'),
+    ({'sensors': [{'type': 'sonar'}]}, 'unknown sensor type'),
+    ({'sensors': [{'name': 'a', 'count': 2}]}, 'cannot have a count'),
+    ({'vehicles': [{'name': 'a', 'waypoints': [[0, 0], [1, 0]]}] * 2}, 'duplicate vehicle names'),
+    ({'vehicles': [{'waypoints': [[0, 0], [1, 0]]}], 'duration': 0}, 'duration must be positive'),
+])
+def test_invalid_scenarios(data, message):
+    with pytest.raises(ValueError, match=message):
+        compile_scenario(data)
+
+def test_sensor_specs():
+    plan = Plan(compile_scenario(SCENARIO))
+    assert plan.sensor_specs() == [('sensor1', 'noisy', [0.5]), ('sensor2', 'noisy', [0.5]),
+                                   ('radar', 'tacan', [1.0, 2.0, 30.0]), ('sensor4', 'adas', [])]
+    assert plan.sensor_specs([2]) == [('radar', 'tacan', [1.0, 2.0, 30.0])]
+
+def test_load_caches_by_content(tmp_path):
+    path = _write(tmp_path, SCENARIO)
+    first = load_scenario(path)
+    assert first.path.startswith(str(tmp_path / scenario.CACHE_DIR))
+    assert load_scenario(path).path == first.path
+    _write(tmp_path, dict(SCENARIO, duration=3))
+    edited = load_scenario(path)
+    assert edited.path != first.path and edited.duration == 3.0
+    assert len(list((tmp_path / scenario.CACHE_DIR).iterdir())) == 2
+
+def test_hash_covers_the_plan_version(tmp_path, monkeypatch):
+    path = _write(tmp_path, SCENARIO)
+    before = scenario_hash(path)
+    monkeypatch.setattr(scenario, 'PLAN_VERSION', scenario.PLAN_VERSION + 1)
+    assert scenario_hash(path) != before
+
+def test_trajectories_of_selected_rows():
+    plan = Plan(compile_scenario(SCENARIO))
+    everyone = plan.trajectories()
+    picked = plan.trajectories([1, 0])
+    for elapsed in (0.0, 3.0, 7.5, 20.0):
+        pos_all = everyone.state(elapsed)[0]
+        assert picked.state(elapsed)[0] == pytest.approx(pos_all[[1, 0]])
@@ -1,36 +1,30 @@
 import socket
-import struct
 import argparse
 import random
 import time
-from multicast_config import VEHICLE_MCAST_GRP, VEHICLE_MCAST_PORT, SENSOR_MCAST_GRP, SENSOR_MCAST_PORT
+from multicast_config import VEHICLE_MCAST_GRP, VEHICLE_MCAST_PORT, SENSOR_MCAST_GRP, SENSOR_MCAST_PORT, DEFAULT_RCVBUF, open_listener, open_sender
+import wire_codec
+from wire_codec import WIRE_FORMATS, RECV_BUFSIZE, Announcer, LossTracker, decode_all, encode_sensor
+from metrics import Registry, Sampler, serve
+from launcher import Heartbeat, notify_ready
 
-def parse_vehicle_msg(msg):
-    parts = msg.decode().strip().split(',')
-    if len(parts) < 5 or parts[0] != 'vehicle':
-        return None
-    return {
-        'name': parts[1],
-        'x': float(parts[2]),
-        'y': float(parts[3]),
-        't': float(parts[4]),
-    }
+ADAS_NOISE_VAR = 0.01  # m^2; ADAS reports the vehicle's own position
 
 def main():
     parser = argparse.ArgumentParser(description="ADAS Sensor: Publishes vehicle info at random intervals (~15s)")
     parser.add_argument('--interval', type=float, default=15.0, help='Average broadcast interval (seconds)')
+    parser.add_argument('--noise-var', type=float, default=ADAS_NOISE_VAR, help=f'Reported measurement noise variance (m^2, default: {ADAS_NOISE_VAR})')
     parser.add_argument('--name', type=str, default='adas1', help='Sensor name/id')
+    parser.add_argument('--wire-format', choices=WIRE_FORMATS, default='text', help='Message encoding (default: text)')
+    parser.add_argument('--rcvbuf', type=int, default=DEFAULT_RCVBUF, help=f'SO_RCVBUF of the vehicle socket in bytes (default: {DEFAULT_RCVBUF})')
+    parser.add_argument('--stats-port', type=int, default=0, help='Serve metrics as JSON on this local HTTP port (default: 0, off)')
+    parser.add_argument('--debug-every', type=int, default=0, help='Print every N-th reading sent (default: 0, none)')
     args = parser.parse_args()
 
-    recv_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-    recv_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    recv_sock.bind(('', VEHICLE_MCAST_PORT))
-    mreq = struct.pack('4sl', socket.inet_aton(VEHICLE_MCAST_GRP), socket.INADDR_ANY)
-    recv_sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+    recv_sock = open_listener(VEHICLE_MCAST_GRP, VEHICLE_MCAST_PORT, args.rcvbuf)
     recv_sock.settimeout(1.0)
 
-    send_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-    send_sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+    send_sock = open_sender()
     send_addr = (SENSOR_MCAST_GRP, SENSOR_MCAST_PORT)
 
     print(f"ADAS sensor started. Listening on {VEHICLE_MCAST_GRP}:{VEHICLE_MCAST_PORT}, broadcasting to {SENSOR_MCAST_GRP}:{SENSOR_MCAST_PORT}")
@@ -38,27 +32,55 @@ def main():
     last_publish = {}  # vehicle_name -> last publish time
     publish_interval = {}  # vehicle_name -> randomized interval
 
+    announcer = Announcer([args.name], args.wire_format)
+    loss = LossTracker()  # vehicle streams
+    registry = Registry('sensor', args.name)
+    packets_in = registry.counter('packets_in')
+    msgs_in = registry.counter('msgs_in')
+    msgs_out = registry.counter('msgs_out')
+    parse_seconds = registry.histogram('parse_seconds')
+    registry.gauge('decode', wire_codec.counters.copy)
+    registry.gauge('loss', loss.totals)
+    serve(args.stats_port, registry.snapshot)
+    notify_ready()
+    heartbeat = Heartbeat()
+    debug = Sampler(args.debug_every)
     while True:
         try:
-            data, _ = recv_sock.recvfrom(1024)
-            v = parse_vehicle_msg(data)
-            if not v:
-                continue
+            for pkt in announcer.due(time.time()):
+                send_sock.sendto(pkt, send_addr)
+            data, _ = recv_sock.recvfrom(RECV_BUFSIZE)
             now = time.time()
-            veh = v['name']
-            if veh not in last_publish:
-                last_publish[veh] = 0
-                publish_interval[veh] = random.uniform(args.interval * 0.8, args.interval * 1.2)
-            if now - last_publish[veh] >= publish_interval[veh]:
-                msg = f"sensor,{args.name},{v['x']:.3f},{v['y']:.3f},{v['t']:.3f},ADAS"
-                send_sock.sendto(msg.encode(), send_addr)
-                print(f"ADAS Broadcast: {msg}")
-                last_publish[veh] = now
-                publish_interval[veh] = random.uniform(args.interval * 0.8, args.interval * 1.2)
+            t0 = time.perf_counter()
+            msgs = decode_all(data)
+            parse_seconds.record(time.perf_counter() - t0)
+            packets_in.inc()
+            msgs_in.inc(len(msgs))
+            loss.observe(msgs)
+            for v in msgs:
+                if v['type'] != 'vehicle':
+                    continue
+                veh = v['name']
+                if veh not in last_publish:
+                    last_publish[veh] = 0
+                    publish_interval[veh] = random.uniform(args.interval * 0.8, args.interval * 1.2)
+                if now - last_publish[veh] >= publish_interval[veh]:
+                    announcer.add(v['name'])
+                    for pkt in announcer.due(now):
+                        send_sock.sendto(pkt, send_addr)
+                    msg = encode_sensor(args.name, v['x'], v['y'], v['t'], 'adas', args.noise_var, v['name'], args.wire_format, origin=v['origin'])
+                    send_sock.sendto(msg, send_addr)
+                    msgs_out.inc()
+                    heartbeat.beat()
+                    if debug.hit():
+                        print(f"ADAS Broadcast: sensor2,{args.name},{v['x']:.3f},{v['y']:.3f},{v['t']:.3f},adas,{args.noise_var:.6g},{v['name']}")
+                    last_publish[veh] = now
+                    publish_interval[veh] = random.uniform(args.interval * 0.8, args.interval * 1.2)
         except socket.timeout:
             continue
         except KeyboardInterrupt:
             print("ADAS sensor stopped.")
+            print(loss.report('VEHICLE LOSS'))
             break
 
 if __name__ == "__main__":
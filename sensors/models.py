@@ -0,0 +1,88 @@
+# In-process sensor models: the noisy, ADAS and TACAN behaviour of the sensor
+# processes, without sockets or wall-clock time. Each model takes the current
+# time and a decoded vehicle message, and returns a sensor reading dict (the
+# form wire_codec.decode() produces) or None; on_vehicles() takes a batch of
+# messages and returns the list of readings. Readings keep the vehicle
+# message's origin stamp for latency tracing.
+import math
+import random
+
+from sensors.noise import SensorNoise
+from sensors.adas_sensor import ADAS_NOISE_VAR
+from sensors.tacan_sensor import TACAN_NOISE_VAR, angle_between, sweep_passes
+
+class NoisyModel:
+    # Gaussian position noise from sensors.noise, drawn in bulk; on_vehicles()
+    # applies it to a whole batch of vehicle messages at once
+    def __init__(self, name, noise_std=0.5, rng=None, noise_model='white', walk_std=0.05, ar_coeff=0.9):
+        self.name = name
+        self.noise_var = noise_std ** 2
+        self.noise = SensorNoise(noise_std, noise_model, walk_std, ar_coeff, rng)
+
+    def on_vehicle(self, now, v):
+        return self.on_vehicles(now, [v])[0]
+
+    def on_vehicles(self, now, vs):
+        names = [v['name'] for v in vs]
+        xs, ys = self.noise.apply(names, [v['x'] for v in vs], [v['y'] for v in vs])
+        return [{'type': 'sensor', 'name': self.name, 'x': x, 'y': y, 't': v['t'],
+                 'sensor_type': 'noisy', 'noise_var': self.noise_var, 'vehicle': veh, 'origin': v.get('origin')}
+                for x, y, v, veh in zip(xs.tolist(), ys.tolist(), vs, names)]
+
+class AdasModel:
+    # Publishes each vehicle's exact position at jittered intervals around `interval`
+    def __init__(self, name, interval=15.0, rng=None, noise_var=ADAS_NOISE_VAR):
+        self.name = name
+        self.noise_var = noise_var
+        self.interval = interval
+        self.rng = rng or random.Random()
+        self.last_publish = {}  # vehicle -> last publish time
+        self.publish_interval = {}  # vehicle -> randomized interval
+
+    def _jitter(self):
+        return self.rng.uniform(self.interval * 0.8, self.interval * 1.2)
+
+    def on_vehicle(self, now, v):
+        veh = v['name']
+        if veh not in self.last_publish:
+            self.last_publish[veh] = -math.inf
+            self.publish_interval[veh] = self._jitter()
+        if now - self.last_publish[veh] < self.publish_interval[veh]:
+            return None
+        self.last_publish[veh] = now
+        self.publish_interval[veh] = self._jitter()
+        return {'type': 'sensor', 'name': self.name, 'x': v['x'], 'y': v['y'], 't': v['t'],
+                'sensor_type': 'adas', 'noise_var': self.noise_var, 'vehicle': veh, 'origin': v.get('origin')}
+
+    def on_vehicles(self, now, vs):
+        return [r for r in (self.on_vehicle(now, v) for v in vs) if r is not None]
+
+class TacanModel:
+    # Rotating dish: reports a vehicle once per beam pass over it. Each vehicle
+    # message is tested against the arc the beam swept since that vehicle's
+    # previous message, as sensors.tacan_sensor does per dish step.
+    def __init__(self, name, radar_x, radar_y, rotation_period=60.0, start_time=0.0, tol=1.0, noise_var=TACAN_NOISE_VAR):
+        self.name = name
+        self.noise_var = noise_var
+        self.radar_x = radar_x
+        self.radar_y = radar_y
+        self.rotation_period = rotation_period
+        self.start_time = start_time
+        self.tol = tol  # degrees
+        self.swept_to = {}  # vehicle -> unwrapped dish angle at its previous message
+        self.last_pass = {}  # vehicle -> last beam pass that reported it
+
+    def on_vehicle(self, now, v):
+        veh = v['name']
+        dish_angle = (now - self.start_time) / self.rotation_period * 360.0
+        bearing = angle_between(self.radar_x, self.radar_y, v['x'], v['y'])
+        passes, hit = sweep_passes(bearing, self.swept_to.get(veh, dish_angle), dish_angle, self.tol)
+        self.swept_to[veh] = dish_angle
+        if not hit or passes <= self.last_pass.get(veh, -math.inf):
+            return None
+        self.last_pass[veh] = passes
+        return {'type': 'sensor', 'name': self.name, 'x': v['x'], 'y': v['y'], 't': v['t'],
+                'sensor_type': 'tacan', 'noise_var': self.noise_var, 'vehicle': veh, 'origin': v.get('origin')}
+
+    def on_vehicles(self, now, vs):
+        return [r for r in (self.on_vehicle(now, v) for v in vs) if r is not None]
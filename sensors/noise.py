@@ -0,0 +1,91 @@
+# Vectorized sensor noise. A SensorNoise draws standard normals in blocks from
+# its own NumPy generator and applies them to a whole batch of vehicle
+# positions at once. Correlated models keep their per-vehicle state in arrays:
+#
+#   white      e = noise_std * z
+#   bias-walk  b += walk_std * z1;  e = b + noise_std * z2   (slowly drifting bias)
+#   ar1        e = ar_coeff * e + noise_std * sqrt(1 - ar_coeff^2) * z   (stationary std noise_std)
+import math
+import zlib
+
+import numpy as np
+
+NOISE_MODELS = ('white', 'bias-walk', 'ar1')
+BLOCK = 4096  # normals drawn per refill
+
+def sensor_rng(name, seed=None):
+    # Per-sensor stream: sensors sharing a seed still draw independent noise
+    if seed is None:
+        return np.random.default_rng()
+    return np.random.default_rng([seed, zlib.crc32(name.encode())])
+
+class NormalBlocks:
+    def __init__(self, rng, block=BLOCK):
+        self.rng = rng
+        self.block = block
+        self.buf = np.empty(0)
+        self.pos = 0
+
+    def take(self, n):
+        if self.pos + n > len(self.buf):
+            rest = self.buf[self.pos:]
+            self.buf = np.concatenate([rest, self.rng.standard_normal(max(self.block, n))])
+            self.pos = 0
+        out = self.buf[self.pos:self.pos + n]
+        self.pos += n
+        return out
+
+class SensorNoise:
+    def __init__(self, noise_std=0.5, model='white', walk_std=0.05, ar_coeff=0.9, rng=None, capacity=64):
+        if model not in NOISE_MODELS:
+            raise ValueError(f'Unknown noise model: {model}')
+        if not abs(ar_coeff) < 1:
+            raise ValueError(f'AR(1) coefficient must satisfy |ar_coeff| < 1, got {ar_coeff}')
+        self.noise_std = noise_std
+        self.model = model
+        self.walk_std = walk_std
+        self.ar_coeff = ar_coeff
+        self.normals = NormalBlocks(rng if rng is not None else np.random.default_rng())
+        self.rows = {}  # vehicle name -> state row
+        self.state = np.zeros((capacity, 2))  # bias or AR(1) error per vehicle
+
+    def _row(self, vehicle):
+        row = self.rows.get(vehicle)
+        if row is None:
+            row = self.rows[vehicle] = len(self.rows)
+            if row == len(self.state):
+                self.state = np.concatenate([self.state, np.zeros_like(self.state)])
+            if self.model == 'ar1':
+                # Start in the stationary distribution
+                self.state[row] = self.noise_std * self.normals.take(2)
+        return row
+
+    def apply(self, vehicles, xs, ys):
+        # Returns noisy (xs, ys) arrays for one batch; vehicles may repeat
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        n = len(xs)
+        if self.model == 'white':
+            z = self.normals.take(2 * n).reshape(n, 2)
+            return xs + self.noise_std * z[:, 0], ys + self.noise_std * z[:, 1]
+        rows = np.array([self._row(v) for v in vehicles], dtype=np.intp)
+        err = np.empty((n, 2))
+        remaining = np.arange(n)
+        while remaining.size:
+            # Each round steps every vehicle once, in arrival order
+            _, first = np.unique(rows[remaining], return_index=True)
+            idx = remaining[np.sort(first)]
+            err[idx] = self._step(rows[idx])
+            remaining = np.delete(remaining, first)
+        return xs + err[:, 0], ys + err[:, 1]
+
+    def _step(self, rows):
+        n = len(rows)
+        state = self.state
+        if self.model == 'bias-walk':
+            z = self.normals.take(4 * n).reshape(n, 4)
+            state[rows] += self.walk_std * z[:, :2]
+            return state[rows] + self.noise_std * z[:, 2:]
+        z = self.normals.take(2 * n).reshape(n, 2)
+        state[rows] = self.ar_coeff * state[rows] + self.noise_std * math.sqrt(1.0 - self.ar_coeff ** 2) * z
+        return state[rows]
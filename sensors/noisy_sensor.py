@@ -1,67 +1,100 @@
 import socket
-import struct
 import argparse
-import random
 import time
-from multicast_config import VEHICLE_MCAST_GRP, VEHICLE_MCAST_PORT, SENSOR_MCAST_GRP, SENSOR_MCAST_PORT
-
-def parse_vehicle_msg(msg):
-    # Format: name,x,y,t
-    parts = msg.decode().strip().split(',')
-    if len(parts) != 4:
-        return None
-    return {
-        'name': parts[0],
-        'x': float(parts[1]),
-        'y': float(parts[2]),
-        't': float(parts[3]),
-    }
+from multicast_config import VEHICLE_MCAST_GRP, VEHICLE_MCAST_PORT, SENSOR_MCAST_GRP, SENSOR_MCAST_PORT, DEFAULT_RCVBUF, open_listener, open_sender
+import wire_codec
+from wire_codec import WIRE_FORMATS, RECV_BUFSIZE, Announcer, LossTracker, decode_all, encode_sensor, frame_batches
+from sensors.noise import NOISE_MODELS, SensorNoise, sensor_rng
+from metrics import Registry, Sampler, serve
+from launcher import Heartbeat, notify_ready
 
 def main():
     parser = argparse.ArgumentParser(description="Noisy Sensor: Listens to vehicle multicast, adds noise, rebroadcasts to sensor multicast.")
     parser.add_argument('--noise_std', type=float, default=0.5, help='Stddev of Gaussian noise (meters)')
     parser.add_argument('--interval', type=float, default=0.1, help='Broadcast interval (default: 0.1s)')
     parser.add_argument('--name', type=str, default='sensor1', help='Sensor name/id')
+    parser.add_argument('--wire-format', choices=WIRE_FORMATS, default='text', help='Message encoding (default: text)')
+    parser.add_argument('--batch', action='store_true', help='Send all readings of each interval in batch datagrams')
+    parser.add_argument('--noise-model', choices=NOISE_MODELS, default='white', help='white, bias-walk (drifting bias per vehicle) or ar1 (correlated noise) (default: white)')
+    parser.add_argument('--walk-std', type=float, default=0.05, help='Bias random-walk step stddev per message for bias-walk (meters, default: 0.05)')
+    parser.add_argument('--ar-coeff', type=float, default=0.9, help='AR(1) coefficient for ar1, with |ar_coeff| < 1 (default: 0.9)')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for reproducible noise (default: unseeded)')
+    parser.add_argument('--rcvbuf', type=int, default=DEFAULT_RCVBUF, help=f'SO_RCVBUF of the vehicle socket in bytes (default: {DEFAULT_RCVBUF})')
+    parser.add_argument('--stats-port', type=int, default=0, help='Serve metrics as JSON on this local HTTP port (default: 0, off)')
+    parser.add_argument('--debug-every', type=int, default=0, help='Print every N-th reading sent (default: 0, none)')
     args = parser.parse_args()
+    noise_var = args.noise_std ** 2
+    try:
+        noise = SensorNoise(args.noise_std, args.noise_model, args.walk_std, args.ar_coeff, sensor_rng(args.name, args.seed))
+    except ValueError as e:
+        parser.error(str(e))
 
-    # Multicast receive socket for vehicles
-    recv_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-    recv_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    recv_sock.bind(('', VEHICLE_MCAST_PORT))
-    mreq = struct.pack('4sl', socket.inet_aton(VEHICLE_MCAST_GRP), socket.INADDR_ANY)
-    recv_sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+    recv_sock = open_listener(VEHICLE_MCAST_GRP, VEHICLE_MCAST_PORT, args.rcvbuf)
     recv_sock.settimeout(args.interval)
-    # Multicast send socket for sensors
-    send_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-    send_sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+    send_sock = open_sender()
     send_addr = (SENSOR_MCAST_GRP, SENSOR_MCAST_PORT)
 
     print(f"Listening for vehicle messages on multicast {VEHICLE_MCAST_GRP}:{VEHICLE_MCAST_PORT}, broadcasting noisy data to multicast {SENSOR_MCAST_GRP}:{SENSOR_MCAST_PORT}")
 
+    announcer = Announcer([args.name], args.wire_format)
+    loss = LossTracker()  # vehicle streams
+    pending = []  # encoded readings waiting for the next batch flush
+    next_flush = time.time() + args.interval
+    registry = Registry('sensor', args.name)
+    packets_in = registry.counter('packets_in')
+    msgs_in = registry.counter('msgs_in')
+    msgs_out = registry.counter('msgs_out')
+    parse_seconds = registry.histogram('parse_seconds')
+    registry.gauge('decode', wire_codec.counters.copy)
+    registry.gauge('loss', loss.totals)
+    registry.gauge('queue_depth', lambda: len(pending))
+    serve(args.stats_port, registry.snapshot)
+    notify_ready()
+    heartbeat = Heartbeat()
+    debug = Sampler(args.debug_every)
     while True:
         try:
-            data, _ = recv_sock.recvfrom(1024)
-            try:
-                text = data.decode()
-                parts = text.strip().split(',')
-                if len(parts) >= 5 and parts[0] == 'sensor':
-                    continue  # ignore sensor messages
-                if len(parts) < 5 or parts[0] != 'vehicle':
-                    continue
-                # Parse vehicle message
-                v = {'name': parts[1], 'x': float(parts[2]), 'y': float(parts[3]), 't': float(parts[4])}
-            except Exception:
+            now = time.time()
+            for pkt in announcer.due(now):
+                send_sock.sendto(pkt, send_addr)
+            if args.batch:
+                if now >= next_flush:
+                    for frame in frame_batches(pending, args.wire_format):
+                        send_sock.sendto(frame, send_addr)
+                    pending = []
+                    next_flush = now + args.interval
+                recv_sock.settimeout(max(0.001, next_flush - now))
+            data, _ = recv_sock.recvfrom(RECV_BUFSIZE)
+            t0 = time.perf_counter()
+            msgs = decode_all(data)
+            parse_seconds.record(time.perf_counter() - t0)
+            packets_in.inc()
+            msgs_in.inc(len(msgs))
+            loss.observe(msgs)
+            vehicles = [v for v in msgs if v['type'] == 'vehicle']
+            if not vehicles:
                 continue
-            # Add Gaussian noise
-            noisy_x = v['x'] + random.gauss(0, args.noise_std)
-            noisy_y = v['y'] + random.gauss(0, args.noise_std)
-            msg = f"sensor,{args.name},{noisy_x:.3f},{noisy_y:.3f},{v['t']:.3f},{args.noise_std:.3f}"
-            send_sock.sendto(msg.encode(), send_addr)
-            print(f"Broadcast: {msg}")
+            # Add noise to the whole packet at once
+            names = [v['name'] for v in vehicles]
+            noisy_xs, noisy_ys = noise.apply(names, [v['x'] for v in vehicles], [v['y'] for v in vehicles])
+            for v, noisy_x, noisy_y in zip(vehicles, noisy_xs.tolist(), noisy_ys.tolist()):
+                announcer.add(v['name'])
+                for pkt in announcer.due(now):
+                    send_sock.sendto(pkt, send_addr)
+                msg = encode_sensor(args.name, noisy_x, noisy_y, v['t'], 'noisy', noise_var, v['name'], args.wire_format, origin=v['origin'])
+                if args.batch:
+                    pending.append(msg)
+                else:
+                    send_sock.sendto(msg, send_addr)
+                msgs_out.inc()
+                heartbeat.beat()
+                if debug.hit():
+                    print(f"Broadcast: sensor2,{args.name},{noisy_x:.3f},{noisy_y:.3f},{v['t']:.3f},noisy,{noise_var:.6g},{v['name']}")
         except socket.timeout:
             continue
         except KeyboardInterrupt:
             print("Sensor stopped.")
+            print(loss.report('VEHICLE LOSS'))
             break
 
 if __name__ == "__main__":
@@ -0,0 +1,346 @@
+import math
+import os
+import socket
+import argparse
+import signal
+import time
+import multiprocessing
+import queue
+from multicast_config import VEHICLE_MCAST_GRP, VEHICLE_MCAST_PORT, SENSOR_MCAST_GRP, SENSOR_MCAST_PORT, DEFAULT_RCVBUF, open_listener, open_sender
+import wire_codec
+from wire_codec import WIRE_FORMATS, SENSOR_TYPES, RECV_BUFSIZE, Announcer, LossTracker, decode_all, intern_name, encode_sensor, frame_batches
+from sensors.models import AdasModel, NoisyModel
+from sensors.noise import sensor_rng
+from sensors.tacan_sensor import TacanDish
+from sensors.shm_ring import ShmRing
+from metrics import Registry, Sampler, serve
+from launcher import Heartbeat, notify_ready
+from scenarios.scenario import Plan
+
+STATS_INTERVAL = 5.0  # seconds between status lines
+POLL_INTERVAL = 0.001  # longest a sharded worker sleeps on an empty ring
+STOP_GRACE = 0.5  # seconds workers get to exit before they are killed; below the manager's grace for the host
+
+def parse_sensor_spec(spec):
+    # name:noisy[:noise_std]  name:adas[:interval]  name:tacan:x:y[:rotation_period]
+    parts = spec.split(':')
+    if len(parts) < 2 or parts[1] not in SENSOR_TYPES:
+        raise ValueError(f'Bad sensor spec {spec!r}: expected name:type[:params], types: {", ".join(SENSOR_TYPES)}')
+    name, stype, params = parts[0], parts[1], [float(p) for p in parts[2:]]
+    if stype == 'tacan' and len(params) < 2:
+        raise ValueError(f'Bad sensor spec {spec!r}: TACAN needs name:tacan:x:y')
+    return name, stype, params
+
+def parse_shard(text):
+    # 'I/N' -> (I, N) with 0 <= I < N
+    try:
+        shard, shards = (int(x) for x in text.split('/'))
+    except ValueError:
+        shard, shards = -1, 0
+    if not 0 <= shard < shards:
+        raise ValueError(f'Bad shard {text!r}: expected I/N with 0 <= I < N')
+    return shard, shards
+
+def format_sensor_spec(name, stype, tacan_x=None, tacan_y=None):
+    if stype == 'tacan':
+        return f"{name}:tacan:{tacan_x}:{tacan_y}"
+    return f"{name}:{stype}"
+
+def build_model(name, stype, params, now, seed=None):
+    if stype == 'noisy':
+        return NoisyModel(name, *params[:1], rng=sensor_rng(name, seed))
+    if stype == 'adas':
+        return AdasModel(name, *params[:1], rng=sensor_rng(name, seed))
+    return TacanDish(name, params[0], params[1], *params[2:3], start_time=now)
+
+class HostedSensors:
+    # The sensors of one host or worker process, with their shared send socket,
+    # name announcer and pending readings
+    def __init__(self, specs, wire_format='text', batch=False, interval=0.1, dish_step=0.05, start=0.0, seed=None, debug_every=0):
+        self.models = [build_model(name, stype, params, start, seed) for name, stype, params in specs]
+        self.dishes = [m for m in self.models if isinstance(m, TacanDish)]
+        self.wire_format = wire_format
+        self.batch = batch
+        self.interval = interval
+        self.dish_step = dish_step
+        self.announcer = Announcer([m.name for m in self.models], wire_format)
+        self.pending = []  # encoded readings waiting for the next send
+        self.next_flush = start + interval
+        self.next_step = start + dish_step
+        self.readings = 0  # total sent
+        self.heartbeat = Heartbeat()
+        self.send_sock = open_sender()
+        self.send_addr = (SENSOR_MCAST_GRP, SENSOR_MCAST_PORT)
+        self.debug = Sampler(debug_every)
+
+    def emit(self, r):
+        self.announcer.add(r['vehicle'])
+        self.pending.append(encode_sensor(r['name'], r['x'], r['y'], r['t'], r['sensor_type'], r['noise_var'], r['vehicle'], self.wire_format, origin=r['origin']))
+        if self.debug.hit():
+            print(f"Broadcast: sensor2,{r['name']},{r['x']:.3f},{r['y']:.3f},{r['t']:.3f},{r['sensor_type']},{r['noise_var']:.6g},{r['vehicle']}")
+
+    def on_vehicles(self, now, vs):
+        for model in self.models:
+            for r in model.on_vehicles(now, vs):
+                self.emit(r)
+
+    def tick(self, now):
+        # Steps the dishes and sends what is due; returns when to tick next
+        if self.dishes and now >= self.next_step:
+            for dish in self.dishes:
+                for r in dish.step(now):
+                    self.emit(r)
+            self.next_step = max(self.next_step, now) + self.dish_step
+        # Announcements go out before the readings that use the names
+        for pkt in self.announcer.due(now):
+            self.send_sock.sendto(pkt, self.send_addr)
+        if self.pending and (not self.batch or now >= self.next_flush):
+            for frame in (frame_batches(self.pending, self.wire_format) if self.batch else self.pending):
+                self.send_sock.sendto(frame, self.send_addr)
+            self.readings += len(self.pending)
+            self.heartbeat.beat()
+            self.pending = []
+        if now >= self.next_flush:
+            self.next_flush = max(self.next_flush, now) + self.interval
+        return min(self.next_flush, self.next_step) if self.dishes else self.next_flush
+
+def stop_on_signals(*signums):
+    # The first of these signals unwinds like Ctrl-C so cleanup runs (SIGTERM is
+    # what the manager's supervisor sends); later ones, e.g. the supervisor's
+    # SIGTERM right after a Ctrl-C, are ignored so they cannot cut it short
+    stopping = []
+    def signal_handler(sig, frame):
+        if not stopping:
+            stopping.append(sig)
+            raise KeyboardInterrupt
+    for s in signums:
+        signal.signal(s, signal_handler)
+
+def run_worker(ring_name, capacity, names, stats, specs, wire_format, batch, interval, dish_step, start, seed, debug_every, parent):
+    # Worker process: runs its share of the sensors on vehicle messages read
+    # from the shared ring. `names` carries vehicle id -> name registrations;
+    # the worker publishes [readings sent, ring records dropped, ring cursor]
+    # in the shared `stats` array. It exits once its parent, the host, is gone.
+    # Ctrl-C reaches the whole process group; the host stops its workers itself.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    stop_on_signals(signal.SIGTERM)
+    ring = ShmRing.attach(ring_name, capacity)
+    sensors = HostedSensors(specs, wire_format, batch, interval, dish_step, start, seed, debug_every)
+    vehicle_names = {}
+    cursor = 0
+    try:
+        while os.getppid() == parent:
+            recs, cursor, dropped = ring.read(cursor)
+            now = time.time()
+            if len(recs):
+                while True:
+                    try:
+                        vid, name = names.get_nowait()
+                    except queue.Empty:
+                        break
+                    vehicle_names[vid] = name
+                vs = []
+                origins = [o if o == o else None for o in recs['origin'].tolist()]
+                vxs = [v if v == v else None for v in recs['vx'].tolist()]
+                for vid, x, y, t, origin, vx, vy in zip(recs['vehicle'].tolist(), recs['x'].tolist(), recs['y'].tolist(), recs['t'].tolist(), origins,
+                                                        vxs, recs['vy'].tolist()):
+                    name = vehicle_names.get(vid)
+                    while name is None:
+                        # The receiver registers a name before writing its first record
+                        try:
+                            new_vid, new_name = names.get(timeout=STOP_GRACE)
+                        except queue.Empty:
+                            if os.getppid() != parent:
+                                return
+                            continue
+                        vehicle_names[new_vid] = new_name
+                        name = vehicle_names.get(vid)
+                    vs.append({'type': 'vehicle', 'name': name, 'x': x, 'y': y, 't': t, 'origin': origin, 'vx': vx, 'vy': vy})
+                sensors.on_vehicles(now, vs)
+            wake = sensors.tick(now)
+            stats[0] = sensors.readings
+            stats[1] += dropped
+            stats[2] = cursor
+            if not len(recs):
+                time.sleep(min(max(wake - now, 0.0), POLL_INTERVAL))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.close()
+
+def run_sharded(recv_sock, specs, args, registry):
+    # Receiver: decodes each vehicle packet once and broadcasts the messages to
+    # the workers through a shared-memory ring; worker i owns sensors i, i+N, ...
+    ctx = multiprocessing.get_context('spawn')
+    ring = ShmRing.create(args.ring_size)
+    start = time.time()
+    workers = []
+    name_queues = []
+    worker_stats = []
+    for i in range(args.workers):
+        names = ctx.Queue()
+        stats = ctx.Array('Q', 3, lock=False)
+        w = ctx.Process(target=run_worker, daemon=True,
+                        args=(ring.name, args.ring_size, names, stats, specs[i::args.workers], args.wire_format,
+                              args.batch, args.interval, args.dish_step, start, args.seed, args.debug_every, os.getpid()))
+        w.start()
+        workers.append(w)
+        name_queues.append(names)
+        worker_stats.append(stats)
+    print(f"Sensor host started with {len(specs)} sensors in {args.workers} worker processes. Listening on {VEHICLE_MCAST_GRP}:{VEHICLE_MCAST_PORT}, broadcasting to {SENSOR_MCAST_GRP}:{SENSOR_MCAST_PORT}")
+
+    registered = {}  # vehicle id -> name sent to the workers
+    loss = LossTracker()  # vehicle streams
+    packets = 0
+    packets_in = registry.counter('packets_in')
+    msgs_in = registry.counter('msgs_in')
+    parse_seconds = registry.histogram('parse_seconds')
+    registry.counter('msgs_out', lambda: sum(s[0] for s in worker_stats))
+    registry.gauge('ring_dropped', lambda: sum(s[1] for s in worker_stats))
+    registry.gauge('queue_depth', lambda: max(int(ring.head[0]) - s[2] for s in worker_stats))
+    registry.gauge('workers_alive', lambda: sum(w.is_alive() for w in workers))
+    registry.gauge('loss', loss.totals)
+    next_stats = start + STATS_INTERVAL
+    recv_sock.settimeout(1.0)
+    try:
+        while True:
+            try:
+                data, _ = recv_sock.recvfrom(RECV_BUFSIZE)
+            except socket.timeout:
+                data = None
+            now = time.time()
+            if data is not None:
+                packets += 1
+                t0 = time.perf_counter()
+                msgs = decode_all(data)
+                parse_seconds.record(time.perf_counter() - t0)
+                packets_in.inc()
+                msgs_in.inc(len(msgs))
+                loss.observe(msgs)
+                vehicles = [v for v in msgs if v['type'] == 'vehicle']
+                if vehicles:
+                    vids = [intern_name(v['name']) for v in vehicles]
+                    for vid, v in zip(vids, vehicles):
+                        # Re-sent when an announcement replaces an id placeholder
+                        if registered.get(vid) != v['name']:
+                            registered[vid] = v['name']
+                            for names in name_queues:
+                                names.put((vid, v['name']))
+                    ring.write(vids, [v['x'] for v in vehicles], [v['y'] for v in vehicles], [v['t'] for v in vehicles],
+                               [math.nan if v['origin'] is None else v['origin'] for v in vehicles],
+                               [math.nan if v['vx'] is None else v['vx'] for v in vehicles],
+                               [math.nan if v['vx'] is None else v['vy'] for v in vehicles])
+            if now >= next_stats:
+                alive = sum(w.is_alive() for w in workers)
+                print(f"Sensor host: {packets} vehicle packets in the last {STATS_INTERVAL:.0f}s, {alive}/{len(workers)} workers alive")
+                print(loss.report('VEHICLE LOSS'))
+                packets = 0
+                next_stats = now + STATS_INTERVAL
+    finally:
+        print(loss.report('VEHICLE LOSS'))
+        for w in workers:
+            w.terminate()
+        deadline = time.monotonic() + STOP_GRACE
+        for w in workers:
+            w.join(max(deadline - time.monotonic(), 0.0))
+            if w.is_alive():
+                w.kill()
+                w.join()
+        for names in name_queues:
+            names.close()
+            names.cancel_join_thread()  # nobody reads them any more
+        ring.close()
+        ring.unlink()
+
+def main():
+    parser = argparse.ArgumentParser(description="Sensor Host: Runs many noisy, ADAS and TACAN sensors in one process, decoding each vehicle packet once.")
+    parser.add_argument('--sensor', type=str, action='append', default=[], metavar='SPEC',
+                        help='Sensor to host (repeatable): name:noisy[:noise_std], name:adas[:interval] or name:tacan:x:y[:rotation_period]')
+    parser.add_argument('--plan', type=str, default=None, help='Also host the sensors of this compiled scenario plan (.npz, see scenarios.scenario)')
+    parser.add_argument('--plan-shard', type=str, default='0/1', metavar='I/N', help='Host only every Nth plan sensor starting at the Ith (default: 0/1, all)')
+    parser.add_argument('--interval', type=float, default=0.1, help='Batch flush interval with --batch (default: 0.1s)')
+    parser.add_argument('--dish-step', type=float, default=0.05, help='Seconds between TACAN beam sweeps (default: 0.05)')
+    parser.add_argument('--wire-format', choices=WIRE_FORMATS, default='text', help='Message encoding (default: text)')
+    parser.add_argument('--batch', action='store_true', help='Send all readings of each interval in batch datagrams')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for reproducible noise; each sensor draws its own stream from it (default: unseeded)')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes to shard the sensors over; the main process only receives and decodes (default: 1, no sharding)')
+    parser.add_argument('--ring-size', type=int, default=65536, help='Vehicle messages held in the shared-memory ring with --workers (default: 65536)')
+    parser.add_argument('--rcvbuf', type=int, default=DEFAULT_RCVBUF, help=f'SO_RCVBUF of the vehicle socket in bytes (default: {DEFAULT_RCVBUF})')
+    parser.add_argument('--name', type=str, default='host1', help='Host name in its metrics (default: host1)')
+    parser.add_argument('--stats-port', type=int, default=0, help='Serve metrics as JSON on this local HTTP port (default: 0, off)')
+    parser.add_argument('--debug-every', type=int, default=0, help='Print every N-th reading of each process, host or worker (default: 0, none)')
+    args = parser.parse_args()
+
+    try:
+        specs = [parse_sensor_spec(spec) for spec in args.sensor]
+        if args.plan:
+            shard, shards = parse_shard(args.plan_shard)
+            plan = Plan.load(args.plan)
+            specs += plan.sensor_specs(range(shard, len(plan.sensor_names), shards))
+    except ValueError as e:
+        parser.error(str(e))
+    if not specs:
+        parser.error('no sensors to host; give --sensor or --plan')
+    stop_on_signals(signal.SIGINT, signal.SIGTERM)
+
+    recv_sock = open_listener(VEHICLE_MCAST_GRP, VEHICLE_MCAST_PORT, args.rcvbuf)
+    registry = Registry('sensor', args.name)
+    registry.gauge('decode', wire_codec.counters.copy)
+    serve(args.stats_port, registry.snapshot)
+    notify_ready()
+
+    if args.workers > 1:
+        try:
+            run_sharded(recv_sock, specs, args, registry)
+        except KeyboardInterrupt:
+            print("Sensor host stopped.")
+        return
+
+    start = time.time()
+    sensors = HostedSensors(specs, args.wire_format, args.batch, args.interval, args.dish_step, start, args.seed, args.debug_every)
+    counts = ', '.join(f"{sum(s == t for _, s, _ in specs)} {t}" for t in SENSOR_TYPES)
+    print(f"Sensor host started with {len(specs)} sensors ({counts}). Listening on {VEHICLE_MCAST_GRP}:{VEHICLE_MCAST_PORT}, broadcasting to {SENSOR_MCAST_GRP}:{SENSOR_MCAST_PORT}")
+
+    next_stats = start + STATS_INTERVAL
+    packets = 0
+    last_readings = 0
+    loss = LossTracker()  # vehicle streams
+    packets_in = registry.counter('packets_in')
+    msgs_in = registry.counter('msgs_in')
+    parse_seconds = registry.histogram('parse_seconds')
+    registry.counter('msgs_out', lambda: sensors.readings)
+    registry.gauge('queue_depth', lambda: len(sensors.pending))
+    registry.gauge('loss', loss.totals)
+    while True:
+        try:
+            now = time.time()
+            wake = sensors.tick(now)
+            if now >= next_stats:
+                print(f"Sensor host: {packets} vehicle packets, {sensors.readings - last_readings} readings sent in the last {STATS_INTERVAL:.0f}s")
+                print(loss.report('VEHICLE LOSS'))
+                packets = 0
+                last_readings = sensors.readings
+                next_stats = now + STATS_INTERVAL
+            recv_sock.settimeout(max(wake - now, 0.001))
+            data, _ = recv_sock.recvfrom(RECV_BUFSIZE)
+            packets += 1
+            now = time.time()
+            # Decode once, dispatch the whole packet to every hosted sensor
+            t0 = time.perf_counter()
+            msgs = decode_all(data)
+            parse_seconds.record(time.perf_counter() - t0)
+            packets_in.inc()
+            msgs_in.inc(len(msgs))
+            loss.observe(msgs)
+            vs = [v for v in msgs if v['type'] == 'vehicle']
+            if vs:
+                sensors.on_vehicles(now, vs)
+        except socket.timeout:
+            continue
+        except KeyboardInterrupt:
+            print("Sensor host stopped.")
+            print(loss.report('VEHICLE LOSS'))
+            break
+
+if __name__ == "__main__":
+    main()
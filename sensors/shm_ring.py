@@ -0,0 +1,90 @@
+# Single-producer, many-consumer broadcast ring of decoded vehicle messages in
+# a multiprocessing.shared_memory block. The producer never waits: it reserves
+# the records it is about to write, writes them, then publishes the new head.
+# Each consumer keeps its own cursor, and a consumer that falls more than
+# `capacity` records behind skips ahead and counts the skipped records as
+# dropped.
+#
+# Layout: two 8-byte counters, `reserved` (records the producer has started
+# writing) and `head` (records fully written), followed by `capacity`
+# RECORD_DTYPE slots; record n lives in slot n % capacity. Like a seqlock, a
+# consumer copies records up to the head, then re-reads the reservation and
+# discards every copied record with index < reserved - capacity, since its slot
+# may have been overwritten while it copied. There is no lock, but this relies
+# on the CPU keeping stores, and loads, in program order (as x86 does); a
+# weakly ordered CPU would need memory fences around the counters.
+from multiprocessing import shared_memory
+
+import numpy as np
+
+RECORD_DTYPE = np.dtype([('vehicle', '<u4'), ('x', '<f8'), ('y', '<f8'), ('t', '<f8'), ('origin', '<f8'), ('vx', '<f8'), ('vy', '<f8')])
+HEADER_BYTES = 16
+
+class ShmRing:
+    def __init__(self, shm, capacity):
+        self.shm = shm
+        self.capacity = capacity
+        self.reserved = np.ndarray((1,), dtype='<u8', buffer=shm.buf)
+        self.head = np.ndarray((1,), dtype='<u8', buffer=shm.buf, offset=8)
+        self.records = np.ndarray((capacity,), dtype=RECORD_DTYPE, buffer=shm.buf, offset=HEADER_BYTES)
+
+    @classmethod
+    def create(cls, capacity):
+        shm = shared_memory.SharedMemory(create=True, size=HEADER_BYTES + capacity * RECORD_DTYPE.itemsize)
+        ring = cls(shm, capacity)
+        ring.reserved[0] = ring.head[0] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name, capacity):
+        return cls(shared_memory.SharedMemory(name=name), capacity)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, vehicles, xs, ys, ts, origins, vxs, vys):
+        # Unknown origins and velocities are NaN
+        n = len(vehicles)
+        head = int(self.head[0])
+        if n > self.capacity:
+            # Only the newest `capacity` records fit; the rest count as skipped
+            c = self.capacity
+            vehicles, xs, ys, ts, origins, vxs, vys = vehicles[-c:], xs[-c:], ys[-c:], ts[-c:], origins[-c:], vxs[-c:], vys[-c:]
+            head += n - c
+            n = c
+        self.reserved[0] = head + n
+        slots = (head + np.arange(n)) % self.capacity
+        recs = self.records
+        recs['vehicle'][slots] = vehicles
+        recs['x'][slots] = xs
+        recs['y'][slots] = ys
+        recs['t'][slots] = ts
+        recs['origin'][slots] = origins
+        recs['vx'][slots] = vxs
+        recs['vy'][slots] = vys
+        self.head[0] = head + n
+
+    def read(self, cursor):
+        # Returns (records copied since cursor, new cursor, records dropped)
+        head = int(self.head[0])
+        dropped = 0
+        if head - cursor > self.capacity:
+            dropped = head - cursor - self.capacity
+            cursor = head - self.capacity
+        if head == cursor:
+            return self.records[:0].copy(), cursor, dropped
+        recs = self.records[np.arange(cursor, head) % self.capacity]
+        # Records whose slots the producer reserved again while we copied may be torn
+        torn = min(int(self.reserved[0]) - self.capacity - cursor, head - cursor)
+        if torn > 0:
+            recs = recs[torn:]
+            dropped += torn
+        return recs, head, dropped
+
+    def close(self):
+        del self.reserved, self.head, self.records
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
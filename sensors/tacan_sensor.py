@@ -1,76 +1,254 @@
 import socket
-import struct
 import argparse
 import math
 import time
-from multicast_config import VEHICLE_MCAST_GRP, VEHICLE_MCAST_PORT, SENSOR_MCAST_GRP, SENSOR_MCAST_PORT
 
-def parse_vehicle_msg(msg):
-    parts = msg.decode().strip().split(',')
-    if len(parts) < 5 or parts[0] != 'vehicle':
-        return None
-    return {
-        'name': parts[1],
-        'x': float(parts[2]),
-        'y': float(parts[3]),
-        't': float(parts[4]),
-    }
+import numpy as np
+
+from multicast_config import VEHICLE_MCAST_GRP, VEHICLE_MCAST_PORT, SENSOR_MCAST_GRP, SENSOR_MCAST_PORT, DEFAULT_RCVBUF, open_listener, open_sender
+import wire_codec
+from wire_codec import WIRE_FORMATS, RECV_BUFSIZE, Announcer, LossTracker, decode_all, encode_sensor
+from metrics import Registry, Sampler, serve
+from launcher import Heartbeat, notify_ready
+
+TACAN_NOISE_VAR = 0.04  # m^2; exact positions, up to one dish step old
+MAX_EXTRAPOLATION = 1.0  # seconds a position is carried forward along the vehicle's velocity
 
 def angle_between(x1, y1, x2, y2):
     return math.degrees(math.atan2(y2 - y1, x2 - x1)) % 360
 
+def sweep_passes(bearing, swept_from, swept_to, tol):
+    # Dish angles are unwrapped (degrees since start, growing past 360). Returns the
+    # number of the first beam pass over each bearing while the dish turned from
+    # swept_from to swept_to, widened by tol, and whether that pass happened.
+    passes = np.ceil((swept_from - tol - bearing) / 360.0)
+    return passes, bearing + 360.0 * passes <= swept_to + tol
+
+class BearingIndex:
+    # Latest position of every vehicle heard, kept sorted by bearing from the
+    # radar, so a sweep step only visits the vehicles inside the swept arc:
+    # two bisections plus the k vehicles found. update() only records which
+    # rows moved; the next query merges them into the sorted keys in one
+    # vectorized pass, O(n + k log k) per tick instead of O(n) per update.
+    def __init__(self, radar_x, radar_y):
+        self.radar_x = radar_x
+        self.radar_y = radar_y
+        self.index = {}  # vehicle name -> row
+        self.names = []
+        self.x = []
+        self.y = []
+        self.t = []
+        self.origin = []  # origin stamp of each row's vehicle message
+        self.vx = []  # velocity of each row's vehicle, 0 if the message had none
+        self.vy = []
+        self.seen = []  # when each row was last updated, in the dish's clock
+        self.t_rate = []  # path fraction per second, from the row's last two updates
+        self.bearing = []  # degrees in [0, 360)
+        self.range = []
+        self.last_pass = []  # last beam pass that reported each row
+        self.key_bearing = np.empty(0)  # sorted bearings
+        self.key_row = np.empty(0, dtype=np.int64)  # row of each sorted bearing
+        self.changed = set()  # rows whose bearing moved since the keys were merged
+
+    def __len__(self):
+        return len(self.names)
+
+    def update(self, v, now=0.0):
+        dx = v['x'] - self.radar_x
+        dy = v['y'] - self.radar_y
+        bearing = math.degrees(math.atan2(dy, dx)) % 360
+        i = self.index.get(v['name'])
+        if i is None:
+            i = self.index[v['name']] = len(self.names)
+            self.names.append(v['name'])
+            for col in (self.x, self.y, self.t, self.bearing, self.range, self.vx, self.vy, self.seen, self.t_rate):
+                col.append(0.0)
+            self.origin.append(None)
+            self.last_pass.append(-math.inf)
+            self.changed.add(i)
+        else:
+            if now > self.seen[i]:
+                self.t_rate[i] = max(v['t'] - self.t[i], 0.0) / (now - self.seen[i])
+            if self.bearing[i] != bearing:
+                self.changed.add(i)
+        self.bearing[i] = bearing
+        self.x[i] = v['x']
+        self.y[i] = v['y']
+        self.t[i] = v['t']
+        self.origin[i] = v.get('origin')
+        self.range[i] = math.hypot(dx, dy)
+        vx = v.get('vx')
+        self.vx[i] = vx if vx is not None else 0.0
+        self.vy[i] = v['vy'] if vx is not None else 0.0
+        self.seen[i] = now
+
+    def polar(self, row):
+        return self.range[row], self.bearing[row]
+
+    def extrapolate(self, row, now):
+        # (x, y, t, origin, range, bearing) of a row's position carried forward to
+        # `now` along the vehicle's velocity, with t and the origin stamp advanced
+        # over the same interval; the stored position if it had none
+        dt = min(max(now - self.seen[row], 0.0), MAX_EXTRAPOLATION) if self.vx[row] or self.vy[row] else 0.0
+        x = self.x[row] + self.vx[row] * dt
+        y = self.y[row] + self.vy[row] * dt
+        t = min(self.t[row] + self.t_rate[row] * dt, 1.0)
+        origin = self.origin[row] + dt if self.origin[row] is not None else None
+        return x, y, t, origin, math.hypot(x - self.radar_x, y - self.radar_y), angle_between(self.radar_x, self.radar_y, x, y)
+
+    def reindex(self):
+        # Merge the rows changed since the last call into the sorted keys
+        if not self.changed:
+            return
+        rows = np.fromiter(self.changed, dtype=np.int64, count=len(self.changed))
+        self.changed.clear()
+        keep = ~np.isin(self.key_row, rows, assume_unique=True)
+        bearings = np.array([self.bearing[r] for r in rows])
+        order = np.argsort(bearings, kind='stable')
+        bearings, rows = bearings[order], rows[order]
+        kept = self.key_bearing[keep]
+        at = np.searchsorted(kept, bearings)
+        self.key_bearing = np.insert(kept, at, bearings)
+        self.key_row = np.insert(self.key_row[keep], at, rows)
+
+    def arc(self, lo, hi):
+        # (rows, bearings) with lo <= bearing <= hi, for 0 <= lo, hi < 360; wraps through 0 when lo > hi
+        self.reindex()
+        a, b = np.searchsorted(self.key_bearing, lo), np.searchsorted(self.key_bearing, hi, side='right')
+        if lo > hi:
+            return np.concatenate((self.key_row[a:], self.key_row[:b])), np.concatenate((self.key_bearing[a:], self.key_bearing[:b]))
+        return self.key_row[a:b], self.key_bearing[a:b]
+
+    def rows_between(self, lo, hi):
+        return self.arc(lo, hi)[0].tolist()
+
+    def sweep(self, swept_from, swept_to, tol):
+        # Rows of the vehicles the beam crossed since the previous step, each at most once per pass
+        if swept_to - swept_from + 2 * tol >= 360.0:
+            rows, bearings = np.arange(len(self.names)), np.array(self.bearing)
+        else:
+            rows, bearings = self.arc((swept_from - tol) % 360.0, (swept_to + tol) % 360.0)
+        if not len(rows):
+            return []
+        passes, hit = sweep_passes(bearings, swept_from, swept_to, tol)
+        found = []
+        for row, p, h in zip(rows.tolist(), passes.tolist(), hit.tolist()):
+            if h and p > self.last_pass[row]:
+                self.last_pass[row] = p
+                found.append(row)
+        return found
+
+class TacanDish:
+    # Rotating dish over a BearingIndex: on_vehicle() records positions, step()
+    # sweeps the beam to `now` and returns a reading for each vehicle it crossed
+    def __init__(self, name, radar_x, radar_y, rotation_period=60.0, start_time=0.0, tol=1.0, noise_var=TACAN_NOISE_VAR):
+        self.name = name
+        self.noise_var = noise_var
+        self.rotation_period = rotation_period
+        self.start_time = start_time
+        self.tol = tol  # degrees
+        self.table = BearingIndex(radar_x, radar_y)
+        self.dish_angle = 0.0  # unwrapped, degrees turned since start_time
+
+    def on_vehicle(self, now, v):
+        self.table.update(v, now)
+        return None
+
+    def on_vehicles(self, now, vs):
+        for v in vs:
+            self.table.update(v, now)
+        return []
+
+    def step(self, now):
+        # Beam moved from dish_angle to swept_to since the last step
+        table = self.table
+        swept_to = (now - self.start_time) / self.rotation_period * 360.0
+        readings = []
+        for i in table.sweep(self.dish_angle, swept_to, self.tol):
+            x, y, t, origin, rng, bearing = table.extrapolate(i, now)
+            readings.append({'type': 'sensor', 'name': self.name, 'x': x, 'y': y, 't': t,
+                             'sensor_type': 'tacan', 'noise_var': self.noise_var, 'vehicle': table.names[i], 'origin': origin,
+                             'range': rng, 'bearing': bearing})
+        self.dish_angle = swept_to
+        return readings
+
 def main():
     parser = argparse.ArgumentParser(description="TACAN Sensor: Rotating dish radar sensor")
     parser.add_argument('--radar-x-pos', type=float, required=True, help='Radar base station X position')
     parser.add_argument('--radar-y-pos', type=float, required=True, help='Radar base station Y position')
     parser.add_argument('--rotation-period', type=float, default=60.0, help='Full rotation period in seconds (default: 60)')
+    parser.add_argument('--dish-step', type=float, default=0.05, help='Seconds between beam sweeps over the known vehicles (default: 0.05)')
+    parser.add_argument('--noise-var', type=float, default=TACAN_NOISE_VAR, help=f'Reported measurement noise variance (m^2, default: {TACAN_NOISE_VAR})')
     parser.add_argument('--name', type=str, default='tacan1', help='Sensor name/id')
+    parser.add_argument('--wire-format', choices=WIRE_FORMATS, default='text', help='Message encoding (default: text)')
+    parser.add_argument('--rcvbuf', type=int, default=DEFAULT_RCVBUF, help=f'SO_RCVBUF of the vehicle socket in bytes (default: {DEFAULT_RCVBUF})')
+    parser.add_argument('--stats-port', type=int, default=0, help='Serve metrics as JSON on this local HTTP port (default: 0, off)')
+    parser.add_argument('--debug-every', type=int, default=0, help='Print every N-th reading sent (default: 0, none)')
     args = parser.parse_args()
 
-    recv_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-    recv_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    recv_sock.bind(('', VEHICLE_MCAST_PORT))
-    mreq = struct.pack('4sl', socket.inet_aton(VEHICLE_MCAST_GRP), socket.INADDR_ANY)
-    recv_sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
-    recv_sock.settimeout(0.5)
+    recv_sock = open_listener(VEHICLE_MCAST_GRP, VEHICLE_MCAST_PORT, args.rcvbuf)
 
-    send_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-    send_sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+    send_sock = open_sender()
     send_addr = (SENSOR_MCAST_GRP, SENSOR_MCAST_PORT)
 
     print(f"TACAN sensor started at ({args.radar_x_pos}, {args.radar_y_pos}). Rotating dish.")
 
-    published_this_rotation = set()
-    start_time = time.time()
-    tol = 1.0  # degree tolerance
+    dish = TacanDish(args.name, args.radar_x_pos, args.radar_y_pos, args.rotation_period, time.time(), noise_var=args.noise_var)
+    next_step = dish.start_time + args.dish_step
+    announcer = Announcer([args.name], args.wire_format)
+    loss = LossTracker()  # vehicle streams
+    registry = Registry('sensor', args.name)
+    packets_in = registry.counter('packets_in')
+    msgs_in = registry.counter('msgs_in')
+    msgs_out = registry.counter('msgs_out')
+    parse_seconds = registry.histogram('parse_seconds')
+    registry.gauge('decode', wire_codec.counters.copy)
+    registry.gauge('loss', loss.totals)
+    sweep_seconds = registry.histogram('sweep_seconds')
+    registry.gauge('vehicles', lambda: len(dish.table))
+    serve(args.stats_port, registry.snapshot)
+    notify_ready()
+    heartbeat = Heartbeat()
+    debug = Sampler(args.debug_every)
 
     while True:
         try:
             now = time.time()
-            elapsed = (now - start_time) % args.rotation_period
-            dish_angle = (elapsed / args.rotation_period) * 360.0
-            data, _ = recv_sock.recvfrom(1024)
-            v = parse_vehicle_msg(data)
-            if not v:
-                continue
-            veh_angle = angle_between(args.radar_x_pos, args.radar_y_pos, v['x'], v['y'])
-            veh_id = v['name']
-            angle_diff = (veh_angle - dish_angle + 360) % 360
-            if angle_diff > 180:
-                angle_diff = 360 - angle_diff
-            # Only publish if within tol and not already published this rotation
-            if angle_diff <= tol and veh_id not in published_this_rotation:
-                msg = f"sensor,{args.name},{v['x']:.3f},{v['y']:.3f},{v['t']:.3f},TACAN"
-                send_sock.sendto(msg.encode(), send_addr)
-                print(f"TACAN Broadcast: {msg}")
-                published_this_rotation.add(veh_id)
-            # Reset published set at start of rotation
-            if elapsed < 0.5:
-                published_this_rotation.clear()
+            if now >= next_step:
+                t0 = time.perf_counter()
+                readings = dish.step(now)
+                sweep_seconds.record(time.perf_counter() - t0)
+                for r in readings:
+                    announcer.add(r['vehicle'])
+                    for pkt in announcer.due(now):
+                        send_sock.sendto(pkt, send_addr)
+                    msg = encode_sensor(args.name, r['x'], r['y'], r['t'], 'tacan', r['noise_var'], r['vehicle'], args.wire_format, origin=r['origin'])
+                    send_sock.sendto(msg, send_addr)
+                    msgs_out.inc()
+                    heartbeat.beat()
+                    if debug.hit():
+                        print(f"TACAN Broadcast: sensor2,{args.name},{r['x']:.3f},{r['y']:.3f},{r['t']:.3f},tacan,{r['noise_var']:.6g},{r['vehicle']} (range={r['range']:.3f}, bearing={r['bearing']:.2f})")
+                next_step = max(next_step, now) + args.dish_step
+            for pkt in announcer.due(now):
+                send_sock.sendto(pkt, send_addr)
+            recv_sock.settimeout(max(next_step - now, 0.001))
+            data, _ = recv_sock.recvfrom(RECV_BUFSIZE)
+            # The position is as old as its arrival, not as the wait before it
+            now = time.time()
+            t0 = time.perf_counter()
+            msgs = decode_all(data)
+            parse_seconds.record(time.perf_counter() - t0)
+            packets_in.inc()
+            msgs_in.inc(len(msgs))
+            loss.observe(msgs)
+            for v in msgs:
+                if v['type'] == 'vehicle':
+                    dish.on_vehicle(now, v)
         except socket.timeout:
             continue
         except KeyboardInterrupt:
             print("TACAN sensor stopped.")
+            print(loss.report('VEHICLE LOSS'))
             break
 
 if __name__ == "__main__":
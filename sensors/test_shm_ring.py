@@ -0,0 +1,101 @@
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from sensors.shm_ring import ShmRing
+
+@pytest.fixture
+def ring():
+    ring = ShmRing.create(8)
+    yield ring
+    ring.close()
+    ring.unlink()
+
+def _write(ring, start, n):
+    # Record i carries i in every field, so torn records show up
+    idx = np.arange(start, start + n)
+    vals = idx.astype(float)
+    ring.write(idx, vals, vals, vals, vals, vals, vals)
+    return start + n
+
+def _consistent(recs):
+    v = recs['vehicle'].astype(float)
+    return all(np.array_equal(v, recs[f]) for f in ('x', 'y', 't', 'origin', 'vx', 'vy'))
+
+def test_read_in_order_across_the_wrap(ring):
+    cursor, written = 0, 0
+    for n in (5, 6, 7, 3, 8):
+        written = _write(ring, written, n)
+        recs, new_cursor, dropped = ring.read(cursor)
+        assert recs['vehicle'].tolist() == list(range(cursor, written))
+        assert (new_cursor, dropped) == (written, 0)
+        assert _consistent(recs)
+        cursor = new_cursor
+    assert len(ring.read(cursor)[0]) == 0
+
+def test_lapped_reader_skips_ahead(ring):
+    written = _write(ring, 0, 6)
+    written = _write(ring, written, 7)
+    recs, cursor, dropped = ring.read(0)
+    assert recs['vehicle'].tolist() == list(range(5, 13))
+    assert (cursor, dropped) == (13, 5)
+
+def test_oversize_write_keeps_the_newest(ring):
+    written = _write(ring, 0, 5)
+    written = _write(ring, written, 15)
+    recs, cursor, dropped = ring.read(5)
+    assert recs['vehicle'].tolist() == list(range(12, 20))
+    assert (cursor, dropped) == (20, 7)
+    assert int(ring.head[0]) == int(ring.reserved[0]) == 20
+
+def test_reservation_in_flight_drops_torn_records(ring):
+    _write(ring, 0, 8)
+    # Producer has reserved 4 more slots (0..3, holding records 0..3) but not yet published them
+    ring.reserved[0] += 4
+    recs, cursor, dropped = ring.read(0)
+    assert recs['vehicle'].tolist() == [4, 5, 6, 7]
+    assert (cursor, dropped) == (8, 4)
+
+def test_attach_sees_the_same_records(ring):
+    _write(ring, 0, 3)
+    other = ShmRing.attach(ring.name, ring.capacity)
+    try:
+        assert other.read(0)[0]['vehicle'].tolist() == [0, 1, 2]
+    finally:
+        other.close()
+
+def test_lapping_writer_never_yields_torn_records():
+    ring = ShmRing.create(64)
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    stop = threading.Event()
+
+    def produce():
+        written, n = 0, 1
+        while not stop.is_set():
+            written = _write(ring, written, n)
+            n = n % 90 + 1  # includes writes larger than the ring
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    try:
+        cursor, seen, dropped_total = 0, 0, 0
+        for _ in range(3000):
+            recs, new_cursor, dropped = ring.read(cursor)
+            assert _consistent(recs)
+            got = recs['vehicle'].tolist()
+            # Whatever survives is contiguous and ends at the new cursor
+            assert got == list(range(new_cursor - len(got), new_cursor))
+            assert new_cursor - cursor == len(got) + dropped
+            seen += len(got)
+            dropped_total += dropped
+            cursor = new_cursor
+        assert seen > 0
+    finally:
+        stop.set()
+        producer.join()
+        sys.setswitchinterval(interval)
+        ring.close()
+        ring.unlink()
@@ -0,0 +1,77 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from sensors.tacan_sensor import BearingIndex, TacanDish, sweep_passes
+
+def _vehicle(name, x, y, t=0.0, vx=None, vy=None, origin=None):
+    return {'type': 'vehicle', 'name': name, 'x': x, 'y': y, 't': t, 'vx': vx, 'vy': vy, 'origin': origin}
+
+def test_sweep_matches_brute_force():
+    rng = random.Random(0)
+    index = BearingIndex(3.0, -2.0)
+    names = [f"vehicle{i}" for i in range(60)]
+    last_pass = {}  # brute force: vehicle -> last pass reported
+    angle = 0.0
+    for step in range(400):
+        for name in rng.sample(names, 10):
+            index.update(_vehicle(name, rng.uniform(-50, 50), rng.uniform(-50, 50)))
+        # Mostly small steps, the odd step of more than a full turn
+        swept_to = angle + (400.0 if step % 97 == 50 else rng.uniform(0.0, 30.0))
+        found = sorted(index.names[row] for row in index.sweep(angle, swept_to, 1.0))
+        known = [n for n in names if n in index.index]
+        bearings = np.array([math.degrees(math.atan2(index.y[index.index[n]] + 2.0, index.x[index.index[n]] - 3.0)) % 360 for n in known])
+        expected = []
+        if known:
+            passes, hit = sweep_passes(bearings, angle, swept_to, 1.0)
+            for name, p, h in zip(known, passes.tolist(), hit.tolist()):
+                if h and p > last_pass.get(name, -math.inf):
+                    last_pass[name] = p
+                    expected.append(name)
+        assert found == sorted(expected)
+        angle = swept_to
+
+def test_rows_between_wraps_through_zero():
+    index = BearingIndex(0.0, 0.0)
+    for name, deg in (('a', 5.0), ('b', 90.0), ('c', 355.0)):
+        index.update(_vehicle(name, math.cos(math.radians(deg)), math.sin(math.radians(deg))))
+    assert sorted(index.names[r] for r in index.rows_between(350.0, 10.0)) == ['a', 'c']
+    assert [index.names[r] for r in index.rows_between(80.0, 100.0)] == ['b']
+
+def test_bearings_moved_between_queries():
+    index = BearingIndex(0.0, 0.0)
+    index.update(_vehicle('a', 10.0, 1.0))
+    index.update(_vehicle('b', -10.0, 1.0))
+    assert index.rows_between(0.0, 10.0) == [0]
+    # Several moves before the next query: only the last position counts
+    index.update(_vehicle('a', 0.0, 10.0))
+    index.update(_vehicle('a', -10.0, -1.0))
+    index.update(_vehicle('b', 10.0, 0.5))
+    assert index.rows_between(0.0, 10.0) == [1]
+    assert index.rows_between(180.0, 190.0) == [0]
+    assert index.key_bearing.tolist() == sorted(index.bearing)
+
+def test_each_vehicle_reported_once_per_pass():
+    dish = TacanDish('tacan1', 0.0, 0.0, rotation_period=1.0)
+    dish.on_vehicle(0.0, _vehicle('vehicle1', 0.0, 10.0))
+    hits = [r['vehicle'] for k in range(1, 61) for r in dish.step(k * 0.05)]
+    assert hits == ['vehicle1'] * 3
+
+def test_reading_position_and_t_are_extrapolated_together():
+    dish = TacanDish('tacan1', 0.0, -1000.0, rotation_period=2.4)
+    dish.on_vehicle(0.0, _vehicle('vehicle1', 0.0, 0.0, 0.0, vx=10.0, vy=0.0))
+    dish.on_vehicle(0.1, _vehicle('vehicle1', 1.0, 0.0, 0.01, vx=10.0, vy=0.0, origin=100.1))
+    (reading,) = dish.step(0.6)
+    assert reading['x'] == pytest.approx(6.0)
+    assert reading['t'] == pytest.approx(0.06)
+    assert reading['origin'] == pytest.approx(100.6)
+    assert reading['range'] == pytest.approx(math.hypot(6.0, 1000.0))
+
+def test_stationary_vehicle_keeps_its_t_and_origin():
+    index = BearingIndex(0.0, 0.0)
+    index.update(_vehicle('vehicle1', 5.0, 5.0, 0.2), 0.0)
+    index.update(_vehicle('vehicle1', 5.0, 5.0, 0.3, origin=7.0), 1.0)
+    x, y, t, origin, _, _ = index.extrapolate(0, 1.5)
+    assert (x, y, t, origin) == (5.0, 5.0, 0.3, 7.0)
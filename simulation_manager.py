@@ -3,46 +3,164 @@ import subprocess
 import sys
 import time
 import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from wire_codec import WIRE_FORMATS
+from vehicles.vehicle_sim import circle_paths
+from sensors.sensor_host import format_sensor_spec
+from launcher import LAUNCH_MODES, Launcher
+from scenarios.scenario import load_scenario
+from supervisor import Supervisor
+import metrics
 
 VEHICLE_BASE_PORT = 9001
 SENSOR_BASE_PORT = 9101
+STATS_BASE_PORT = 9200  # the manager serves the aggregate here, processes get the ports above it
+
+INACTIVITY_TIMEOUT = 60.0  # stop when no sensor has published for this long
+ACTIVITY_CHECK_INTERVAL = 5.0
+SCENARIO_DRAIN = 1.0  # seconds past a scenario's duration for the last readings to reach fusion
+STATS_ROUND_TIMEOUT = 0.5  # seconds one aggregation round waits for all processes together
+STATS_FETCH_THREADS = 32
+
+launcher = None  # set by main(); without one every component is exec'd
+supervisor = None
+
+def spawn(module, argv, fork=True):
+    if launcher is None:
+        return subprocess.Popen([sys.executable, '-m', module] + argv)
+    return launcher.start(module, argv, fork)
+
+def coord(v):
+    # Fixed-point: argparse takes '-1e-15' for an option, not a negative number
+    return f"{v:.9f}"
+
+def stats_args(stats_port=0, debug_every=0):
+    cmd = ['--stats-port', str(stats_port)]
+    if debug_every:
+        cmd += ['--debug-every', str(debug_every)]
+    return cmd
 
-processes = []
+def launch_vehicle(idx, p1, p2, name, wire_format='text', batch=False, stats_port=0, debug_every=0, duration=10.0, plan=None):
+    # With a plan the vehicle follows its route there and p1, p2, duration are unused
+    if plan:
+        cmd = ['--plan', plan]
+    else:
+        cmd = ['--p1', coord(p1[0]), coord(p1[1]),
+               '--p2', coord(p2[0]), coord(p2[1]), '--duration', str(duration)]
+    cmd += ['--name', name, '--wire-format', wire_format]
+    if batch:
+        cmd.append('--batch')
+    cmd += stats_args(stats_port, debug_every)
+    return spawn('vehicles.vehicle_sim', cmd)
 
-def launch_vehicle(idx, p1, p2, name):
-    cmd = [sys.executable, '-m', 'vehicles.vehicle_sim',
-           '--p1', str(p1[0]), str(p1[1]),
-           '--p2', str(p2[0]), str(p2[1]),
-           '--name', name]
-    return subprocess.Popen(cmd)
+def launch_fleet(paths, name_prefix='vehicle', wire_format='text', batch=False, stats_port=0, debug_every=0, duration=10.0, plan=None):
+    cmd = ['--name-prefix', name_prefix, '--wire-format', wire_format, '--duration', str(duration)]
+    if plan:
+        cmd += ['--plan', plan]
+    for p1, p2 in paths:
+        cmd += ['--path', coord(p1[0]), coord(p1[1]), coord(p2[0]), coord(p2[1])]
+    if batch:
+        cmd.append('--batch')
+    cmd += stats_args(stats_port, debug_every)
+    return spawn('vehicles.fleet_sim', cmd)
 
-def launch_sensor(idx, name, sensor_type='noisy', tacan_x=None, tacan_y=None):
+def launch_sensor(idx, name, sensor_type='noisy', tacan_x=None, tacan_y=None, wire_format='text', batch=False, stats_port=0, debug_every=0, param=None):
+    # param: the type's one tunable (see scenarios.scenario.SENSOR_PARAMS), None for its default
     if sensor_type == 'noisy':
-        cmd = [sys.executable, '-m', 'sensors.noisy_sensor', '--name', name]
+        module = 'sensors.noisy_sensor'
+        cmd = ['--name', name]
+        if batch:
+            cmd.append('--batch')
     elif sensor_type == 'adas':
-        cmd = [sys.executable, '-m', 'sensors.adas_sensor', '--name', name]
+        module = 'sensors.adas_sensor'
+        cmd = ['--name', name]
     elif sensor_type == 'tacan':
         if tacan_x is None or tacan_y is None:
             raise ValueError('TACAN sensor requires --tacan-x and --tacan-y')
-        cmd = [sys.executable, '-m', 'sensors.tacan_sensor', '--name', name,
-               '--radar-x-pos', str(tacan_x), '--radar-y-pos', str(tacan_y)]
+        module = 'sensors.tacan_sensor'
+        cmd = ['--name', name, '--radar-x-pos', str(tacan_x), '--radar-y-pos', str(tacan_y)]
     else:
         raise ValueError(f'Unknown sensor type: {sensor_type}')
-    return subprocess.Popen(cmd)
+    if param is not None:
+        cmd += [{'noisy': '--noise_std', 'adas': '--interval', 'tacan': '--rotation-period'}[sensor_type], str(param)]
+    cmd += ['--wire-format', wire_format]
+    cmd += stats_args(stats_port, debug_every)
+    return spawn(module, cmd)
+
+def launch_sensor_host(specs, wire_format='text', batch=False, workers=1, name='host1', stats_port=0, plan=None, shard=None, debug_every=0):
+    # specs: [(name, type, tacan_x, tacan_y)]; plan, shard: host that I/N share of a plan's sensors
+    cmd = ['--name', name, '--wire-format', wire_format, '--workers', str(workers)]
+    for sname, stype, tx, ty in specs:
+        cmd += ['--sensor', format_sensor_spec(sname, stype, tx, ty)]
+    if plan:
+        cmd += ['--plan', plan, '--plan-shard', shard]
+    if batch:
+        cmd.append('--batch')
+    cmd += stats_args(stats_port, debug_every)
+    return spawn('sensors.sensor_host', cmd)
+
+def launch_fusion(stats_port=0, debug_every=0, trace=None):
+    cmd = stats_args(stats_port, debug_every)
+    if trace:
+        cmd += ['--trace', trace]
+    return spawn('fusion.fusion_app', cmd)
 
-def launch_fusion():
-    cmd = [sys.executable, '-m', 'fusion.fusion_app']
-    return subprocess.Popen(cmd)
+def aggregate_stats(infos, timeout=STATS_ROUND_TIMEOUT):
+    # Pulls every process's metrics concurrently and merges them per role;
+    # processes that have not answered within `timeout` are left out
+    ports = [info['stats_port'] for info in infos if info.get('stats_port')]
+    snapshots = []
+    if ports:
+        pool = ThreadPoolExecutor(max_workers=min(len(ports), STATS_FETCH_THREADS))
+        futures = [pool.submit(metrics.fetch, port, timeout=timeout) for port in ports]
+        done, _ = wait(futures, timeout=timeout)
+        pool.shutdown(wait=False, cancel_futures=True)
+        for f in futures:
+            # Failed: not up yet, or exited
+            if f in done and f.exception() is None:
+                snapshots.append(f.result())
+    roles = {}
+    for snap in snapshots:
+        roles.setdefault(snap['role'], []).append(snap)
+    return {'time': time.time(), 'roles': {role: metrics.merge(snaps) for role, snaps in roles.items()},
+            'processes': {snap['name']: snap for snap in snapshots}}
+
+def route_text(plan, paths, i):
+    if plan is None:
+        p1, p2 = paths[i]
+        return f"from {p1} to {p2}"
+    wps, arrival = plan.route(i)
+    x1, y1 = wps[0]
+    x2, y2 = wps[-1]
+    return f"from ({x1:.2f}, {y1:.2f}) to ({x2:.2f}, {y2:.2f}) along {len(wps)} track points in {arrival[-1]:.1f}s, starting at {plan.depart[i]:.1f}s"
+
+def stats_line(agg):
+    parts = []
+    for role, m in sorted(agg['roles'].items()):
+        c, g, h = m['counters'], m['gauges'], m['histograms']
+        fields = [f"{m['processes']} proc"]
+        for name in ('msgs_in', 'msgs_out', 'outputs'):
+            if name in c:
+                fields.append(f"{name}={c[name]}")
+        for name in ('parse_seconds', 'latency_seconds', 'e2e_seconds'):
+            if name in h and h[name]['count']:
+                p50, p99 = metrics.percentiles(h[name], (50, 99))
+                fields.append(f"{name.split('_')[0]} p50={p50 * 1000:.2f}ms p99={p99 * 1000:.2f}ms")
+        if 'queue_depth' in g:
+            fields.append(f"queue={g['queue_depth']}")
+        if g.get('loss.lost'):
+            fields.append(f"lost={g['loss.lost']}")
+        parts.append(f"{role}: {', '.join(fields)}")
+    return "[STATS] " + (' | '.join(parts) if parts else 'no processes reporting')
 
 def stop_all():
     print("\nStopping all simulation processes...")
-    for p in processes:
-        if p.poll() is None:
-            p.terminate()
-    time.sleep(1)
-    for p in processes:
-        if p.poll() is None:
-            p.kill()
+    if supervisor is not None:
+        supervisor.terminate_all()
+    if launcher is not None:
+        launcher.close()
     print("All processes stopped.")
 
 def main():
@@ -52,8 +170,34 @@ def main():
     parser.add_argument('--sensor-type', type=str, nargs=2, action='append', metavar=('IDX','TYPE'), help='Specify sensor type for a sensor index: --sensor-type <idx> <type> (repeatable, types: noisy, adas, tacan)')
     parser.add_argument('--tacan-pos', type=float, nargs=3, action='append', metavar=('IDX','X','Y'), help='TACAN sensor index and position: --tacan-pos <idx> <x> <y> (repeatable)')
     parser.add_argument('--delta', type=float, default=135.0, help='Delta angle (degrees) between start and end for each vehicle (default: 135)')
+    parser.add_argument('--scenario', type=str, default=None, metavar='FILE', help='Run the vehicles and sensors of this scenario file (.json, .toml or .yaml, see scenarios.scenario) instead of -v/-s/--sensor-type/--tacan-pos/--delta')
+    parser.add_argument('--vehicle-duration', type=float, default=10.0, help='Seconds each vehicle takes from start to end, after which it stops broadcasting (default: 10)')
+    parser.add_argument('--vehicle-engine', choices=['process', 'fleet'], default='process', help='Run one process per vehicle (process) or all vehicles in one vectorized process (fleet)')
+    parser.add_argument('--wire-format', choices=WIRE_FORMATS, default='text', help='Message encoding used by vehicles and sensors (default: text)')
+    parser.add_argument('--batch', action='store_true', help='Vehicles and noisy sensors send one batch datagram per tick instead of one per record')
+    parser.add_argument('--sensor-hosts', type=int, default=0, help='Run the sensors inside this many sensor host processes instead of one process per sensor (default: 0, one process per sensor)')
+    parser.add_argument('--host-workers', type=int, default=1, help='Worker processes per sensor host, fed from a shared-memory ring (default: 1)')
+    parser.add_argument('--discrete-event', action='store_true', help='Run vehicles, sensors and fusion in this process on a virtual clock instead of launching processes')
+    parser.add_argument('--runs', type=int, default=1, help='Monte Carlo runs for --discrete-event (default: 1)')
+    parser.add_argument('--seed', type=int, default=0, help='Base random seed for --discrete-event; run i uses seed+i (default: 0)')
     parser.add_argument('--headless', '--no-visualize', action='store_true', help='Do not launch the visualization app (use --headless or --no-visualize)')
+    parser.add_argument('--stats-port', type=int, default=STATS_BASE_PORT, help=f'Serve the aggregated metrics of all processes on this local HTTP port; processes use the ports above it. 0 disables metrics (default: {STATS_BASE_PORT})')
+    parser.add_argument('--stats-interval', type=float, default=10.0, help='Print an aggregated metrics line every N seconds, 0 to disable (default: 10)')
+    parser.add_argument('--debug-every', type=int, default=0, help='Processes print every N-th message they send or fuse (default: 0: none from vehicles and sensors, every fused position)')
+    parser.add_argument('--launcher', choices=LAUNCH_MODES, default='forkserver', help='Fork components from a forkserver that imported them once (forkserver) or start a fresh interpreter for each (exec) (default: forkserver)')
+    parser.add_argument('--ready-timeout', type=float, default=30.0, help='Seconds to wait for components to report ready (default: 30)')
+    parser.add_argument('--trace', type=str, default=None, metavar='DIR', help='Fusion writes per-measurement hop timestamps to this trace directory (see recording.trace_report)')
     args = parser.parse_args()
+    if args.scenario and args.discrete_event:
+        parser.error('--scenario does not support --discrete-event yet')
+
+    plan = None
+    if args.scenario:
+        try:
+            plan = load_scenario(args.scenario)
+        except (OSError, ValueError) as e:
+            parser.error(f"scenario {args.scenario}: {e}")
+        print(f"Scenario {args.scenario}: plan {plan.path}")
 
     num_vehicles = args.num_vehicles
     # If num_sensors is not specified, create 3 sensors (noisy, adas, tacan), else all noisy
@@ -77,34 +221,10 @@ def main():
             tacan_pos_map[int(idx)] = (x, y)
     delta_deg = args.delta
 
-    # Place vehicles on a circle:
-    #   - Each vehicle starts at a unique position on the circle (evenly spaced, using polar coordinates)
-    #   - Each vehicle's destination is 'delta' degrees further around the circle from its starting point
-    #   - The --delta argument controls the angular separation between start and end (default: 135 degrees)
-    import math
-    radius = 10.0
-    center = (0.0, 0.0)
-    vehicle_paths = []
-    for i in range(num_vehicles):
-        theta = 2 * math.pi * i / num_vehicles
-        theta2 = theta + math.radians(delta_deg)
-        start = (center[0] + radius * math.cos(theta), center[1] + radius * math.sin(theta))
-        end = (center[0] + radius * math.cos(theta2), center[1] + radius * math.sin(theta2))
-        vehicle_paths.append((start, end))
-
-    print(f"Launching {num_vehicles} vehicles and {num_sensors} sensors...")
-
-    # Launch vehicles
-    vehicle_info = []
-    for i, (p1, p2) in enumerate(vehicle_paths):
-        name = f"vehicle{i+1}"
-        p = launch_vehicle(i, p1, p2, name)
-        processes.append(p)
-        vehicle_info.append({'proc': p, 'name': name, 'type': 'vehicle', 'idx': i})
-        print(f"  Vehicle {name} from {p1} to {p2} (multicast)")
+    # Place vehicles on a radius-10 circle; the --delta argument controls the
+    # angular separation between start and end (default: 135 degrees)
+    vehicle_paths = circle_paths(num_vehicles, delta_deg)
 
-    # Launch sensors (each sensor listens to all vehicles via multicast)
-    sensor_info = []
     # Prepare per-sensor (1-based) types and tacan positions
     sensor_types_to_launch = []
     for i, stype in enumerate(sensor_types):
@@ -114,104 +234,165 @@ def main():
         else:
             x, y = None, None
         sensor_types_to_launch.append((stype, x, y))
+    sensor_names = [f"sensor{i+1}" for i in range(num_sensors)]
+    sensor_params = [None] * num_sensors
+    vehicle_names = [f"vehicle{i+1}" for i in range(num_vehicles)]
+
+    if plan is not None:
+        # The scenario replaces the generated vehicles and sensors
+        vehicle_paths = []
+        vehicle_names = plan.vehicle_names
+        num_vehicles = len(vehicle_names)
+        sensor_names, sensor_types_to_launch, sensor_params = [], [], []
+        for name, stype, params in plan.sensor_specs():
+            x, y = params[:2] if stype == 'tacan' else (None, None)
+            extra = params[2:] if stype == 'tacan' else params
+            sensor_names.append(name)
+            sensor_types_to_launch.append((stype, x, y))
+            sensor_params.append(extra[0] if extra else None)
+        num_sensors = len(sensor_names)
+
+    if args.discrete_event:
+        # Everything runs in this process on a virtual clock; nothing is launched
+        from eventsim.event_sim import run_monte_carlo
+        print(f"Simulating {num_vehicles} vehicles and {num_sensors} sensors (discrete-event, {args.runs} runs)...")
+        run_monte_carlo(vehicle_paths, sensor_types_to_launch, runs=args.runs, seed=args.seed, duration=args.vehicle_duration)
+        return
+
+    print(f"Launching {num_vehicles} vehicles and {num_sensors} sensors...")
+    global launcher, supervisor
+    launcher = Launcher(args.launcher)
+    supervisor = Supervisor(launcher)
+    launch_start = time.monotonic()
+
+    def signal_handler(sig, frame):
+        stop_all()
+        sys.exit(0)
+    signal.signal(signal.SIGINT, signal_handler)
 
-    for i, (stype, tx, ty) in enumerate(sensor_types_to_launch):
-        name = f"sensor{i+1}"
-        p = launch_sensor(i, name, sensor_type=stype, tacan_x=tx, tacan_y=ty)
-        processes.append(p)
-        sensor_info.append({'proc': p, 'name': name, 'type': stype, 'idx': i, 'tacan_x': tx, 'tacan_y': ty})
-        print(f"  Sensor {name} ({stype}{' @ ('+str(tx)+','+str(ty)+')' if stype=='tacan' else ''}) (multicast)")
+    def restart_sensor(s):
+        if s['type'] == 'host':
+            return launch_sensor_host(s['specs'], wire_format=args.wire_format, batch=args.batch, workers=args.host_workers, name=s['name'], stats_port=s['stats_port'], plan=s.get('plan'), shard=s.get('shard'), debug_every=args.debug_every)
+        return launch_sensor(s['idx'], s['name'], sensor_type=s['type'], tacan_x=s.get('tacan_x'), tacan_y=s.get('tacan_y'), wire_format=args.wire_format, batch=args.batch, stats_port=s['stats_port'], debug_every=args.debug_every, param=s.get('param'))
+
+    next_stats_port = [args.stats_port]
+    def alloc_stats_port():
+        if not args.stats_port:
+            return 0
+        next_stats_port[0] += 1
+        return next_stats_port[0]
+
+    # Launch sensors (each sensor listens to all vehicles via multicast)
+    sensor_info = []
+    if args.sensor_hosts > 0:
+        # Deal the sensors round-robin over the hosts
+        hosts = [[] for _ in range(min(args.sensor_hosts, len(sensor_types_to_launch)))]
+        for i, (stype, tx, ty) in enumerate(sensor_types_to_launch):
+            hosts[i % len(hosts)].append((sensor_names[i], stype, tx, ty))
+        for i, specs in enumerate(hosts):
+            port = alloc_stats_port()
+            # A scenario's hosts read their share of the sensors from the plan
+            shard = f"{i}/{len(hosts)}" if plan is not None else None
+            p = launch_sensor_host([] if shard else specs, wire_format=args.wire_format, batch=args.batch, workers=args.host_workers, name=f"host{i+1}", stats_port=port,
+                                   plan=plan and plan.path, shard=shard, debug_every=args.debug_every)
+            sensor_info.append({'proc': p, 'name': f"host{i+1}", 'type': 'host', 'idx': i, 'specs': [] if shard else specs, 'stats_port': port,
+                                'plan': plan and plan.path, 'shard': shard})
+            supervisor.watch(sensor_info[-1], restart_sensor)
+            print(f"  Sensor host host{i+1}: {', '.join(name for name, _, _, _ in specs)} (multicast)")
+    else:
+        for i, (stype, tx, ty) in enumerate(sensor_types_to_launch):
+            name = sensor_names[i]
+            port = alloc_stats_port()
+            p = launch_sensor(i, name, sensor_type=stype, tacan_x=tx, tacan_y=ty, wire_format=args.wire_format, batch=args.batch, stats_port=port, debug_every=args.debug_every, param=sensor_params[i])
+            sensor_info.append({'proc': p, 'name': name, 'type': stype, 'idx': i, 'tacan_x': tx, 'tacan_y': ty, 'param': sensor_params[i], 'stats_port': port})
+            supervisor.watch(sensor_info[-1], restart_sensor)
+            print(f"  Sensor {name} ({stype}{' @ ('+str(tx)+','+str(ty)+')' if stype=='tacan' else ''}) (multicast)")
 
     # Launch fusion app
-    p = launch_fusion()
-    processes.append(p)
-    fusion_info = {'proc': p, 'name': 'fusion', 'type': 'fusion'}
+    port = alloc_stats_port()
+    p = launch_fusion(stats_port=port, debug_every=args.debug_every, trace=args.trace)
+    fusion_info = {'proc': p, 'name': 'fusion', 'type': 'fusion', 'stats_port': port}
+    supervisor.watch(fusion_info)
     print(f"  Fusion app (multicast)")
 
     # Launch visualization app unless headless
     visualizer_proc = None
+    visualizer_info = []
     if not args.headless:
         try:
-            cmd = [sys.executable, '-m', 'visualization.visualizer']
-            visualizer_proc = subprocess.Popen(cmd)
-            processes.append(visualizer_proc)
+            port = alloc_stats_port()
+            visualizer_proc = spawn('visualization.visualizer', ['--stats-port', str(port)], fork=False)
+            visualizer_info.append({'proc': visualizer_proc, 'name': 'visualizer', 'type': 'visualizer', 'stats_port': port})
+            supervisor.watch(visualizer_info[-1])
             print(f"  Visualization app started (multicast)")
         except Exception as e:
             print(f"[WARN] Could not start visualization app: {e}")
 
-    def signal_handler(sig, frame):
-        stop_all()
-        sys.exit(0)
-    signal.signal(signal.SIGINT, signal_handler)
+    # Vehicles start once every listener is up, so no early positions go unheard
+    listeners = [s['proc'] for s in sensor_info] + [fusion_info['proc']] + [v['proc'] for v in visualizer_info]
+    not_ready = launcher.wait_ready(listeners, args.ready_timeout)
+    if not_ready:
+        print(f"[WARN] {len(not_ready)} listeners not ready (exited or silent for {args.ready_timeout:.0f}s), starting vehicles anyway")
 
-    import socket, struct, threading, time
-    from multicast_config import SENSOR_MCAST_GRP, SENSOR_MCAST_PORT
-    last_activity_time = [time.time()]
-    stop_monitor = threading.Event()
-    activity_lock = threading.Lock()
-
-    def monitor_multicast():
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        sock.bind(('', SENSOR_MCAST_PORT))
-        mreq = struct.pack('4sl', socket.inet_aton(SENSOR_MCAST_GRP), socket.INADDR_ANY)
-        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
-        sock.settimeout(1.0)
-        while not stop_monitor.is_set():
-            try:
-                data, _ = sock.recvfrom(1024)
-                with activity_lock:
-                    last_activity_time[0] = time.time()
-            except socket.timeout:
-                continue
-        sock.close()
-
-    monitor_thread = threading.Thread(target=monitor_multicast, daemon=True)
-    monitor_thread.start()
+    # Launch vehicles
+    vehicle_info = []
+    if args.vehicle_engine == 'fleet':
+        port = alloc_stats_port()
+        p = launch_fleet(vehicle_paths, wire_format=args.wire_format, batch=args.batch, stats_port=port, debug_every=args.debug_every, duration=args.vehicle_duration,
+                         plan=plan and plan.path)
+        vehicle_info.append({'proc': p, 'name': 'fleet', 'type': 'vehicle', 'idx': 0, 'stats_port': port})
+        supervisor.watch(vehicle_info[-1])
+        for i, name in enumerate(vehicle_names):
+            print(f"  Vehicle {name} {route_text(plan, vehicle_paths, i)} (fleet engine, multicast)")
+    else:
+        for i, name in enumerate(vehicle_names):
+            p1, p2 = vehicle_paths[i] if plan is None else (None, None)
+            port = alloc_stats_port()
+            p = launch_vehicle(i, p1, p2, name, wire_format=args.wire_format, batch=args.batch, stats_port=port, debug_every=args.debug_every, duration=args.vehicle_duration,
+                               plan=plan and plan.path)
+            vehicle_info.append({'proc': p, 'name': name, 'type': 'vehicle', 'idx': i, 'stats_port': port})
+            supervisor.watch(vehicle_info[-1])
+            print(f"  Vehicle {name} {route_text(plan, vehicle_paths, i)} (multicast)")
+
+    not_ready += launcher.wait_ready([v['proc'] for v in vehicle_info], args.ready_timeout)
+    print(f"  {len(supervisor.children) - len(not_ready)} of {len(supervisor.children)} processes ready in {time.monotonic() - launch_start:.2f}s ({args.launcher})")
+
+    def all_stats():
+        return aggregate_stats(vehicle_info + sensor_info + [fusion_info] + visualizer_info)
+    if args.stats_port:
+        metrics.serve(args.stats_port, all_stats)
+        print(f"  Metrics: http://{metrics.STATS_HOST}:{args.stats_port}/metrics")
+        if args.stats_interval > 0:
+            stats_busy = threading.Lock()
+            def print_stats():
+                with stats_busy:
+                    print(stats_line(all_stats()))
+            def start_stats():
+                # On a thread, so the supervisor loop keeps reaping and restarting
+                # children meanwhile; a round still running skips this one
+                if not stats_busy.locked():
+                    threading.Thread(target=print_stats, daemon=True).start()
+            supervisor.every(args.stats_interval, start_stats)
+
+    def check_activity():
+        # Sensors send ACTIVE heartbeats while they publish readings
+        if time.monotonic() - launcher.last_active > INACTIVITY_TIMEOUT:
+            print(f"[INFO] No sensor activity for {INACTIVITY_TIMEOUT:.0f} seconds. Stopping all simulation processes except visualization.")
+            supervisor.terminate_all(keep=[visualizer_proc])
+            launcher.close()
+    supervisor.every(ACTIVITY_CHECK_INTERVAL, check_activity)
+
+    if plan is not None:
+        def end_scenario():
+            print(f"[INFO] Scenario ran its {plan.duration:.1f} seconds. Stopping all simulation processes except visualization.")
+            supervisor.terminate_all(keep=[visualizer_proc])
+            launcher.close()
+        supervisor.after(plan.duration + SCENARIO_DRAIN, end_scenario)
 
     try:
-        while True:
-            # Check vehicles
-            for v in vehicle_info:
-                if v['proc'].poll() is not None:
-                    print(f"[LOG] Vehicle {v['name']} exited with code {v['proc'].returncode}")
-            # Check sensors and restart if needed
-            for s in sensor_info:
-                if s['proc'].poll() is not None:
-                    print(f"[LOG] Sensor {s['name']} exited with code {s['proc'].returncode}, restarting...")
-                    new_proc = launch_sensor(s['idx'], s['name'], sensor_type=s['type'], tacan_x=s.get('tacan_x'), tacan_y=s.get('tacan_y'))
-                    s['proc'] = new_proc
-                    # Update processes list
-                    for idx, proc in enumerate(processes):
-                        if proc == s['proc']:
-                            processes[idx] = new_proc
-                            break
-                    else:
-                        processes.append(new_proc)
-            # Check fusion app
-            if fusion_info['proc'].poll() is not None:
-                print(f"[LOG] Fusion app exited with code {fusion_info['proc'].returncode}")
-
-            # Check for inactivity
-            with activity_lock:
-                inactive_secs = time.time() - last_activity_time[0]
-            if inactive_secs > 60:
-                print("[INFO] No multicast activity for 60 seconds. Stopping all simulation processes except visualization.")
-                # Stop all except visualization
-                for proc in processes:
-                    if visualizer_proc is not None and proc == visualizer_proc:
-                        continue
-                    try:
-                        proc.terminate()
-                    except Exception:
-                        pass
-                stop_monitor.set()
-                break
-            time.sleep(1)
+        supervisor.run()
     except KeyboardInterrupt:
-        stop_monitor.set()
         stop_all()
 
-
 if __name__ == "__main__":
     main()
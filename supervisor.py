@@ -0,0 +1,142 @@
+# Event-driven supervision of simulation_manager's children. Every child has an
+# exit fd that becomes readable when it exits: the multiprocessing sentinel of
+# a forked component, a pidfd (Linux 5.3+) of an exec'd one. One selector
+# waits on those, the launcher's notify socket and a timer heap, so a wakeup
+# costs the same however many children run; children are found by pid.
+import heapq
+import os
+import selectors
+import time
+
+from launcher import Child
+
+BACKOFF = 1.0  # first restart delay in seconds, doubled per quick failure
+MAX_BACKOFF = 60.0
+STABLE = 10.0  # a child that ran this long before exiting restarts without backoff
+POLL_INTERVAL = 1.0  # for children without an exit fd (no pidfd support)
+
+def raise_fd_limit():
+    # One exit fd per child: lift the soft RLIMIT_NOFILE to the hard limit
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft != hard:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+def exit_fd(proc):
+    # Returns (fd, owned): fd is readable once proc exits, owned fds are ours to close
+    if isinstance(proc, Child):
+        return proc.process.sentinel, False
+    try:
+        return os.pidfd_open(proc.pid), True
+    except (AttributeError, OSError):
+        return None, False
+
+def restart_delay(failures):
+    return min(BACKOFF * 2 ** min(failures, 16), MAX_BACKOFF)
+
+class Supervisor:
+    def __init__(self, launcher):
+        self.launcher = launcher
+        self.sel = selectors.DefaultSelector()
+        self.sel.register(launcher.notify, selectors.EVENT_READ, None)
+        self.children = {}  # pid -> info
+        self.polled = {}  # pid -> info, for children without an exit fd
+        self.timers = []  # heap of (when, seq, fn)
+        self.seq = 0
+        self.running = True
+        raise_fd_limit()
+
+    def watch(self, info, restart=None):
+        # info is the manager's dict for one child, with 'proc' and 'name'.
+        # restart(info) returns a replacement process; None leaves the child down.
+        proc = info['proc']
+        info['started'] = time.monotonic()
+        info['restart'] = restart
+        info.setdefault('failures', 0)
+        info['exit_fd'], info['owned_fd'] = exit_fd(proc)
+        self.children[proc.pid] = info
+        if info['exit_fd'] is None:
+            self.polled[proc.pid] = info
+        else:
+            self.sel.register(info['exit_fd'], selectors.EVENT_READ, proc.pid)
+
+    def after(self, delay, fn):
+        self.seq += 1
+        heapq.heappush(self.timers, (time.monotonic() + delay, self.seq, fn))
+
+    def every(self, interval, fn):
+        def tick():
+            fn()
+            self.after(interval, tick)
+        self.after(interval, tick)
+
+    def live(self):
+        return [info['proc'] for info in self.children.values()]
+
+    def _forget(self, pid):
+        info = self.children.pop(pid)
+        self.polled.pop(pid, None)
+        if info['exit_fd'] is not None:
+            self.sel.unregister(info['exit_fd'])
+            if info['owned_fd']:
+                os.close(info['exit_fd'])
+        self.launcher.ready.discard(pid)
+        return info
+
+    def _exited(self, pid):
+        info = self._forget(pid)
+        code = info['proc'].wait()  # already exited; reaps it
+        if info['restart'] is None or not self.running:
+            print(f"[LOG] {info['name']} exited with code {code}")
+            return
+        if time.monotonic() - info['started'] >= STABLE:
+            info['failures'] = 0
+        delay = restart_delay(info['failures'])
+        info['failures'] += 1
+        print(f"[LOG] {info['name']} exited with code {code}, restarting in {delay:.0f}s")
+        self.after(delay, lambda: self._restart(info))
+
+    def _restart(self, info):
+        if not self.running:
+            return
+        info['proc'] = info['restart'](info)
+        self.watch(info, info['restart'])
+
+    def _poll_unwatched(self):
+        for pid, info in list(self.polled.items()):
+            if info['proc'].poll() is not None:
+                self._exited(pid)
+
+    def run(self):
+        # Dispatches exits, notifications and timers until stop()
+        self.every(POLL_INTERVAL, self._poll_unwatched)
+        while self.running:
+            timeout = max(0.0, self.timers[0][0] - time.monotonic()) if self.timers else None
+            for key, _ in self.sel.select(timeout):
+                if key.data is None:
+                    self.launcher.poll_ready()
+                elif key.data in self.children:
+                    self._exited(key.data)
+            now = time.monotonic()
+            while self.running and self.timers and self.timers[0][0] <= now:
+                heapq.heappop(self.timers)[2]()
+
+    def stop(self):
+        self.running = False
+
+    def terminate_all(self, keep=(), grace=1.0):
+        # Stops every child but those in keep: SIGTERM, then SIGKILL after grace seconds
+        self.running = False
+        procs = [p for p in self.live() if p not in keep]
+        for p in procs:
+            if p.poll() is None:
+                p.terminate()
+        deadline = time.monotonic() + grace
+        while time.monotonic() < deadline and any(p.poll() is None for p in procs):
+            time.sleep(0.05)
+        for p in procs:
+            if p.poll() is None:
+                p.kill()
@@ -0,0 +1,40 @@
+import pytest
+
+import metrics
+from metrics import Histogram, Registry, merge
+from wire_codec import LossTracker
+
+def _snapshot(seqs):
+    registry = Registry('sensor', 'sensor1')
+    loss = LossTracker()
+    loss.observe([{'name': 'vehicle1', 'seq': s} for s in seqs])
+    registry.counter('msgs_in').inc(len(seqs))
+    registry.gauge('loss', loss.totals)
+    registry.histogram('parse_seconds').record(0.001)
+    return registry.snapshot()
+
+def test_merge_sums_counts_and_buckets():
+    merged = merge([_snapshot(range(10)), _snapshot(range(20))])
+    assert merged['processes'] == 2
+    assert merged['counters']['msgs_in'] == 30
+    assert merged['gauges']['loss.received'] == 30
+    assert merged['histograms']['parse_seconds']['count'] == 2
+
+def test_merge_recomputes_ratio_gauges():
+    # 1 of 4 lost in one process, 1 of 100 in the other
+    merged = merge([_snapshot([0, 1, 3]), _snapshot([k for k in range(100) if k != 50])])
+    assert merged['gauges']['loss.lost'] == 2
+    assert merged['gauges']['loss.loss_rate'] == pytest.approx(2 / 104)
+
+def test_merge_of_ratios_stays_a_ratio():
+    merged = merge([_snapshot([0, 2]) for _ in range(5)])
+    assert merged['gauges']['loss.loss_rate'] == pytest.approx(1 / 3)
+    assert merge([_snapshot([])])['gauges']['loss.loss_rate'] == 0.0
+
+def test_histogram_percentiles():
+    h = Histogram()
+    for ms in range(1, 101):
+        h.record(ms / 1000)
+    p50, p99 = metrics.percentiles(h.snapshot(), (50, 99))
+    assert p50 == pytest.approx(0.050, rel=0.05)
+    assert p99 == pytest.approx(0.099, rel=0.05)
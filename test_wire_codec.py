@@ -0,0 +1,121 @@
+import math
+import time
+
+import pytest
+
+import wire_codec
+from wire_codec import LossTracker, decode, decode_all, encode_sensor, encode_vehicle, frame_batches
+
+@pytest.mark.parametrize('fmt', wire_codec.WIRE_FORMATS)
+def test_vehicle_round_trip(fmt):
+    msg = decode(encode_vehicle('vehicle1', 1.25, -5.5, 0.5, fmt, seq=7, origin=123.25, vx=0.5, vy=-1.5))
+    assert msg == {'type': 'vehicle', 'name': 'vehicle1', 'x': 1.25, 'y': -5.5, 't': 0.5, 'seq': 7,
+                   'origin': 123.25, 'vx': 0.5, 'vy': -1.5}
+
+@pytest.mark.parametrize('fmt', wire_codec.WIRE_FORMATS)
+def test_vehicle_without_velocity(fmt):
+    # Without an origin the vehicle stamps its emission time
+    msg = decode(encode_vehicle('vehicle1', 1.0, 2.0, 0.0, fmt, seq=0))
+    assert msg['vx'] is None and msg['vy'] is None
+    assert msg['origin'] == pytest.approx(time.monotonic(), abs=1.0)
+
+@pytest.mark.parametrize('fmt', wire_codec.WIRE_FORMATS)
+@pytest.mark.parametrize('stype', wire_codec.SENSOR_TYPES)
+def test_sensor_round_trip(fmt, stype):
+    msg = decode(encode_sensor('sensor1', 1.25, -5.5, 0.5, stype, 0.25, 'vehicle1', fmt, seq=3, origin=10.5, sensed=11.0))
+    assert msg == {'type': 'sensor', 'name': 'sensor1', 'x': 1.25, 'y': -5.5, 't': 0.5, 'sensor_type': stype, 'noise_var': 0.25,
+                   'vehicle': 'vehicle1', 'seq': 3, 'origin': 10.5, 'sensed': 11.0}
+
+def test_old_text_schema():
+    msg = decode(b'sensor,sensor1,1.0,2.0,0.5,0.5,vehicle1')
+    assert msg['sensor_type'] == 'noisy' and msg['noise_var'] == 0.25 and msg['seq'] is None
+
+def test_unusable_packets_are_counted():
+    before = dict(wire_codec.counters)
+    assert decode(b'vehicle,v1,not-a-number,0,0') is None
+    assert decode(bytes([0xA1]) + bytes(50)) is None  # other schema version
+    assert wire_codec.counters['malformed'] == before['malformed'] + 1
+    assert wire_codec.counters['dropped'] == before['dropped'] + 1
+
+@pytest.mark.parametrize('fmt', wire_codec.WIRE_FORMATS)
+def test_batch_framing(fmt):
+    records = [encode_vehicle(f"vehicle{i}", i, -i, i / 500, fmt, seq=i, origin=1.0, vx=1.0, vy=0.0) for i in range(500)]
+    frames = frame_batches(records, fmt)
+    assert len(frames) > 1
+    assert all(len(f) <= wire_codec.MAX_DATAGRAM for f in frames)
+    msgs = [m for f in frames for m in decode_all(f)]
+    assert [m['seq'] for m in msgs] == list(range(500))
+    assert [m['name'] for m in msgs] == [f"vehicle{i}" for i in range(500)]
+    assert decode_all(frames[0])[0] == decode(records[0])
+
+@pytest.mark.parametrize('fmt', wire_codec.WIRE_FORMATS)
+def test_lone_record_is_sent_unframed(fmt):
+    rec = encode_vehicle('vehicle1', 1.0, 2.0, 0.5, fmt, seq=1)
+    assert frame_batches([rec], fmt) == [rec]
+    assert decode_all(rec) == [decode(rec)]
+
+@pytest.mark.parametrize('fmt', wire_codec.WIRE_FORMATS)
+def test_decode_skips_batch_frames(fmt):
+    frame = frame_batches([encode_vehicle('vehicle1', 0.0, 0.0, 0.0, fmt, seq=i) for i in range(3)], fmt)[0]
+    before = dict(wire_codec.counters)
+    assert decode(frame) is None
+    assert wire_codec.counters == before
+
+@pytest.mark.parametrize('fmt', wire_codec.WIRE_FORMATS)
+def test_frames_smaller_than_a_record(fmt):
+    records = [encode_vehicle(f"vehicle{i}", 0.0, 0.0, 0.0, fmt, seq=i) for i in range(3)]
+    assert frame_batches(records, fmt, max_bytes=10) == records
+
+def test_truncated_batch_is_malformed():
+    frame = frame_batches([encode_vehicle('vehicle1', 0.0, 0.0, 0.0, 'binary', seq=i) for i in range(3)], 'binary')[0]
+    before = wire_codec.counters['malformed']
+    assert decode_all(frame[:-1]) == []
+    assert decode_all(b'batch,3\n' + b'vehicle,v1,0,0,0,1') == []
+    assert wire_codec.counters['malformed'] == before + 2
+
+def _observe(tracker, seqs, name='vehicle1'):
+    tracker.observe([{'name': name, 'seq': s} for s in seqs])
+    return tracker.totals()
+
+def test_loss_in_order():
+    t = _observe(LossTracker(), range(100))
+    assert (t['received'], t['lost'], t['reordered'], t['duplicates'], t['restarts']) == (100, 0, 0, 0, 0)
+
+def test_loss_gap_and_reorder():
+    t = _observe(LossTracker(), [0, 1, 2, 5, 6, 3])
+    assert (t['received'], t['lost'], t['reordered']) == (6, 1, 1)
+    assert t['loss_rate'] == pytest.approx(1 / 7)
+
+def test_loss_duplicates():
+    t = _observe(LossTracker(), [0, 1, 2, 2, 1, 3])
+    assert (t['received'], t['duplicates']) == (4, 2)
+
+def test_loss_streams_are_per_sender():
+    tracker = LossTracker()
+    _observe(tracker, [0, 1, 2], 'a')
+    t = _observe(tracker, [0, 2], 'b')
+    assert (t['streams'], t['received'], t['lost']) == (2, 5, 1)
+
+def test_loss_sequence_wraps():
+    top = wire_codec.SEQ_MASK
+    t = _observe(LossTracker(), [top - 1, top, 0, 1])
+    assert (t['received'], t['lost'], t['duplicates']) == (4, 0, 0)
+
+def test_loss_restart_beyond_window():
+    t = _observe(LossTracker(window=64), list(range(1000)) + list(range(10)))
+    assert (t['received'], t['duplicates'], t['restarts']) == (1010, 0, 1)
+
+def test_loss_restart_within_window():
+    # A sender restarted soon after its previous run counts from 0 again
+    t = _observe(LossTracker(), list(range(300)) + list(range(50)))
+    assert (t['received'], t['duplicates'], t['restarts'], t['lost']) == (350, 0, 1, 0)
+
+def test_loss_late_duplicate_is_not_a_restart():
+    t = _observe(LossTracker(), list(range(300)) + [250, 290])
+    assert (t['duplicates'], t['restarts']) == (2, 0)
+
+def test_loss_ignores_records_without_seq():
+    tracker = LossTracker()
+    tracker.observe([{'name': 'sensor1', 'seq': None}])
+    assert tracker.totals()['streams'] == 0
+    assert not math.isnan(tracker.totals()['loss_rate'])
@@ -0,0 +1,103 @@
+import socket
+import time
+import argparse
+import math
+import signal
+import sys
+
+import numpy as np
+
+from multicast_config import VEHICLE_MCAST_GRP, VEHICLE_MCAST_PORT
+from wire_codec import WIRE_FORMATS, Announcer, encode_vehicle, frame_batches
+from metrics import Registry, Sampler, serve
+from launcher import notify_ready
+from scenarios.scenario import Plan
+from vehicles.trajectory import Trajectories
+
+def encode_updates(names, pos, t, wire_format='text', origin=None, vel=None):
+    # Same wire format as vehicle_sim, one message per vehicle, all stamped with the tick's origin
+    xs = pos[:, 0].tolist()
+    ys = pos[:, 1].tolist()
+    ts = t.tolist()
+    if origin is None:
+        origin = time.monotonic()
+    if vel is None:
+        return [encode_vehicle(name, x, y, tt, wire_format, origin=origin) for name, x, y, tt in zip(names, xs, ys, ts)]
+    return [encode_vehicle(name, x, y, tt, wire_format, origin=origin, vx=vx, vy=vy)
+            for name, x, y, tt, vx, vy in zip(names, xs, ys, ts, vel[:, 0].tolist(), vel[:, 1].tolist())]
+
+def main():
+    parser = argparse.ArgumentParser(description="Fleet Simulator: Moves many vehicles in one process and broadcasts their positions over UDP.")
+    parser.add_argument('--path', type=float, nargs=4, action='append', metavar=('X1', 'Y1', 'X2', 'Y2'), help='Vehicle path from (X1, Y1) to (X2, Y2) (repeatable, one per vehicle)')
+    parser.add_argument('--plan', type=str, default=None, help='Move every vehicle of this compiled scenario plan (.npz, see scenarios.scenario) along its route instead of --path')
+    parser.add_argument('--interval', type=float, default=0.1, help='Broadcast interval in seconds')
+    parser.add_argument('--duration', type=float, default=10.0, help='Time to move from start to end of each path (seconds)')
+    parser.add_argument('--name-prefix', type=str, default='vehicle', help='Vehicles are named <prefix>1..<prefix>N')
+    parser.add_argument('--wire-format', choices=WIRE_FORMATS, default='text', help='Message encoding (default: text)')
+    parser.add_argument('--batch', action='store_true', help='Pack each tick into as few MTU-sized batch datagrams as possible')
+    parser.add_argument('--stats-port', type=int, default=0, help='Serve metrics as JSON on this local HTTP port (default: 0, off)')
+    parser.add_argument('--debug-every', type=int, default=0, help='Print a summary of every N-th tick (default: 0, none)')
+    args = parser.parse_args()
+    if not args.path and not args.plan:
+        parser.error('give --path (repeatable) or --plan')
+
+    registry = Registry('vehicle', args.name_prefix + '*')
+    msgs_out = registry.counter('msgs_out')
+    packets_out = registry.counter('packets_out')
+    tick_seconds = registry.histogram('tick_seconds')  # evaluate, encode and send one tick
+    serve(args.stats_port, registry.snapshot)
+    debug = Sampler(args.debug_every)
+
+    horizon = math.inf  # seconds after which every vehicle stops
+    if args.plan:
+        plan = Plan.load(args.plan)
+        names = plan.vehicle_names
+        trajectories = plan.trajectories()
+        horizon = plan.duration
+    else:
+        paths = np.asarray(args.path, dtype=np.float64)
+        names = [f"{args.name_prefix}{i+1}" for i in range(len(paths))]
+        trajectories = Trajectories.straight(paths[:, 0:2], paths[:, 2:4], args.duration)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    # Set TTL for multicast (1 = local network only)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+    addr = (VEHICLE_MCAST_GRP, VEHICLE_MCAST_PORT)
+
+    def signal_handler(sig, frame):
+        sock.close()
+        sys.exit(0)
+    signal.signal(signal.SIGINT, signal_handler)
+
+    notify_ready()
+    print(f"Fleet of {len(names)} vehicles started (broadcasting to multicast {VEHICLE_MCAST_GRP}:{VEHICLE_MCAST_PORT})")
+
+    # Vehicles stop broadcasting after their t=1.0 update, like vehicle_sim does,
+    # or at the end of the scenario
+    active = np.ones(len(names), dtype=bool)
+    announcer = Announcer(names, args.wire_format)
+    start_time = time.time()
+    while active.any():
+        now = time.time()
+        for pkt in announcer.due(now):
+            sock.sendto(pkt, addr)
+        elapsed = now - start_time
+        pos, vel, t = trajectories.state(elapsed)
+        idx = np.flatnonzero(active)
+        msgs = encode_updates([names[i] for i in idx], pos[idx], t[idx], args.wire_format, vel=vel[idx])
+        if args.batch:
+            msgs = frame_batches(msgs, args.wire_format)
+        for msg in msgs:
+            sock.sendto(msg, addr)
+        msgs_out.inc(len(idx))
+        packets_out.inc(len(msgs))
+        tick_seconds.record(time.time() - now)
+        if debug.hit():
+            print(f"Broadcast: {len(idx)} vehicle updates in {len(msgs)} datagrams")
+        active &= t < 1.0
+        if elapsed >= horizon:
+            break
+        time.sleep(max(0, args.interval - (time.time() - start_time - elapsed)))
+
+if __name__ == "__main__":
+    main()
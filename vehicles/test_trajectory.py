@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from vehicles.trajectory import Trajectories, arc_length, build_track, catmull_rom, track_times
+
+def test_straight_state():
+    traj = Trajectories.straight([[0, 0], [10, 10]], [[10, 0], [10, 20]], [5.0, 2.0], depart=[0.0, 1.0])
+    pos, vel, frac = traj.state(0.0)
+    assert pos.tolist() == [[0, 0], [10, 10]]  # second vehicle waits for departure
+    assert vel.tolist() == [[0, 0], [0, 0]]  # not moving yet at the departure instant
+    pos, vel, frac = traj.state(2.0)
+    assert pos == pytest.approx(np.array([[4, 0], [10, 15]]))
+    assert vel == pytest.approx(np.array([[2, 0], [0, 5]]))
+    assert frac == pytest.approx([0.4, 0.5])
+    pos, vel, frac = traj.state(9.0)
+    assert pos.tolist() == [[10, 0], [10, 20]]  # arrived and parked
+    assert vel.tolist() == [[0, 0], [0, 0]]
+    assert frac.tolist() == [1.0, 1.0]
+
+def test_multi_route_state_matches_interpolation():
+    rng = np.random.default_rng(0)
+    routes = []
+    for n in (2, 3, 7, 4):
+        points = rng.uniform(-50, 50, (n, 2))
+        routes.append((points, np.concatenate(([0.0], np.cumsum(rng.uniform(0.5, 3.0, n - 1))))))
+    starts = np.concatenate(([0], np.cumsum([len(p) for p, _ in routes])))
+    depart = rng.uniform(0, 2, len(routes))
+    traj = Trajectories(starts, np.concatenate([p for p, _ in routes]), np.concatenate([t for _, t in routes]), depart)
+    for elapsed in np.linspace(-1, 15, 97):
+        pos = traj.state(elapsed)[0]
+        for i, (points, times) in enumerate(routes):
+            tt = elapsed - depart[i]
+            expected = [np.interp(tt, times, points[:, 0]), np.interp(tt, times, points[:, 1])]
+            assert pos[i] == pytest.approx(expected)
+
+def test_route_needs_two_points():
+    with pytest.raises(ValueError):
+        Trajectories([0, 1], [[0, 0]], [0.0], [0.0])
+
+def test_spline_passes_through_the_waypoints():
+    wps = np.array([[0, 0], [5, 5], [10, 0], [15, 5]], dtype=float)
+    track, knots = build_track(wps, 'spline', samples=8)
+    assert len(track) == 8 * 3 + 1
+    assert track[knots] == pytest.approx(wps)
+    assert catmull_rom(wps, 8) == pytest.approx(track)
+
+def test_two_point_spline_is_a_line():
+    track, knots = build_track([[0, 0], [1, 1]], 'spline')
+    assert track.tolist() == [[0, 0], [1, 1]] and knots.tolist() == [0, 1]
+
+def test_unknown_shape():
+    with pytest.raises(ValueError, match='unknown route shape'):
+        build_track([[0, 0], [1, 1], [2, 0]], 'bezier')
+
+def test_track_times_keep_speed_constant_per_leg():
+    track, knots = build_track([[0, 0], [4, 4], [8, 0], [8, 8]], 'spline')
+    arc = arc_length(track)
+    seconds = np.array([2.0, 1.0, 4.0])
+    times = track_times(arc, knots, seconds)
+    assert times[knots] == pytest.approx([0.0, 2.0, 3.0, 7.0])
+    for leg in range(3):
+        a, b = knots[leg], knots[leg + 1]
+        speeds = np.diff(arc[a:b + 1]) / np.diff(times[a:b + 1])
+        assert speeds == pytest.approx((arc[b] - arc[a]) / seconds[leg])
+
+def test_velocity_follows_the_segment():
+    traj = Trajectories([0, 3], [[0, 0], [0, 10], [-10, 10]], [0.0, 1.0, 2.0], [0.0])
+    assert traj.state(0.5)[1] == pytest.approx(np.array([[0.0, 10.0]]))
+    assert traj.state(1.5)[1] == pytest.approx(np.array([[-10.0, 0.0]]))
+    assert traj.state(1.5)[2] == pytest.approx([0.75])
@@ -0,0 +1,98 @@
+# Trajectory engine for vehicle routes. A route is a track of points with the
+# seconds since departure at which the vehicle passes each one; polylines use
+# their waypoints as the track, splines a Catmull-Rom curve through the
+# waypoints sampled into short segments. Times along a track follow its arc
+# length, so speed is constant within each waypoint-to-waypoint leg.
+#
+# Trajectories holds many routes as flat arrays (CSR: route i owns points
+# starts[i]:starts[i+1]) with per-segment tables precomputed once: offsets,
+# durations and velocity. All routes share one sorted time key, so
+# state(elapsed) finds every vehicle's segment with a single searchsorted and
+# evaluates the fleet with a handful of array operations.
+import numpy as np
+
+ROUTE_SHAPES = ('polyline', 'spline')
+SPLINE_SAMPLES = 16  # track segments per spline leg
+
+def catmull_rom(waypoints, samples=SPLINE_SAMPLES):
+    # Uniform Catmull-Rom curve through (n, 2) waypoints, sampled into
+    # samples * (n - 1) + 1 points; waypoint k is point k * samples
+    wps = np.asarray(waypoints, dtype=np.float64)
+    ctrl = np.concatenate(([2 * wps[0] - wps[1]], wps, [2 * wps[-1] - wps[-2]]))
+    p0, p1, p2, p3 = (ctrl[i:i + len(wps) - 1, None, :] for i in range(4))
+    s = np.linspace(0.0, 1.0, samples, endpoint=False)[None, :, None]
+    curve = 0.5 * (2 * p1 + (p2 - p0) * s + (2 * p0 - 5 * p1 + 4 * p2 - p3) * s ** 2 + (3 * (p1 - p2) + p3 - p0) * s ** 3)
+    return np.concatenate((curve.reshape(-1, 2), wps[-1:]))
+
+def build_track(waypoints, shape='polyline', samples=SPLINE_SAMPLES):
+    # Returns (track points, index of each waypoint in the track)
+    wps = np.asarray(waypoints, dtype=np.float64)
+    if shape == 'spline' and len(wps) > 2:
+        return catmull_rom(wps, samples), np.arange(len(wps)) * samples
+    if shape not in ROUTE_SHAPES:
+        raise ValueError(f"unknown route shape {shape!r}, shapes: {', '.join(ROUTE_SHAPES)}")
+    return wps, np.arange(len(wps))
+
+def arc_length(points):
+    # Cumulative distance along the track at each point
+    return np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(points, axis=0).T))))
+
+def track_times(arc, knots, seconds):
+    # Seconds since departure at each track point, given the duration of each
+    # leg between consecutive knots; legs without length advance evenly
+    idx = np.arange(len(arc))
+    leg = np.clip(np.searchsorted(knots, idx, side='right') - 1, 0, len(seconds) - 1)
+    a0, a1 = arc[knots[leg]], arc[knots[leg + 1]]
+    k0, k1 = knots[leg], knots[leg + 1]
+    frac = np.where(a1 > a0, (arc - a0) / np.where(a1 > a0, a1 - a0, 1.0), (idx - k0) / (k1 - k0))
+    start = np.concatenate(([0.0], np.cumsum(seconds)))
+    return start[leg] + frac * seconds[leg]
+
+class Trajectories:
+    def __init__(self, starts, points, times, depart):
+        # starts: (N+1,) CSR offsets; points: (M, 2); times: (M,) seconds since
+        # departure, from 0 and non-decreasing per route; depart: (N,)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.times = np.asarray(times, dtype=np.float64)
+        self.depart = np.asarray(depart, dtype=np.float64)
+        first, last = self.starts[:-1], self.starts[1:] - 1
+        if np.any(last - first < 1):
+            raise ValueError("every route needs at least 2 points")
+        self.total = self.times[last]
+        # One sorted key over all routes: route i's times shifted past route i-1's
+        self.offset = np.concatenate(([0.0], np.cumsum(self.total + 1.0)[:-1]))
+        self.key = self.times + np.repeat(self.offset, np.diff(self.starts))
+        self.lo, self.hi = first, last - 1  # segment range of each route
+        # Segment k runs from point k to k+1; those across route ends are never selected
+        self.delta = np.diff(self.points, axis=0)
+        dt = np.diff(self.times)
+        moving = dt > 0
+        self.inv_dt = np.divide(1.0, dt, out=np.zeros_like(dt), where=moving)
+        self.velocity = self.delta * self.inv_dt[:, None]
+
+    @classmethod
+    def straight(cls, p1, p2, durations, depart=None):
+        # One constant-speed leg per vehicle from p1 (N, 2) to p2 (N, 2)
+        p1 = np.asarray(p1, dtype=np.float64).reshape(-1, 2)
+        n = len(p1)
+        points = np.stack((p1, np.asarray(p2, dtype=np.float64).reshape(-1, 2)), axis=1).reshape(-1, 2)
+        times = np.stack((np.zeros(n), np.broadcast_to(np.asarray(durations, dtype=np.float64), n)), axis=1).ravel()
+        return cls(np.arange(n + 1) * 2, points, times, np.zeros(n) if depart is None else depart)
+
+    def __len__(self):
+        return len(self.depart)
+
+    def state(self, elapsed):
+        # (pos (N, 2), velocity (N, 2), path fraction (N,))
+        # `elapsed` seconds after the start; vehicles wait at their first point
+        # until departure and stay at their last after arrival, with zero velocity
+        tt = elapsed - self.depart
+        lt = np.clip(tt, 0.0, self.total)
+        k = np.searchsorted(self.key, lt + self.offset, side='right') - 1
+        k = np.clip(k, self.lo, self.hi)
+        f = np.clip((lt - self.times[k]) * self.inv_dt[k], 0.0, 1.0)
+        pos = self.points[k] + self.delta[k] * f[:, None]
+        vel = self.velocity[k] * ((tt > 0) & (tt < self.total))[:, None]
+        frac = np.divide(lt, self.total, out=np.ones_like(lt), where=self.total > 0)
+        return pos, vel, frac
@@ -6,6 +6,11 @@ import signal
 import sys
 
 from multicast_config import VEHICLE_MCAST_GRP, VEHICLE_MCAST_PORT
+from wire_codec import WIRE_FORMATS, Announcer, encode_vehicle, frame_batches
+from metrics import Registry, Sampler, serve
+from launcher import notify_ready
+from scenarios.scenario import Plan
+from vehicles.trajectory import Trajectories
 
 def interpolate(p1, p2, t):
     return (
@@ -13,15 +18,53 @@ def interpolate(p1, p2, t):
         p1[1] + (p2[1] - p1[1]) * t,
     )
 
+def circle_paths(num_vehicles, delta_deg, radius=10.0, center=(0.0, 0.0)):
+    # Place vehicles on a circle:
+    #   - Each vehicle starts at a unique position on the circle (evenly spaced, using polar coordinates)
+    #   - Each vehicle's destination is 'delta' degrees further around the circle from its starting point
+    paths = []
+    for i in range(num_vehicles):
+        theta = 2 * math.pi * i / num_vehicles
+        theta2 = theta + math.radians(delta_deg)
+        start = (center[0] + radius * math.cos(theta), center[1] + radius * math.sin(theta))
+        end = (center[0] + radius * math.cos(theta2), center[1] + radius * math.sin(theta2))
+        paths.append((start, end))
+    return paths
+
 def main():
     parser = argparse.ArgumentParser(description="Vehicle Simulator: Moves from P1 to P2 and broadcasts position over UDP.")
-    parser.add_argument('--p1', type=float, nargs=2, required=True, help='Start position x y')
-    parser.add_argument('--p2', type=float, nargs=2, required=True, help='End position x y')
+    parser.add_argument('--p1', type=float, nargs=2, help='Start position x y')
+    parser.add_argument('--p2', type=float, nargs=2, help='End position x y')
+    parser.add_argument('--plan', type=str, default=None, help='Follow the route of vehicle --name in this compiled scenario plan (.npz, see scenarios.scenario) instead of --p1/--p2')
     # Multicast group/port are now used for all communication
     parser.add_argument('--interval', type=float, default=0.1, help='Broadcast interval in seconds')
     parser.add_argument('--duration', type=float, default=10.0, help='Time to move from P1 to P2 (seconds)')
     parser.add_argument('--name', type=str, default='vehicle1', help='Vehicle name/id')
+    parser.add_argument('--wire-format', choices=WIRE_FORMATS, default='text', help='Message encoding (default: text)')
+    parser.add_argument('--batch', action='store_true', help='Send each tick as a batch frame (one record per tick for a single vehicle)')
+    parser.add_argument('--stats-port', type=int, default=0, help='Serve metrics as JSON on this local HTTP port (default: 0, off)')
+    parser.add_argument('--debug-every', type=int, default=0, help='Print every N-th broadcast message (default: 0, none)')
     args = parser.parse_args()
+    horizon = math.inf  # seconds after which the vehicle stops
+    if args.plan:
+        plan = Plan.load(args.plan)
+        if args.name not in plan.vehicle_names:
+            parser.error(f"no vehicle {args.name!r} in plan {args.plan}")
+        row = plan.vehicle_names.index(args.name)
+        trajectory = plan.trajectories([row])
+        horizon = plan.duration
+        route = f"on a {len(plan.route(row)[0])}-point route"
+    elif args.p1 is None or args.p2 is None:
+        parser.error('give --p1 and --p2, or --plan')
+    else:
+        trajectory = Trajectories.straight(args.p1, args.p2, args.duration)
+        route = f"at {args.p1} moving to {args.p2}"
+
+    registry = Registry('vehicle', args.name)
+    msgs_out = registry.counter('msgs_out')
+    packets_out = registry.counter('packets_out')
+    serve(args.stats_port, registry.snapshot)
+    debug = Sampler(args.debug_every)
 
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
     # Set TTL for multicast (1 = local network only)
@@ -33,18 +76,29 @@ def main():
         sys.exit(0)
     signal.signal(signal.SIGINT, signal_handler)
 
-    time.sleep(1)
-    print(f"Vehicle {args.name} started at {args.p1} moving to {args.p2} (broadcasting to multicast {VEHICLE_MCAST_GRP}:{VEHICLE_MCAST_PORT})")
+    notify_ready()
+    print(f"Vehicle {args.name} started {route} (broadcasting to multicast {VEHICLE_MCAST_GRP}:{VEHICLE_MCAST_PORT})")
     
+    announcer = Announcer([args.name], args.wire_format)
     start_time = time.time()
     while True:
-        elapsed = time.time() - start_time
-        t = min(elapsed / args.duration, 1.0)
-        pos = interpolate(args.p1, args.p2, t)
-        msg = f"vehicle,{args.name},{pos[0]:.3f},{pos[1]:.3f},{t:.3f}"
-        sock.sendto(msg.encode(), addr)
-        print(f"Broadcast: {msg}")
-        if t >= 1.0:
+        now = time.time()
+        for pkt in announcer.due(now):
+            sock.sendto(pkt, addr)
+        elapsed = now - start_time
+        p, v, frac = trajectory.state(elapsed)
+        pos, vel, t = p[0].tolist(), v[0].tolist(), float(frac[0])
+        msg = encode_vehicle(args.name, pos[0], pos[1], t, args.wire_format, vx=vel[0], vy=vel[1])
+        if args.batch:
+            for frame in frame_batches([msg], args.wire_format):
+                sock.sendto(frame, addr)
+        else:
+            sock.sendto(msg, addr)
+        msgs_out.inc()
+        packets_out.inc()
+        if debug.hit():
+            print(f"Broadcast: vehicle,{args.name},{pos[0]:.3f},{pos[1]:.3f},{t:.3f}")
+        if t >= 1.0 or elapsed >= horizon:
             break
         time.sleep(args.interval)
 
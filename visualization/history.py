@@ -0,0 +1,105 @@
+# Bounded (x, y) point history for the visualizer.
+#
+# The newest points live in a fixed-capacity NumPy ring buffer at full resolution.
+# Points that fall out of the ring move into a decimated archive that keeps one
+# point per `stride` arrivals; when the archive fills up it is compacted 2:1 and
+# the stride doubles. Memory and draw cost stay bounded by `capacity` while the
+# plot still shows the shape of the whole trajectory.
+import numpy as np
+
+DECIMATION_MODES = ('stride', 'minmax')
+
+def _minmax_reduce(points):
+    # Reduces a bucket of points to the two extremes along its dominant axis,
+    # kept in time order, so excursions survive decimation
+    axis = int(np.ptp(points[:, 1]) > np.ptp(points[:, 0]))
+    lo = int(np.argmin(points[:, axis]))
+    hi = int(np.argmax(points[:, axis]))
+    return points[[min(lo, hi), max(lo, hi)]]
+
+class PointHistory:
+    def __init__(self, capacity=2000, mode='stride'):
+        if mode not in DECIMATION_MODES:
+            raise ValueError(f'Unknown decimation mode: {mode}')
+        capacity = max(capacity, 8)
+        self.mode = mode
+        self.ring = np.empty((capacity // 2, 2))
+        self.head = 0  # next write position in ring
+        self.count = 0  # points in ring
+        # Archive capacity is a multiple of 4 so minmax compaction sees whole buckets
+        self.archive = np.empty(((capacity - capacity // 2) // 4 * 4, 2))
+        self.archived = 0
+        self.stride = 1
+        # Evicted points of the bucket being filled, reduced on the fly:
+        # its first point, and the points at min/max x and min/max y with arrival order
+        self.pending = 0
+        self.first = None
+        self.extremes = None
+
+    def __len__(self):
+        return self.archived + (self.pending > 0) + self.count
+
+    def append(self, x, y):
+        ring = self.ring
+        if self.count == len(ring):
+            self._evict(*ring[self.head].tolist())
+        else:
+            self.count += 1
+        ring[self.head] = (x, y)
+        self.head = (self.head + 1) % len(ring)
+
+    def _evict(self, x, y):
+        n = self.pending
+        if n == 0:
+            self.first = (x, y)
+            self.extremes = [(x, y, 0)] * 4  # min x, max x, min y, max y
+        elif self.mode == 'minmax':
+            ext = self.extremes
+            if x < ext[0][0]:
+                ext[0] = (x, y, n)
+            if x > ext[1][0]:
+                ext[1] = (x, y, n)
+            if y < ext[2][1]:
+                ext[2] = (x, y, n)
+            if y > ext[3][1]:
+                ext[3] = (x, y, n)
+        self.pending = n + 1
+        size = 2 * self.stride if self.mode == 'minmax' else self.stride
+        if self.pending < size:
+            return
+        if self.mode == 'minmax':
+            ext = self.extremes
+            lo, hi = (ext[2], ext[3]) if ext[3][1] - ext[2][1] > ext[1][0] - ext[0][0] else (ext[0], ext[1])
+            lo, hi = sorted((lo, hi), key=lambda p: p[2])
+            kept = [lo[:2], hi[:2]]
+        else:
+            kept = [self.first]
+        self.pending = 0
+        if self.archived + len(kept) > len(self.archive):
+            self._compact()
+        self.archive[self.archived:self.archived + len(kept)] = kept
+        self.archived += len(kept)
+
+    def _compact(self):
+        n = self.archived
+        if self.mode == 'minmax':
+            groups = self.archive[:n - n % 4].reshape(-1, 4, 2)
+            kept = np.concatenate([_minmax_reduce(g) for g in groups]) if len(groups) else groups.reshape(0, 2)
+        else:
+            kept = self.archive[:n:2]
+        self.archive[:len(kept)] = kept
+        self.archived = len(kept)
+        self.stride *= 2
+
+    def view(self):
+        # Returns (xs, ys) in time order: decimated archive, pending bucket, ring
+        parts = [self.archive[:self.archived]]
+        if self.pending:
+            parts.append(np.array([self.first]))
+        if self.count < len(self.ring):
+            parts.append(self.ring[:self.count])
+        else:
+            parts.append(self.ring[self.head:])
+            parts.append(self.ring[:self.head])
+        points = np.concatenate(parts)
+        return points[:, 0], points[:, 1]
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from visualization.history import PointHistory
+
+def _fill(hist, n, spike=None, dx=1.0):
+    for i in range(n):
+        hist.append(i * dx, 100.0 if i == spike else 0.0)
+    return hist.view()
+
+@pytest.mark.parametrize('mode', ['stride', 'minmax'])
+def test_keeps_everything_below_capacity(mode):
+    hist = PointHistory(100, mode)
+    xs, ys = _fill(hist, 40)
+    assert xs.tolist() == list(range(40))
+    assert len(hist) == 40
+
+@pytest.mark.parametrize('mode', ['stride', 'minmax'])
+def test_bounded_and_in_time_order(mode):
+    hist = PointHistory(100, mode)
+    for n in (60, 1000, 100000):
+        xs, _ = _fill(PointHistory(100, mode), n)
+        assert len(xs) <= 100
+        assert np.all(np.diff(xs) > 0)
+    xs, _ = _fill(hist, 100000)
+    assert len(hist) == len(xs)
+
+@pytest.mark.parametrize('mode', ['stride', 'minmax'])
+def test_newest_points_at_full_resolution(mode):
+    hist = PointHistory(100, mode)
+    xs, _ = _fill(hist, 10000)
+    assert xs[-50:].tolist() == list(range(9950, 10000))
+
+def test_stride_keeps_the_first_point_and_spreads_the_rest():
+    hist = PointHistory(100, 'stride')
+    xs, _ = _fill(hist, 10000)
+    archived = xs[:hist.archived]
+    assert archived[0] == 0.0
+    assert len(archived) > 20
+    assert np.all(np.diff(archived) <= hist.stride)
+
+def test_minmax_keeps_excursions():
+    # A spike across an otherwise flat, slowly moving track
+    _, ys = _fill(PointHistory(100, 'minmax'), 10000, spike=1235, dx=0.001)
+    assert ys.max() == 100.0
+    _, ys = _fill(PointHistory(100, 'stride'), 10000, spike=1235, dx=0.001)
+    assert ys.max() == 0.0
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        PointHistory(100, 'average')
@@ -10,59 +10,120 @@ except ImportError:
     pass
 
 import socket
-import struct
 import argparse
 import threading
 import queue
 import time
-from multicast_config import SENSOR_MCAST_GRP, SENSOR_MCAST_PORT
+from multicast_config import SENSOR_MCAST_GRP, SENSOR_MCAST_PORT, DEFAULT_RCVBUF, open_listener
+from wire_codec import RECV_BUFSIZE, LossTracker, decode_all
 import matplotlib.pyplot as plt
 from collections import defaultdict
-import fusion.fusion_app as fusion_app
+from fusion.tracks import TrackTable
+from visualization.history import DECIMATION_MODES, PointHistory
+from metrics import Registry, serve
+from launcher import notify_ready
 
 # Use same message format as fusion_app
 
-def multicast_listener(q, stop_event):
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    sock.bind(('', SENSOR_MCAST_PORT))
-    mreq = struct.pack('4sl', socket.inet_aton(SENSOR_MCAST_GRP), socket.INADDR_ANY)
-    sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
-    sock.settimeout(0.2)
+def multicast_listener(q, stop_event, loss, registry, rcvbuf=DEFAULT_RCVBUF):
+    sock = open_listener(SENSOR_MCAST_GRP, SENSOR_MCAST_PORT, rcvbuf, timeout=0.2)
+    notify_ready()
+    packets_in = registry.counter('packets_in')
+    msgs_in = registry.counter('msgs_in')
+    parse_seconds = registry.histogram('parse_seconds')
     while not stop_event.is_set():
         try:
-            data, _ = sock.recvfrom(1024)
-            try:
-                text = data.decode()
-                parts = text.strip().split(',')
-                if parts[0] == 'sensor' and len(parts) >= 6:
-                    msg = {'type': 'sensor', 'name': parts[1], 'x': float(parts[2]), 'y': float(parts[3]), 't': float(parts[4]), 'noise_std': float(parts[5])}
-                    q.put((parts[1], msg))
-                elif parts[0] == 'vehicle' and len(parts) >= 5:
-                    msg = {'type': 'vehicle', 'name': parts[1], 'x': float(parts[2]), 'y': float(parts[3]), 't': float(parts[4])}
-                    q.put((parts[1], msg))
-                # Optionally handle 'fused' messages here
-            except Exception:
-                continue
+            data, _ = sock.recvfrom(RECV_BUFSIZE)
+            t0 = time.perf_counter()
+            msgs = decode_all(data)
+            parse_seconds.record(time.perf_counter() - t0)
+            packets_in.inc()
+            msgs_in.inc(len(msgs))
+            loss.observe(msgs)
+            for msg in msgs:
+                q.put((msg['name'], msg))
         except socket.timeout:
             continue
     sock.close()
 
+class LivePlot:
+    # Artists are created once and updated with set_data. The dynamic layers are
+    # animated: each frame restores a cached background (axes, labels, legend)
+    # and blits only those artists, so frame cost follows the number of points
+    # drawn. The background is re-captured after any full draw (resize, legend).
+    def __init__(self, fig, ax1, ax2):
+        self.fig = fig
+        self.ax1 = ax1
+        self.ax2 = ax2
+        self.sensor_lines = {}  # name -> Line2D
+        self.fused_marker, = ax1.plot([], [], marker='*', linestyle='None', color='black', markersize=14, label='Fused', animated=True)
+        self.fused_trail, = ax2.plot([], [], marker='*', linestyle='None', color='black', label='Fused Trajectory', animated=True)
+        ax1.legend()
+        ax2.legend()
+        self.background = None
+        fig.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def artists(self):
+        return [*self.sensor_lines.values(), self.fused_marker, self.fused_trail]
+
+    def _on_draw(self, event):
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_artists()
+
+    def _draw_artists(self):
+        for artist in self.artists():
+            artist.axes.draw_artist(artist)
+
+    def sensor_line(self, name, color):
+        line = self.sensor_lines.get(name)
+        if line is None:
+            line, = self.ax1.plot([], [], marker='o', linestyle='None', label=name, color=color, animated=True)
+            self.sensor_lines[name] = line
+            self.ax1.legend()
+            self.background = None  # legend changed, take a full draw next frame
+        return line
+
+    def render(self):
+        canvas = self.fig.canvas
+        if self.background is None:
+            canvas.draw()  # draw_event captures the background and draws the artists
+        else:
+            canvas.restore_region(self.background)
+            self._draw_artists()
+        canvas.blit(self.fig.bbox)
+        canvas.flush_events()
+
+    def finalize(self):
+        # Static redraw for the final blocking plt.show()
+        for artist in self.artists():
+            artist.set_animated(False)
+
 def main():
     parser = argparse.ArgumentParser(description="Visualization for Sensor Fusion Simulation (UDP multicast)")
     parser.add_argument('--interval', type=float, default=0.1, help='Visualization update interval (default: 0.1s)')
+    parser.add_argument('--history', type=int, default=2000, help='Points kept per sensor and for the fused trajectory; older points are decimated (default: 2000)')
+    parser.add_argument('--decimation', choices=DECIMATION_MODES, default='stride', help='How older points are thinned: keep every k-th (stride) or the extremes of each bucket (minmax)')
+    parser.add_argument('--rcvbuf', type=int, default=DEFAULT_RCVBUF, help=f'SO_RCVBUF of the sensor socket in bytes (default: {DEFAULT_RCVBUF})')
+    parser.add_argument('--stats-port', type=int, default=0, help='Serve metrics as JSON on this local HTTP port (default: 0, off)')
     args = parser.parse_args()
 
     q = queue.Queue()
     stop_event = threading.Event()
-    t = threading.Thread(target=multicast_listener, args=(q, stop_event), daemon=True)
+    loss = LossTracker()  # sensor streams
+    registry = Registry('visualizer', 'visualizer')
+    frame_seconds = registry.histogram('frame_seconds')
+    registry.gauge('queue_depth', q.qsize)
+    registry.gauge('loss', loss.totals)
+    serve(args.stats_port, registry.snapshot)
+    t = threading.Thread(target=multicast_listener, args=(q, stop_event, loss, registry, args.rcvbuf), daemon=True)
     t.start()
     threads = [t]
 
-    # Store history for plotting
-    sensor_history = defaultdict(list)  # name -> list of (x, y)
-    fused_history = []  # list of (x, y)
-    last_data = {}  # name -> latest msg
+    # Bounded history for plotting
+    sensor_history = defaultdict(lambda: PointHistory(args.history, args.decimation))  # name -> points
+    fused_history = PointHistory(args.history, args.decimation)
+    latest_fused = {}  # vehicle -> latest fused (x, y)
+    tracks = TrackTable()
 
     # Assign a color and name for each sensor (up to 10 for tab10 colormap)
     import matplotlib.cm as cm
@@ -78,63 +139,53 @@ def main():
     ax1.set_title('Sensor Positions')
     ax1.set_xlabel('X')
     ax1.set_ylabel('Y')
-    ax2.set_title('Fused Position Over Time')
-    ax2.set_xlabel('Time Step')
-    ax2.set_ylabel('Fused X, Y')
+    ax1.set_xlim(-12, 12)
+    ax1.set_ylim(-12, 12)
+    ax2.set_title('Fused Position Trajectory')
+    ax2.set_xlabel('Fused X')
+    ax2.set_ylabel('Fused Y')
+    ax2.set_xlim(-12, 12)
+    ax2.set_ylim(-12, 12)
+    plot = LivePlot(fig, ax1, ax2)
+    plt.show(block=False)
 
     try:
-        step = 0
         while True:
+            frame_start = time.time()
             # Gather all new data
+            changed = set()
             while not q.empty():
                 name, msg = q.get()
-                last_data[name] = msg
                 if msg['type'] == 'sensor':
-                    sensor_history[name].append((msg['x'], msg['y']))
+                    sensor_history[name].append(msg['x'], msg['y'])
+                    changed.add(name)
+                    tracks.update(msg)
                 elif msg['type'] == 'vehicle':
                     # Optionally plot vehicle trajectories as well
                     pass
-            # Plot sensor positions and latest fused position
-            ax1.clear()
-            ax1.set_title('Sensor Positions')
-            ax1.set_xlabel('X')
-            ax1.set_ylabel('Y')
-            ax1.set_xlim(-12, 12)
-            ax1.set_ylim(-12, 12)
-            for name, points in sensor_history.items():
-                xs, ys = zip(*points) if points else ([], [])
-                ax1.plot(xs, ys, marker='o', linestyle='None', label=name, color=get_color(name))
-            # Compute and store fused position on every loop if possible
-            sensor_msgs = [msg for msg in last_data.values() if msg['type'] == 'sensor']
-            if sensor_msgs:
-                fused = fusion_app.fuse_positions(sensor_msgs)
-                if fused:
-                    fused_history.append(fused)
-            # Plot latest fused position as a black star
-            if fused_history:
-                fx, fy = fused_history[-1]
-                ax1.plot(fx, fy, marker='*', linestyle='None', color='black', markersize=14, label='Fused')
-            ax1.legend()
-
-            # Plot fused position trajectory (X vs Y)
-            ax2.clear()
-            ax2.set_title('Fused Position Trajectory')
-            ax2.set_xlabel('Fused X')
-            ax2.set_ylabel('Fused Y')
-            ax2.set_xlim(-12, 12)
-            ax2.set_ylim(-12, 12)
-            if fused_history:
-                xs, ys = zip(*fused_history)
-                # print(f"[DEBUG] Plotting {len(xs)} fused points")
-                ax2.plot(xs, ys, marker='*', linestyle='None', color='black', label='Fused Trajectory')
-                ax2.legend()
-            plt.pause(args.interval)
-            step += 1
+            # Only sensors with new points touch their artist
+            for name in changed:
+                plot.sensor_line(name, get_color(name)).set_data(*sensor_history[name].view())
+            # Store the fused position of every vehicle track that changed
+            updated = tracks.pop_updated()
+            for vehicle, fused, _ in updated:
+                fused_history.append(*fused)
+                latest_fused[vehicle] = fused
+            if updated:
+                # Latest fused position of each vehicle as a black star, plus the trajectory
+                fx, fy = zip(*latest_fused.values())
+                plot.fused_marker.set_data(fx, fy)
+                plot.fused_trail.set_data(*fused_history.view())
+            plot.render()
+            frame_seconds.record(time.time() - frame_start)
+            fig.canvas.start_event_loop(max(0.001, args.interval - (time.time() - frame_start)))
     except KeyboardInterrupt:
         stop_event.set()
         for t in threads:
             t.join()
         print("Visualization stopped.")
+        print(loss.report())
+    plot.finalize()
     plt.ioff()
     plt.show()
 
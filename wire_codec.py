@@ -0,0 +1,420 @@
+# Shared wire codec and message schema for vehicle and sensor messages. Every
+# receiver decodes through decode()/decode_all(); there are no other parsers.
+#
+# Two formats can share the multicast groups; receivers detect them per datagram:
+#   text:   vehicle,name,x,y,t,seq,origin[,vx,vy]
+#           sensor2,name,x,y,t,sensor_type,noise_var,vehicle,seq,origin,sensed
+#   binary: fixed-layout little-endian RECORD (see below), first byte MAGIC_VERSION
+#
+# Every sensor message has an explicit sensor type (SENSOR_TYPES) and
+# measurement noise variance in m^2. Every record carries a per-sender sequence
+# number, so receivers can account for loss with a LossTracker.
+#
+# For latency tracing, records carry time.monotonic() stamps, which all
+# processes on one host share: `origin` is when the vehicle emitted the
+# position, and sensors copy it into their readings and add `sensed`, when
+# they emitted the reading. A TACAN reading carried forward along the vehicle's
+# velocity advances its origin by the same interval, so the origin is always
+# the instant the position refers to; fusion uses it as measurement time.
+# Unknown stamps are NaN on the wire and None in message dicts.
+#
+# Vehicle records may carry the vehicle's velocity (vx, vy in m/s), which the
+# trajectory engine knows exactly; it is None in message dicts when absent.
+#
+# Text lines without the trailing seq/stamp fields decode with None, and text
+# `sensor,` lines of the old schema (numeric noise_std, sensor type noisy) are
+# still accepted; other binary versions are counted in `counters` and dropped.
+#
+# Either format can pack all records of one tick into a single datagram (a batch
+# frame, at most MAX_DATAGRAM bytes): a `batch,N` line followed by N text lines,
+# or a BATCH_HEADER followed by N binary RECORDs. Use decode_all() to receive.
+#
+# Binary records carry a 32-bit sender id instead of the name. Ids are the crc32
+# of the name, so every process interns the same name to the same id; senders
+# periodically broadcast KIND_NAME announcements so receivers can map ids back.
+import math
+import struct
+import time
+import zlib
+
+WIRE_FORMATS = ('text', 'binary')
+SENSOR_TYPES = ('noisy', 'adas', 'tacan')
+
+MAGIC_VERSION = 0xA5  # high nibble: magic 0xA, low nibble: schema version 5
+MAGIC = 0xA0
+KIND_VEHICLE = 1
+KIND_SENSOR = 2
+KIND_NAME = 3
+KIND_BATCH = 4
+
+# magic/version, kind, sensor type code, sender id, vehicle id, seq, x, y, t, noise_var, origin, sensed
+# (for vehicle records the vehicle id equals the sender id, the type code is 0, and
+# the noise_var and sensed slots hold vx and vy, NaN if unknown)
+RECORD = struct.Struct('<BBBIIIdddddd')
+# magic/version, kind, sender id, followed by the utf-8 name
+NAME_HEADER = struct.Struct('<BBI')
+# magic/version, kind, record count, followed by count RECORDs
+BATCH_HEADER = struct.Struct('<BBH')
+
+MAX_DATAGRAM = 1472  # largest UDP payload that fits an Ethernet MTU without fragmenting
+RECV_BUFSIZE = 65535
+
+ANNOUNCE_INTERVAL = 1.0  # seconds between name announcements
+SEQ_MASK = 0xFFFFFFFF
+SEQ_WINDOW = 4096  # sequence numbers a LossTracker remembers per stream
+RESTART_GAP = 64  # a LossTracker jump back by more than this towards seq 0 is a restarted sender
+
+_unpack_record = RECORD.unpack
+_type_codes = {stype: code for code, stype in enumerate(SENSOR_TYPES, 1)}
+_num_types = len(SENSOR_TYPES)
+
+_ids = {}    # name -> sender id
+_names = {}  # sender id -> name
+_seqs = {}   # sender name -> next sequence number
+
+# Receive-side counters for this process. malformed: records that do not
+# parse; dropped: well-formed records this receiver cannot use (other schema
+# versions, unknown kinds or sensor types).
+counters = {'decoded': 0, 'malformed': 0, 'dropped': 0}
+
+def intern_name(name):
+    sid = _ids.get(name)
+    if sid is None:
+        sid = zlib.crc32(name.encode())
+        _ids[name] = sid
+        _names[sid] = name
+    return sid
+
+def lookup_name(sid):
+    name = _names.get(sid)
+    if name is None:
+        # Not announced yet: keep a placeholder that re-interns to the same id
+        name = f"id{sid:08x}"
+        _ids[name] = sid
+    return name
+
+def next_seq(name):
+    # Sequence numbers count the records this process has encoded for `name`
+    seq = _seqs.get(name, 0)
+    _seqs[name] = (seq + 1) & SEQ_MASK
+    return seq
+
+def encode_vehicle(name, x, y, t, wire_format='text', seq=None, origin=None, vx=None, vy=None):
+    # origin defaults to now: the position is being emitted
+    if seq is None:
+        seq = next_seq(name)
+    if origin is None:
+        origin = time.monotonic()
+    if wire_format == 'binary':
+        sid = intern_name(name)
+        if vx is None:
+            vx = vy = math.nan
+        return RECORD.pack(MAGIC_VERSION, KIND_VEHICLE, 0, sid, sid, seq, x, y, t, vx, origin, vy)
+    if vx is None:
+        return f"vehicle,{name},{x:.3f},{y:.3f},{t:.3f},{seq},{origin:.6f}".encode()
+    return f"vehicle,{name},{x:.3f},{y:.3f},{t:.3f},{seq},{origin:.6f},{vx:.3f},{vy:.3f}".encode()
+
+def encode_sensor(name, x, y, t, sensor_type, noise_var, vehicle, wire_format='text', seq=None, origin=None, sensed=None):
+    # origin is the vehicle message's stamp (None if unknown), sensed defaults to now
+    if seq is None:
+        seq = next_seq(name)
+    if origin is None:
+        origin = math.nan
+    if sensed is None:
+        sensed = time.monotonic()
+    if wire_format == 'binary':
+        return RECORD.pack(MAGIC_VERSION, KIND_SENSOR, _type_codes[sensor_type], intern_name(name), intern_name(vehicle), seq, x, y, t, noise_var, origin, sensed)
+    return f"sensor2,{name},{x:.3f},{y:.3f},{t:.3f},{sensor_type},{noise_var:.6g},{vehicle},{seq},{origin:.6f},{sensed:.6f}".encode()
+
+def encode_name(name):
+    return NAME_HEADER.pack(MAGIC_VERSION, KIND_NAME, intern_name(name)) + name.encode()
+
+def decode(data):
+    # Returns the message dict of a single-record datagram, or None for
+    # announcements, batch frames and unusable packets
+    if data and data[0] & 0xF0 == MAGIC:
+        if data[0] != MAGIC_VERSION:
+            counters['dropped'] += 1
+            return None
+        if len(data) >= BATCH_HEADER.size and data[1] == KIND_BATCH:
+            return None
+        return _decode_binary(data)
+    if data.startswith(b'batch,'):
+        return None
+    return _decode_text(data)
+
+def decode_all(data):
+    # Returns the list of message dicts in a datagram, unpacking batch frames
+    if data and data[0] & 0xF0 == MAGIC:
+        if data[0] != MAGIC_VERSION:
+            counters['dropped'] += 1
+            return []
+        if len(data) >= BATCH_HEADER.size and data[1] == KIND_BATCH:
+            return _decode_binary_batch(data)
+        msg = _decode_binary(data)
+    elif data.startswith(b'batch,'):
+        return _decode_text_batch(data)
+    else:
+        msg = _decode_text(data)
+    return [msg] if msg else []
+
+def frame_batches(records, wire_format='text', max_bytes=MAX_DATAGRAM):
+    # Packs encoded records (from encode_vehicle/encode_sensor) into as few
+    # datagrams as fit in max_bytes. A lone record is sent unframed, as is a
+    # record that does not fit in a frame on its own.
+    if wire_format == 'binary':
+        per_frame = max(1, (max_bytes - BATCH_HEADER.size) // RECORD.size)
+        frames = []
+        for i in range(0, len(records), per_frame):
+            chunk = records[i:i + per_frame]
+            if len(chunk) == 1:
+                frames.append(chunk[0])
+            else:
+                frames.append(BATCH_HEADER.pack(MAGIC_VERSION, KIND_BATCH, len(chunk)) + b''.join(chunk))
+        return frames
+    frames = []
+    chunk = []
+    size = 0
+    for rec in records:
+        # 16 bytes covers the 'batch,N' header line and the newline separators
+        if chunk and size + len(rec) + 16 > max_bytes:
+            frames.append(_text_frame(chunk))
+            chunk = []
+            size = 0
+        chunk.append(rec)
+        size += len(rec) + 1
+    if chunk:
+        frames.append(_text_frame(chunk))
+    return frames
+
+def _text_frame(chunk):
+    if len(chunk) == 1:
+        return chunk[0]
+    return b'batch,%d\n' % len(chunk) + b'\n'.join(chunk)
+
+def _decode_text_batch(data):
+    try:
+        lines = data.decode().split('\n')
+        count = int(lines[0][6:])
+    except (UnicodeDecodeError, ValueError):
+        counters['malformed'] += 1
+        return []
+    if count != len(lines) - 1:
+        counters['malformed'] += 1
+        return []
+    msgs = []
+    for line in lines[1:]:
+        msg = _parse_text(line)
+        if msg:
+            msgs.append(msg)
+    counters['decoded'] += len(msgs)
+    return msgs
+
+def _decode_binary_batch(data):
+    _, _, count = BATCH_HEADER.unpack_from(data)
+    if len(data) != BATCH_HEADER.size + count * RECORD.size:
+        counters['malformed'] += 1
+        return []
+    msgs = []
+    names = _names
+    unusable = 0
+    for _, kind, code, sid, vid, seq, x, y, t, noise_var, origin, sensed in RECORD.iter_unpack(memoryview(data)[BATCH_HEADER.size:]):
+        if kind == KIND_VEHICLE:
+            known = noise_var == noise_var and sensed == sensed
+            msgs.append({'type': 'vehicle', 'name': names.get(sid) or lookup_name(sid), 'x': x, 'y': y, 't': t, 'seq': seq,
+                         'origin': origin if origin == origin else None,
+                         'vx': noise_var if known else None, 'vy': sensed if known else None})
+        elif kind == KIND_SENSOR and 0 < code <= _num_types and noise_var == noise_var:
+            msgs.append({'type': 'sensor', 'name': names.get(sid) or lookup_name(sid), 'x': x, 'y': y, 't': t,
+                         'sensor_type': SENSOR_TYPES[code - 1], 'noise_var': noise_var, 'vehicle': names.get(vid) or lookup_name(vid), 'seq': seq,
+                         'origin': origin if origin == origin else None, 'sensed': sensed if sensed == sensed else None})
+        else:
+            unusable += 1
+    counters['decoded'] += len(msgs)
+    if unusable:
+        counters['dropped'] += unusable
+    return msgs
+
+def _decode_text(data):
+    try:
+        msg = _parse_text(data.decode())
+    except UnicodeDecodeError:
+        counters['malformed'] += 1
+        return None
+    if msg:
+        counters['decoded'] += 1
+    return msg
+
+def _parse_text(text):
+    parts = text.strip().split(',')
+    try:
+        if parts[0] == 'vehicle' and len(parts) >= 5:
+            msg = {'type': 'vehicle', 'name': parts[1], 'x': float(parts[2]), 'y': float(parts[3]), 't': float(parts[4]),
+                   'seq': int(parts[5]) if len(parts) >= 6 else None, 'origin': _stamp(parts, 6),
+                   'vx': float(parts[7]) if len(parts) >= 9 else None, 'vy': float(parts[8]) if len(parts) >= 9 else None}
+        elif parts[0] == 'sensor2' and len(parts) >= 8:
+            if parts[5] not in _type_codes:
+                counters['dropped'] += 1
+                return None
+            msg = {'type': 'sensor', 'name': parts[1], 'x': float(parts[2]), 'y': float(parts[3]), 't': float(parts[4]),
+                   'sensor_type': parts[5], 'noise_var': float(parts[6]), 'vehicle': parts[7],
+                   'seq': int(parts[8]) if len(parts) >= 9 else None, 'origin': _stamp(parts, 9), 'sensed': _stamp(parts, 10)}
+        elif parts[0] == 'sensor' and len(parts) >= 6:
+            # Old schema: noise_std in place of type and variance, vehicle optional
+            noise_std = float(parts[5])
+            msg = {'type': 'sensor', 'name': parts[1], 'x': float(parts[2]), 'y': float(parts[3]), 't': float(parts[4]),
+                   'sensor_type': 'noisy', 'noise_var': noise_std * noise_std, 'vehicle': parts[6] if len(parts) >= 7 else None,
+                   'seq': None, 'origin': None, 'sensed': None}
+        else:
+            counters['malformed'] += 1
+            return None
+    except ValueError:
+        counters['malformed'] += 1
+        return None
+    return msg
+
+def _stamp(parts, i):
+    if len(parts) <= i:
+        return None
+    v = float(parts[i])
+    return v if v == v else None
+
+def _decode_binary(data):
+    if len(data) == RECORD.size and data[1] != KIND_NAME:
+        _, kind, code, sid, vid, seq, x, y, t, noise_var, origin, sensed = _unpack_record(data)
+        if kind == KIND_VEHICLE:
+            counters['decoded'] += 1
+            # Older senders put 0.0 and NaN in the velocity slots: unknown
+            known = noise_var == noise_var and sensed == sensed
+            return {'type': 'vehicle', 'name': _names.get(sid) or lookup_name(sid), 'x': x, 'y': y, 't': t, 'seq': seq,
+                    'origin': origin if origin == origin else None,
+                    'vx': noise_var if known else None, 'vy': sensed if known else None}
+        if kind == KIND_SENSOR and 0 < code <= _num_types and noise_var == noise_var:
+            counters['decoded'] += 1
+            return {'type': 'sensor', 'name': _names.get(sid) or lookup_name(sid), 'x': x, 'y': y, 't': t,
+                    'sensor_type': SENSOR_TYPES[code - 1], 'noise_var': noise_var, 'vehicle': _names.get(vid) or lookup_name(vid), 'seq': seq,
+                    'origin': origin if origin == origin else None, 'sensed': sensed if sensed == sensed else None}
+        counters['dropped'] += 1
+        return None
+    if len(data) > NAME_HEADER.size and data[1] == KIND_NAME:
+        _, _, sid = NAME_HEADER.unpack_from(data)
+        try:
+            _names[sid] = data[NAME_HEADER.size:].decode()
+        except UnicodeDecodeError:
+            counters['malformed'] += 1
+        return None
+    counters['malformed'] += 1
+    return None
+
+class Announcer:
+    # Produces name announcements for binary senders every ANNOUNCE_INTERVAL seconds
+    def __init__(self, names, wire_format='text', interval=ANNOUNCE_INTERVAL):
+        self.enabled = wire_format == 'binary'
+        self.known = set()
+        self.packets = []
+        self.interval = interval
+        self.next_time = 0.0
+        for name in names:
+            self.add(name)
+
+    def add(self, name):
+        # Sensors also announce the vehicles they report on, since the fusion
+        # side never sees the vehicle group's own announcements
+        if self.enabled and name not in self.known:
+            self.known.add(name)
+            self.packets.append(encode_name(name))
+            self.next_time = 0.0
+
+    def due(self, now):
+        if not self.packets or now < self.next_time:
+            return []
+        self.next_time = now + self.interval
+        return self.packets
+
+class LossTracker:
+    # Receive-side sequence accounting per stream (sender name). A record
+    # ahead of the next expected number marks the skipped ones lost; a late
+    # record for a lost number is reordered rather than lost; a number already
+    # seen is a duplicate. A jump back by more than `window`, or by more than
+    # `restart_gap` to a number nearer 0 than to the highest one seen (a sender
+    # that restarted from 0 soon after a previous run), is a restarted sender,
+    # and its stream starts over.
+    def __init__(self, window=SEQ_WINDOW, restart_gap=RESTART_GAP):
+        self.window = window
+        self.restart_gap = restart_gap
+        self.streams = {}  # name -> _Stream
+
+    def observe(self, msgs):
+        streams = self.streams
+        for msg in msgs:
+            seq = msg['seq']
+            if seq is None:
+                continue
+            st = streams.get(msg['name'])
+            if st is None:
+                streams[msg['name']] = _Stream(seq)
+                continue
+            d = (seq - st.highest) & SEQ_MASK
+            if d == 1:
+                st.highest = seq
+                st.received += 1
+            elif d == 0:
+                st.duplicates += 1
+            elif d <= SEQ_MASK // 2:
+                # Ahead: everything skipped is missing for now
+                st.lost += d - 1
+                st.missing.update((st.highest + i) & SEQ_MASK for i in range(max(1, d - self.window), d))
+                st.highest = seq
+                st.received += 1
+                if len(st.missing) > 2 * self.window:
+                    st.missing = {m for m in st.missing if (seq - m) & SEQ_MASK <= self.window}
+            elif seq in st.missing:
+                st.missing.remove(seq)
+                st.lost -= 1
+                st.reordered += 1
+                st.received += 1
+            else:
+                back = (st.highest - seq) & SEQ_MASK
+                if back > self.window or (back > self.restart_gap and seq < back):
+                    st.restart(seq)
+                else:
+                    st.duplicates += 1
+
+    def totals(self):
+        t = {'streams': len(self.streams), 'received': 0, 'lost': 0, 'reordered': 0, 'duplicates': 0, 'restarts': 0}
+        for st in list(self.streams.values()):
+            t['received'] += st.received
+            t['lost'] += st.lost
+            t['reordered'] += st.reordered
+            t['duplicates'] += st.duplicates
+            t['restarts'] += st.restarts
+        expected = t['received'] + t['lost']
+        t['loss_rate'] = t['lost'] / expected if expected else 0.0
+        return t
+
+    def report(self, label='LOSS'):
+        t = self.totals()
+        worst = max(self.streams.items(), key=lambda kv: kv[1].loss_rate(), default=None)
+        line = (f"{label}: {t['streams']} streams, {t['received']} received, {t['lost']} lost ({100 * t['loss_rate']:.2f}%), "
+                f"{t['reordered']} reordered, {t['duplicates']} duplicates")
+        if worst is not None and worst[1].lost:
+            line += f"; worst {worst[0]} {100 * worst[1].loss_rate():.2f}%"
+        return line
+
+class _Stream:
+    __slots__ = ('highest', 'received', 'lost', 'reordered', 'duplicates', 'restarts', 'missing')
+
+    def __init__(self, seq):
+        self.received = self.lost = self.reordered = self.duplicates = self.restarts = 0
+        self.restart(seq)
+        self.restarts = 0
+
+    def restart(self, seq):
+        self.highest = seq
+        self.received += 1
+        self.restarts += 1
+        self.missing = set()
+
+    def loss_rate(self):
+        expected = self.received + self.lost
+        return self.lost / expected if expected else 0.0